@@ -1,13 +1,18 @@
 from django.contrib import admin
+from backend.pagination import EstimatedCountPaginator
 from .models import ActivityLog
 
 @admin.register(ActivityLog)
 class ActivityLogAdmin(admin.ModelAdmin):
-    list_display = ['user', 'action_type', 'description', 'ip_address', 'timestamp']
-    list_filter = ['action_type', 'timestamp', 'user']
-    search_fields = ['user__username', 'description', 'ip_address']
-    readonly_fields = ['timestamp']
+    list_display = ['username', 'action_type', 'description', 'ip_address', 'timestamp']
+    list_filter = ['action_type', 'timestamp']
+    search_fields = ['username', 'description', 'ip_address']
+    readonly_fields = ['user_id', 'username', 'timestamp']
     date_hierarchy = 'timestamp'
+    ordering = ['-timestamp', '-id']  # activity_time_idx
+    # Planner estimates instead of COUNT(*) on the full log table
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     def has_add_permission(self, request):
-        return False  # Prevent manual addition of logs
\ No newline at end of file
+        return False  # Prevent manual addition of logs
@@ -0,0 +1,122 @@
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max
+
+from activitylog.models import ActivityLog
+from backend.routers import AUDIT_ALIAS, audit_configured
+from users.models import User
+
+# Columns present both before and after the log got its own username column
+# (activitylog migration 0004), so rows can be read from a table that was
+# never migrated past it.
+SOURCE_FIELDS = ['id', 'user_id', 'action_type', 'description', 'ip_address', 'timestamp']
+
+
+def reserve_ids(alias, above):
+    """
+    Move the log's id sequence on `alias` past `above` (never back), so rows
+    the app writes there cannot take an id a copied row still needs.
+    """
+    connection = connections[alias]
+    table = ActivityLog._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                "GREATEST(%s, nextval(pg_get_serial_sequence(%s, 'id'))))",
+                [table, above, table],
+            )
+        elif connection.vendor == 'sqlite':
+            # AUTOINCREMENT tables never reuse an id below sqlite_sequence
+            cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s", [above, table])
+            if not cursor.rowcount:
+                cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, above])
+        else:
+            raise CommandError(f"Cannot reserve ids on a {connection.vendor} database.")
+
+
+@contextmanager
+def keep_timestamps():
+    """bulk_create would otherwise stamp every copied row with the current time."""
+    field = ActivityLog._meta.get_field('timestamp')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Move activity log rows from the main database into the audit database, "
+        "a batch at a time. Safe to interrupt and run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows copied per transaction.")
+        parser.add_argument('--source', default='default', help="Database alias to move the rows out of.")
+        parser.add_argument('--keep', action='store_true', help="Copy only; leave the rows in the source database.")
+        parser.add_argument(
+            '--reserve', type=int, default=10000,
+            help="Ids kept free above the source's largest, for rows still written there before the switch.",
+        )
+
+    def handle(self, *args, **options):
+        if not audit_configured():
+            raise CommandError("No audit database configured (set DB_AUDIT_NAME or DB_AUDIT_SQLITE).")
+        source = options['source']
+        if source not in connections.databases or source == AUDIT_ALIAS:
+            raise CommandError(f"'{source}' is not a database the log can be moved from.")
+        batch_size = max(options['batch_size'], 1)
+
+        # Before anything is copied, so new rows in the audit database are
+        # numbered after every row that still has to come across
+        source_max = ActivityLog.objects.using(source).aggregate(top=Max('id'))['top'] or 0
+        reserve_ids(AUDIT_ALIAS, source_max + max(options['reserve'], 0))
+
+        usernames = {}
+        moved = 0
+        conflicts = []
+        last_id = 0
+        with keep_timestamps():
+            while True:
+                rows = list(
+                    ActivityLog.objects.using(source).filter(id__gt=last_id).order_by('id')
+                    .values(*SOURCE_FIELDS)[:batch_size]
+                )
+                if not rows:
+                    break
+                missing = {row['user_id'] for row in rows} - usernames.keys()
+                usernames.update(User.objects.filter(pk__in=missing).values_list('pk', 'username'))
+
+                # Ids are kept, so a batch copied before an interruption is skipped
+                with transaction.atomic(using=AUDIT_ALIAS):
+                    ActivityLog.objects.using(AUDIT_ALIAS).bulk_create(
+                        [ActivityLog(**row, username=usernames.get(row['user_id'], '')) for row in rows],
+                        ignore_conflicts=True,
+                    )
+                # A skipped row is only safe to delete if it is the same entry;
+                # an id taken by a different one stays in the source
+                copied = {
+                    row['id']: row for row in
+                    ActivityLog.objects.using(AUDIT_ALIAS).filter(id__in=[row['id'] for row in rows])
+                    .values(*SOURCE_FIELDS)
+                }
+                done = [row['id'] for row in rows if copied.get(row['id']) == row]
+                conflicts += [row['id'] for row in rows if copied.get(row['id']) != row]
+                if not options['keep']:
+                    ActivityLog.objects.using(source).filter(id__in=done).delete()
+
+                last_id = rows[-1]['id']
+                moved += len(done)
+                self.stdout.write(f"{moved} row(s) moved (up to id {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} activity log row(s) to the '{AUDIT_ALIAS}' database."))
+        if conflicts:
+            shown = ', '.join(map(str, conflicts[:20])) + (' ...' if len(conflicts) > 20 else '')
+            self.stderr.write(self.style.WARNING(
+                f"{len(conflicts)} row(s) left in '{source}': their ids are taken by other entries "
+                f"in the '{AUDIT_ALIAS}' database ({shown})."
+            ))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-20 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    0001-0004 in one step, for databases created from scratch. The audit
+    database (backend/routers.py) has no user table, so it cannot run 0001,
+    which creates the log with a foreign key to users; the final table keeps
+    a plain user_id instead. Databases that applied 0001-0004 keep them.
+    """
+
+    replaces = [
+        ('activitylog', '0001_initial'),
+        ('activitylog', '0002_activitylog_activity_user_time_idx'),
+        ('activitylog', '0003_activitylog_activity_time_idx'),
+        ('activitylog', '0004_activitylog_user_id_username'),
+    ]
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action_type', models.CharField(choices=[('upload', 'Upload'), ('delete', 'Delete'), ('login', 'Login'), ('logout', 'Logout'), ('update', 'Update'), ('view', 'View')], max_length=20)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('user_id', models.BigIntegerField()),
+                ('username', models.CharField(blank=True, default='', max_length=150)),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['-timestamp', '-id'], name='activity_time_idx'),
+                    models.Index(fields=['user_id', '-timestamp'], name='activity_user_time_idx'),
+                ],
+            },
+        ),
+    ]
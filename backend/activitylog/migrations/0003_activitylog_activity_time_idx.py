@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0002_activitylog_activity_user_time_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['-timestamp', '-id'], name='activity_time_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.6 on 2026-10-19 23:59
+
+import copy
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def drop_user_foreign_key(apps, schema_editor):
+    """
+    Drop the foreign key constraint and the single-column index on user_id.
+    The (user_id, timestamp) index stays. Databases created from scratch
+    (such as the audit database) skip 0001-0004 for the squashed migration
+    and never had either.
+    """
+    ActivityLog = apps.get_model('activitylog', 'ActivityLog')
+    old_field = ActivityLog._meta.get_field('user')
+    new_field = copy.copy(old_field)
+    new_field.db_constraint = False
+    new_field.db_index = False
+    schema_editor.alter_field(ActivityLog, old_field, new_field)
+
+
+def fill_usernames(apps, schema_editor):
+    """Copy usernames onto existing rows, when the users live in this database."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    connection = schema_editor.connection
+    if User._meta.db_table not in connection.introspection.table_names():
+        return  # a separate audit database; move_activitylog fills them in
+    ActivityLog = apps.get_model('activitylog', 'ActivityLog')
+    ActivityLog.objects.using(connection.alias).filter(username='').update(
+        username=Subquery(User.objects.filter(pk=OuterRef('user_id')).values('username')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0003_activitylog_activity_time_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_user_foreign_key, migrations.RunPython.noop),
+        # The user_id column stays as it is; only Django's view of it changes
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(model_name='activitylog', name='activity_user_time_idx'),
+                migrations.RemoveField(model_name='activitylog', name='user'),
+                migrations.AddField(
+                    model_name='activitylog',
+                    name='user_id',
+                    field=models.BigIntegerField(),
+                    preserve_default=False,
+                ),
+                migrations.AddIndex(
+                    model_name='activitylog',
+                    index=models.Index(fields=['user_id', '-timestamp'], name='activity_user_time_idx'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='username',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.RunPython(fill_usernames, migrations.RunPython.noop),
+    ]
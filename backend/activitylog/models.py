@@ -1,8 +1,12 @@
 from django.db import models
-from django.conf import settings
 
 
 class ActivityLog(models.Model):
+    """
+    One audited action. The log may live in its own database (the `audit`
+    alias, see backend/routers.py), so it stores the user's id and username
+    rather than a foreign key to a user table it cannot reach.
+    """
     ACTION_TYPES = [
         ('upload', 'Upload'),
         ('delete', 'Delete'),
@@ -12,12 +16,31 @@ class ActivityLog(models.Model):
         ('view', 'View'),
     ]
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    user_id = models.BigIntegerField()
+    username = models.CharField(max_length=150, blank=True, default='')
     action_type = models.CharField(max_length=20, choices=ACTION_TYPES)
     description = models.TextField(blank=True, null=True)
     ip_address = models.GenericIPAddressField(blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Latest activity per user (user directory)
+            models.Index(fields=['user_id', '-timestamp'], name='activity_user_time_idx'),
+            # Newest-first log listing (API default ordering and admin)
+            models.Index(fields=['-timestamp', '-id'], name='activity_time_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.user.username} - {self.action_type} at {self.timestamp}"
+        return f"{self.username} - {self.action_type} at {self.timestamp}"
 
+    @classmethod
+    def log(cls, user, action_type, description=None, ip_address=None):
+        """Record an action by user, copying their id and username onto the row."""
+        return cls.objects.create(
+            user_id=user.pk,
+            username=user.get_username(),
+            action_type=action_type,
+            description=description,
+            ip_address=ip_address,
+        )
@@ -2,9 +2,7 @@ from rest_framework import serializers
 from .models import ActivityLog
 
 class ActivityLogSerializer(serializers.ModelSerializer):
-    username = serializers.CharField(source='user.username', read_only=True)
-    
     class Meta:
         model = ActivityLog
-        fields = ['id', 'username', 'action_type', 'description', 'ip_address', 'timestamp']
-        read_only_fields = ['id', 'timestamp']
\ No newline at end of file
+        fields = ['id', 'user_id', 'username', 'action_type', 'description', 'ip_address', 'timestamp']
+        read_only_fields = ['id', 'user_id', 'username', 'timestamp']
\ No newline at end of file
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from backend import events
+from .models import ActivityLog
+from .serializers import ActivityLogSerializer
+
+
+@receiver(post_save, sender=ActivityLog)
+def publish_activity(sender, instance, created, using, **kwargs):
+    """Push new log entries to admins' event streams (backend/sse.py)."""
+    if created:
+        events.publish(
+            'activity', ActivityLogSerializer(instance).data, {'admins_only': True},
+            event_id=instance.pk, using=using,
+        )
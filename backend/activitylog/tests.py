@@ -1,3 +1,126 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.db.models.query import QuerySet
 from django.test import TestCase
+from django.utils import timezone
+
+from backend import routers
+from backend.tests import extra_database
+from users.models import User
+from .models import ActivityLog
+
+
+class AuditDatabaseTests(TestCase):
+    """The log routed to a second SQLite database standing in for the audit database."""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.audit = self.enterContext(extra_database(routers.AUDIT_ALIAS, {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(root, 'audit.sqlite3'),
+        }))
+        self.enterContext(mock.patch('backend.routers.audit_configured', return_value=True))
+        self.enterContext(mock.patch(
+            'activitylog.management.commands.move_activitylog.audit_configured', return_value=True,
+        ))
+        # A fresh database, so this runs the squashed initial migration
+        call_command('migrate', database=routers.AUDIT_ALIAS, verbosity=0)
+        self.user = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+
+    def _audit_tables(self):
+        return set(self.audit.introspection.table_names())
+
+    def test_only_the_log_is_migrated_to_the_audit_database(self):
+        tables = self._audit_tables()
+        self.assertIn('activitylog_activitylog', tables)
+        self.assertNotIn('users_user', tables)
+        self.assertNotIn('assets_asset', tables)
+
+        router = routers.AuditRouter()
+        self.assertEqual(router.db_for_write(ActivityLog), routers.AUDIT_ALIAS)
+        self.assertEqual(router.db_for_read(ActivityLog), routers.AUDIT_ALIAS)
+        self.assertIsNone(router.db_for_write(User))
+        self.assertTrue(router.allow_migrate(routers.AUDIT_ALIAS, 'activitylog'))
+        self.assertFalse(router.allow_migrate('default', 'activitylog'))
+        self.assertFalse(router.allow_migrate(routers.AUDIT_ALIAS, 'assets'))
+        self.assertIsNone(router.allow_migrate('default', 'assets'))
+        self.assertFalse(router.allow_relation(ActivityLog(user_id=1), self.user))
+        with mock.patch('backend.routers.audit_configured', return_value=False):
+            self.assertIsNone(router.db_for_write(ActivityLog))
+            self.assertIsNone(router.allow_migrate(routers.AUDIT_ALIAS, 'activitylog'))
+
+    def test_log_writes_to_the_audit_database(self):
+        entry = ActivityLog.log(self.user, 'upload', 'Uploaded a.png', ip_address='10.0.0.1')
+        self.assertEqual(entry._state.db, routers.AUDIT_ALIAS)
+        row = ActivityLog.objects.using(routers.AUDIT_ALIAS).get()
+        self.assertEqual((row.user_id, row.username, row.ip_address), (self.user.pk, 'editor', '10.0.0.1'))
+        self.assertFalse(ActivityLog.objects.using('default').exists())
+        # The default manager reads from there too
+        self.assertEqual(list(ActivityLog.objects.values_list('pk', flat=True)), [entry.pk])
+
+    def _source_rows(self, count):
+        stamp = timezone.now() - timedelta(days=30)
+        for i in range(count):
+            row = ActivityLog.objects.using('default').create(user_id=self.user.pk, action_type='view', description=str(i))
+        ActivityLog.objects.using('default').update(timestamp=stamp)
+        return stamp, row.pk
+
+    def test_move_resumes_after_an_interruption(self):
+        stamp, last_id = self._source_rows(5)
+        real_bulk_create = QuerySet.bulk_create
+        batches = []
+
+        def bulk_create(queryset, objs, *args, **kwargs):
+            batches.append(len(objs))
+            if len(batches) == 2:
+                raise OperationalError('connection lost')
+            return real_bulk_create(queryset, objs, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'bulk_create', autospec=True, side_effect=bulk_create):
+            with self.assertRaises(OperationalError):
+                call_command('move_activitylog', batch_size=2, stdout=io.StringIO())
+        # The first batch was moved; the failed one is still in the source
+        self.assertEqual(ActivityLog.objects.using(routers.AUDIT_ALIAS).count(), 2)
+        self.assertEqual(ActivityLog.objects.using('default').count(), 3)
+
+        call_command('move_activitylog', batch_size=2, stdout=io.StringIO())
+        moved = ActivityLog.objects.using(routers.AUDIT_ALIAS).order_by('id')
+        self.assertEqual([row.description for row in moved], ['0', '1', '2', '3', '4'])
+        self.assertEqual({(row.username, row.timestamp) for row in moved}, {('editor', stamp)})
+        self.assertFalse(ActivityLog.objects.using('default').exists())
+
+        # New entries are numbered after the moved ones
+        self.assertGreater(ActivityLog.log(self.user, 'login').pk, last_id)
+
+    def test_rows_whose_id_is_taken_stay_in_the_source(self):
+        self._source_rows(3)
+        # Written after the switch but before the move, under an id an old row has
+        live = ActivityLog.log(self.user, 'login', 'new-after-switch')
+        self.assertEqual(live.pk, 1)
+
+        stderr = io.StringIO()
+        call_command('move_activitylog', reserve=100, stdout=io.StringIO(), stderr=stderr)
+        self.assertIn('1 row(s) left', stderr.getvalue())
+        moved = ActivityLog.objects.using(routers.AUDIT_ALIAS).order_by('id')
+        self.assertEqual(
+            [(row.pk, row.description) for row in moved], [(1, 'new-after-switch'), (2, '1'), (3, '2')]
+        )
+        self.assertEqual(
+            list(ActivityLog.objects.using('default').values_list('pk', 'description')), [(1, '0')]
+        )
+        # Ids up to the source's largest plus the reserve are never handed out
+        self.assertGreater(ActivityLog.log(self.user, 'login').pk, 103)
 
-# Create your tests here.
+    def test_copying_twice_does_not_duplicate(self):
+        self._source_rows(3)
+        for _ in range(2):
+            call_command('move_activitylog', keep=True, stdout=io.StringIO())
+        self.assertEqual(ActivityLog.objects.using(routers.AUDIT_ALIAS).count(), 3)
+        self.assertEqual(ActivityLog.objects.using('default').count(), 3)
@@ -3,20 +3,24 @@ from django_filters.rest_framework import DjangoFilterBackend
 from .models import ActivityLog
 from .serializers import ActivityLogSerializer
 from users.permissions import IsAdmin  # Import from your users app
+from backend.pagination import EstimatedCountPagination
+from backend.routers import ReplicaReadMixin
 from django.utils import timezone
 from datetime import datetime
 
-class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
+class ActivityLogViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ActivityLogSerializer
     permission_classes = [IsAdmin]
+    replica_actions = ('list', 'retrieve')
+    pagination_class = EstimatedCountPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['action_type', 'user__username']
-    search_fields = ['description', 'user__username']
+    filterset_fields = ['action_type', 'user_id', 'username']
+    search_fields = ['description', 'username']
     ordering_fields = ['timestamp']
-    ordering = ['-timestamp']  # Default: newest first
+    ordering = ['-timestamp', '-id']  # Default: newest first (activity_time_idx)
 
     def get_queryset(self):
-        queryset = ActivityLog.objects.all().select_related('user')
+        queryset = ActivityLog.objects.all()
         
         # Date range filtering
         start_date = self.request.query_params.get('start_date')
@@ -1,8 +1,14 @@
 # assets/admin.py
 from django.contrib import admin
+from backend.pagination import EstimatedCountPaginator
 from .models import Asset
 
 @admin.register(Asset)
 class AssetAdmin(admin.ModelAdmin):
     list_display = ('id', 'category', 'file_type', 'file_size', 'user', 'created_at', 'is_public')
     search_fields = ('category', 'file_type', 'user__username')
+    list_select_related = ('user',)
+    ordering = ('-id',)  # primary key index
+    # Planner estimates instead of COUNT(*) on the full asset table
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,59 @@
+"""
+Admission control for uploads.
+
+Each process accepts at most UPLOAD_MAX_IN_FLIGHT_BYTES of upload request
+bodies at a time. The check runs before the multipart body is parsed, using
+the request's Content-Length, so a burst of large uploads is turned away
+with 429 + Retry-After instead of filling memory and tying up every worker.
+"""
+
+import threading
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+from .serializers import MAX_UPLOAD_SIZE
+
+
+class InFlightBytes:
+    def __init__(self, limit=None):
+        self._limit = limit
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    @property
+    def limit(self):
+        return self._limit if self._limit is not None else settings.UPLOAD_MAX_IN_FLIGHT_BYTES
+
+    def try_acquire(self, size):
+        with self._lock:
+            # A lone request is always admitted, however large, so it cannot starve.
+            if self.in_flight and self.in_flight + size > self.limit:
+                return False
+            self.in_flight += size
+            return True
+
+    def release(self, size):
+        with self._lock:
+            self.in_flight -= size
+
+
+uploads = InFlightBytes()
+
+
+def request_size(request):
+    """Bytes the request body will take; unknown (chunked) bodies count as the largest upload."""
+    try:
+        size = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        size = 0
+    return size if size > 0 else MAX_UPLOAD_SIZE
+
+
+def busy_response():
+    return Response(
+        {'error': 'Too many uploads in progress, please retry shortly'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(settings.UPLOAD_RETRY_AFTER)},
+    )
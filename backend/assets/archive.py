@@ -0,0 +1,88 @@
+"""
+Streaming ZIP archives of several assets.
+
+The archive is produced as the response is sent: each file is read in small
+blocks and the ZIP bytes are handed to the client as soon as they are written,
+so nothing is built in memory or in a temp file. zipfile writes entries with
+data descriptors when the output is not seekable, which is what makes this work.
+"""
+
+import os
+import zipfile
+
+READ_SIZE = 64 * 1024
+
+# Formats that are already compressed; deflating them again only burns CPU.
+STORED_EXTENSIONS = {
+    'jpg', 'jpeg', 'jfif', 'png', 'gif', 'webp', 'avif', 'heic',
+    'mp4', 'mov', 'avi', 'mkv', 'webm', 'mp3', 'aac', 'ogg',
+    'zip', 'gz', 'bz2', 'xz', '7z', 'rar',
+    'docx', 'xlsx', 'pptx', 'glb', 'usdz',
+}
+
+
+class _StreamBuffer:
+    """Write-only file object collecting what zipfile writes until it is popped."""
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _archive_name(asset, used):
+    base = os.path.basename(asset.file.name)
+    name, ext = os.path.splitext(base)
+    candidate = base
+    counter = 1
+    while candidate in used:
+        candidate = f"{name} ({counter}){ext}"
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+def stream_zip(assets):
+    """Yield the bytes of a ZIP archive containing each asset's file."""
+    buffer = _StreamBuffer()
+    used_names = set()
+
+    with zipfile.ZipFile(buffer, 'w', allowZip64=True) as zf:
+        for asset in assets:
+            try:
+                f = asset.file.open('rb')
+            except FileNotFoundError:
+                continue
+
+            with f:
+                arcname = _archive_name(asset, used_names)
+                info = zipfile.ZipInfo(arcname, date_time=asset.updated_at.timetuple()[:6])
+                ext = os.path.splitext(arcname)[1].lstrip('.').lower()
+                info.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                # Known up front so zipfile can decide on ZIP64 headers.
+                info.file_size = asset.file.size
+
+                with zf.open(info, 'w') as entry:
+                    for block in iter(lambda: f.read(READ_SIZE), b''):
+                        entry.write(block)
+                        data = buffer.pop()
+                        if data:
+                            yield data
+            yield buffer.pop()
+
+    # Central directory
+    yield buffer.pop()
@@ -0,0 +1,146 @@
+"""
+Change feed for incremental sync (GET /api/assets/changes/?since=<cursor>).
+
+Every write path appends an AssetChange row; the row id is the cursor. A
+client keeps the last cursor it saw and asks only for later rows, so a sync
+reads a range of the change table instead of the whole library. Deletions
+(moves to the trash) come back as tombstones. Sharing an asset with a user,
+or taking it away, writes a row addressed to just that user (recipient_id),
+so their next sync picks the asset up or drops it.
+
+Ids are handed out when a row is inserted, not when its transaction commits,
+so a slow transaction could commit a lower id after a client has already
+read past it. The feed therefore only serves rows older than
+CHANGE_FEED_SETTLE_SECONDS.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from backend import events
+from .models import Asset, AssetAccess, AssetChange
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class CursorError(ValueError):
+    pass
+
+
+def _shared_with(asset_ids):
+    """{asset_id: [user ids it is shared with]}"""
+    shared = defaultdict(list)
+    for asset_id, user_id in AssetAccess.objects.filter(asset_id__in=asset_ids).values_list('asset_id', 'user_id'):
+        shared[asset_id].append(user_id)
+    return shared
+
+
+def _publish(change, user_ids):
+    # Push to open event streams (backend/sse.py) of users who can see it
+    events.publish(
+        'asset',
+        {'cursor': change.pk, 'kind': change.kind, 'asset_id': change.asset_id},
+        {'public': change.is_public, 'user_ids': user_ids},
+        event_id=change.pk,
+    )
+
+
+def _publish_all(created):
+    private = [change.asset_id for change in created if not change.is_public]
+    shared = _shared_with(private) if private else {}
+    for change in created:
+        _publish(change, [change.owner_id, *shared.get(change.asset_id, ())])
+
+
+def record(asset, kind, was_public=None):
+    change = AssetChange.objects.create(
+        asset_id=asset.pk,
+        kind=kind,
+        owner_id=asset.user_id,
+        is_public=bool(asset.is_public or was_public),
+    )
+    _publish_all([change])
+
+
+def record_bulk(rows, kind):
+    """rows: (asset_id, owner_id, is_public) tuples, e.g. from values_list()."""
+    created = AssetChange.objects.bulk_create(
+        [
+            AssetChange(asset_id=asset_id, kind=kind, owner_id=owner_id, is_public=is_public)
+            for asset_id, owner_id, is_public in rows
+        ],
+        batch_size=1000,
+    )
+    _publish_all(created)
+
+
+def record_access(pairs):
+    """pairs: (asset_id, user_id) whose access changed; each user hears about their assets."""
+    created = AssetChange.objects.bulk_create(
+        [AssetChange(asset_id=asset_id, kind=AssetChange.UPDATED, recipient_id=user_id) for asset_id, user_id in pairs],
+        batch_size=1000,
+    )
+    for change in created:
+        _publish(change, [change.recipient_id])
+
+
+def parse_cursor(value):
+    if value in (None, ''):
+        return 0
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        raise CursorError("'since' must be a cursor returned by this endpoint")
+    if cursor < 0:
+        raise CursorError("'since' must be a cursor returned by this endpoint")
+    return cursor
+
+
+def _relevant_to(user):
+    """Change rows the user may hear about (the feed's visibility rule)."""
+    changes = AssetChange.objects.all()
+    if getattr(user, 'role', None) == 'Admin':
+        return changes
+    shared = AssetAccess.objects.filter(user=user).values('asset_id')
+    return changes.filter(
+        Q(owner_id=user.pk) | Q(is_public=True) | Q(recipient_id=user.pk) | Q(asset_id__in=shared)
+    )
+
+
+def changes_since(user, cursor, limit=DEFAULT_LIMIT):
+    """
+    Returns (entries, next_cursor, has_more). Each entry is
+    (cursor, 'upsert', asset) or (cursor, 'delete', asset_id); several changes
+    to one asset within a page collapse into its latest state.
+    """
+    settled = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+    rows = list(
+        _relevant_to(user)
+        .filter(id__gt=cursor, created_at__lte=settled)
+        .order_by('id')
+        .values_list('id', 'asset_id')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], cursor, False
+
+    latest = {}
+    for change_id, asset_id in rows:
+        latest[asset_id] = change_id
+    visible = Asset.objects.visible_to(user).in_bulk(list(latest))
+
+    entries = []
+    for asset_id, change_id in sorted(latest.items(), key=lambda item: item[1]):
+        asset = visible.get(asset_id)
+        if asset is not None:
+            entries.append((change_id, 'upsert', asset))
+        else:
+            # Trashed, purged or no longer visible to this user
+            entries.append((change_id, 'delete', asset_id))
+    return entries, rows[-1][0], has_more
@@ -0,0 +1,227 @@
+"""
+Trash, purge and storage garbage collection.
+
+Deleting an asset only moves it to the trash (deleted_at is set), so it can
+be restored. Trashed assets are hard-deleted later by the purge job in small
+batches, each its own short transaction, and their files are removed once
+the batch has committed. The GC sweep finds files that no row references
+(left behind by crashes, cascades or failed uploads) and reclaims them.
+"""
+
+import logging
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import router, transaction
+from django.utils import timezone
+
+from . import changes, usage
+from .models import Asset, AssetChange, Chunk, RevisionChunk
+from .revisions import _chunk_path
+from .storage import TieredStorage
+
+logger = logging.getLogger(__name__)
+
+MEDIA_PREFIXES = ('uploads', 'thumbnails')
+
+
+def trash(asset):
+    """Soft-delete one asset. Returns False if it was already trashed."""
+    now = timezone.now()
+    if not Asset.objects.filter(pk=asset.pk).update(deleted_at=now):
+        return False
+    asset.deleted_at = now
+    usage.record_deleted(asset)
+    changes.record(asset, AssetChange.DELETED)
+    return True
+
+
+def trash_assets(queryset):
+    """Soft-delete every live asset in queryset. Returns the number trashed."""
+    with transaction.atomic():
+        rows = usage.grouped_usage(queryset)
+        tombstones = list(queryset.values_list('id', 'user_id', 'is_public'))
+        count = queryset.update(deleted_at=timezone.now())
+        usage.record_bulk_deleted(rows)
+        changes.record_bulk(tombstones, AssetChange.DELETED)
+    return count
+
+
+def restore(asset):
+    """Take an asset out of the trash. Returns False if it was not trashed."""
+    if not Asset.all_objects.filter(pk=asset.pk, deleted_at__isnull=False).update(deleted_at=None):
+        return False
+    asset.deleted_at = None
+    usage.record_created(asset)
+    changes.record(asset, AssetChange.CREATED)
+    return True
+
+
+def _delete_file(name):
+    if not name:
+        return
+    try:
+        default_storage.delete(name)
+    except Exception:
+        logger.exception("Could not delete %s", name)
+
+
+def purge_assets(queryset, batch_size=None):
+    """
+    Hard-delete the assets in queryset, batch_size rows per transaction, and
+    remove their files. Returns the number of assets purged.
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    purged = 0
+    while True:
+        batch = list(queryset.order_by('pk').values_list('pk', 'file', 'thumbnail')[:batch_size])
+        if not batch:
+            return purged
+        with transaction.atomic():
+            Asset.all_objects.filter(pk__in=[pk for pk, _, _ in batch]).delete()
+        # Only after the rows are gone, so a failed batch never loses files
+        for _, file_name, thumbnail in batch:
+            _delete_file(file_name)
+            _delete_file(thumbnail)
+        purged += len(batch)
+
+
+def purge_expired_trash(older_than_days=None, batch_size=None):
+    days = settings.TRASH_RETENTION_DAYS if older_than_days is None else older_than_days
+    cutoff = timezone.now() - timedelta(days=days)
+    return purge_assets(Asset.all_objects.filter(deleted_at__lt=cutoff), batch_size)
+
+
+def delete_in_batches(queryset, batch_size=None):
+    """Delete any model's rows a batch at a time. Returns the number deleted."""
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        with transaction.atomic(using=router.db_for_write(queryset.model)):
+            queryset.model._base_manager.filter(pk__in=pks).delete()
+        deleted += len(pks)
+
+
+# -- Garbage collection ---------------------------------------------------
+
+def _walk_storage(storage, path):
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield f"{path}/{name}"
+    for directory in directories:
+        yield from _walk_storage(storage, f"{path}/{directory}")
+
+
+def _walk_dir(root):
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            yield os.path.join(dirpath, filename)
+
+
+def _referenced_media():
+    names = set()
+    for file_name, thumbnail in Asset.all_objects.values_list('file', 'thumbnail').iterator(chunk_size=5000):
+        names.add(file_name)
+        if thumbnail:
+            names.add(thumbnail)
+    return names
+
+
+def find_orphans(grace=None):
+    """
+    Yield (kind, name, size) for storage no row references. Anything newer
+    than the grace period is skipped: uploads write the file before the row
+    commits, and revisions write chunks before recording them.
+    """
+    grace = timedelta(hours=settings.GC_GRACE_HOURS) if grace is None else grace
+    cutoff = timezone.now() - grace
+    cutoff_ts = cutoff.timestamp()
+    referenced = _referenced_media()
+
+    for prefix in MEDIA_PREFIXES:
+        try:
+            names = list(_walk_storage(default_storage, prefix))
+        except FileNotFoundError:
+            continue
+        for name in names:
+            if name in referenced or default_storage.get_modified_time(name).timestamp() >= cutoff_ts:
+                continue
+            yield 'media', name, default_storage.size(name)
+
+    if isinstance(default_storage, TieredStorage):
+        root = default_storage.archive_location
+        for path in _walk_dir(root):
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            if name.endswith('.gz') and name[:-3] in referenced:
+                continue
+            if os.path.getmtime(path) >= cutoff_ts:
+                continue
+            yield 'archive', path, os.path.getsize(path)
+
+    # Chunk rows no revision uses any more (their assets were purged)
+    unused = (
+        Chunk.objects.filter(created_at__lt=cutoff)
+        .exclude(digest__in=RevisionChunk.objects.values('chunk_id'))
+        .values_list('digest', 'size')
+    )
+    unused = list(unused)  # fetched up front: the caller deletes as we go
+    unused_digests = {digest for digest, _ in unused}
+    for digest, size in unused:
+        yield 'chunk', digest, size
+
+    # Chunk files without a row: crashed store_revision calls and temp files
+    for dirpath, _, filenames in os.walk(settings.CHUNK_STORE_DIR):
+        candidates = {
+            filename: os.path.join(dirpath, filename)
+            for filename in filenames
+            if filename not in unused_digests and os.path.getmtime(os.path.join(dirpath, filename)) < cutoff_ts
+        }
+        if not candidates:
+            continue
+        known = set(Chunk.objects.filter(digest__in=list(candidates)).values_list('digest', flat=True))
+        for filename, path in candidates.items():
+            if filename not in known:
+                yield 'chunk_file', path, os.path.getsize(path)
+
+
+def reclaim(kind, name):
+    """Remove one orphan reported by find_orphans()."""
+    if kind == 'media':
+        default_storage.delete(name)
+    elif kind in ('archive', 'chunk_file'):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+    elif kind == 'chunk':
+        # Re-check under the delete: a new revision may have reused it.
+        deleted, _ = (
+            Chunk.objects.filter(digest=name)
+            .exclude(digest__in=RevisionChunk.objects.values('chunk_id'))
+            .delete()
+        )
+        if deleted:
+            try:
+                os.remove(_chunk_path(name))
+            except FileNotFoundError:
+                pass
+
+
+def collect_garbage(dry_run=False, grace=None, report=None):
+    """Find and (unless dry_run) remove orphans. Returns (counts, bytes) per kind."""
+    counts = Counter()
+    sizes = Counter()
+    for kind, name, size in find_orphans(grace):
+        if report:
+            report(kind, name, size)
+        if not dry_run:
+            reclaim(kind, name)
+        counts[kind] += 1
+        sizes[kind] += size
+    return counts, sizes
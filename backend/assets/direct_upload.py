@@ -0,0 +1,97 @@
+"""
+Direct-to-object-store transfers. When asset files live in an S3-compatible
+bucket, clients upload with a presigned PUT and download with a presigned
+GET, so file bytes never pass through a Django worker.
+"""
+
+import os
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.utils.text import get_valid_filename
+
+UPLOAD_TOKEN_SALT = 'assets.direct_upload'
+UPLOAD_PREFIXES = {
+    'file': 'uploads/',
+    'thumbnail': 'thumbnails/',
+}
+
+
+class DirectUploadError(Exception):
+    pass
+
+
+def s3_enabled():
+    try:
+        from storages.backends.s3 import S3Storage
+    except ImportError:
+        return False
+    return isinstance(default_storage, S3Storage)
+
+
+def _client():
+    return default_storage.connection.meta.client
+
+
+def _object_key(name):
+    # Apply the storage's `location` prefix the same way S3Storage does.
+    from storages.utils import clean_name
+    return default_storage._normalize_name(clean_name(name))
+
+
+def create_upload(user, filename, content_type, kind='file'):
+    """Reserve a storage name and return (upload token, presigned PUT URL)."""
+    if kind not in UPLOAD_PREFIXES:
+        raise DirectUploadError(f"'kind' must be one of: {', '.join(UPLOAD_PREFIXES)}")
+
+    try:
+        safe_name = get_valid_filename(os.path.basename(filename or ''))
+    except SuspiciousFileOperation:
+        safe_name = 'upload'
+    name = f"{UPLOAD_PREFIXES[kind]}{uuid.uuid4().hex}/{safe_name}"
+    url = _client().generate_presigned_url(
+        'put_object',
+        Params={
+            'Bucket': default_storage.bucket_name,
+            'Key': _object_key(name),
+            'ContentType': content_type or 'application/octet-stream',
+        },
+        ExpiresIn=settings.DIRECT_UPLOAD_URL_EXPIRY,
+    )
+    token = signing.dumps({'name': name, 'user': user.pk, 'kind': kind}, salt=UPLOAD_TOKEN_SALT)
+    return token, url
+
+
+def resolve_upload(user, token, kind='file'):
+    """Check an upload token and that the object exists; return (name, size)."""
+    try:
+        data = signing.loads(token, salt=UPLOAD_TOKEN_SALT, max_age=settings.DIRECT_UPLOAD_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        raise DirectUploadError('Invalid or expired upload token')
+    if data.get('user') != user.pk or data.get('kind') != kind:
+        raise DirectUploadError('Invalid or expired upload token')
+
+    try:
+        head = _client().head_object(Bucket=default_storage.bucket_name, Key=_object_key(data['name']))
+    except Exception:
+        raise DirectUploadError('The file has not been uploaded yet')
+    return data['name'], head['ContentLength']
+
+
+def discard_upload(name):
+    default_storage.delete(name)
+
+
+def download_url(asset):
+    """Presigned GET for S3 storage, or the regular media URL otherwise."""
+    if not s3_enabled():
+        return asset.file.url
+    filename = os.path.basename(asset.file.name)
+    return default_storage.url(
+        asset.file.name,
+        parameters={'ResponseContentDisposition': f'attachment; filename="{filename}"'},
+        expire=settings.DIRECT_DOWNLOAD_URL_EXPIRY,
+    )
@@ -0,0 +1,117 @@
+"""
+Facet counts for the asset list (?facets=true).
+
+On Postgres all scalar facets come from one GROUPING SETS query over the
+filtered queryset, and tag counts from one more query that unnests the tags
+array. Other databases fall back to one grouped query per facet.
+"""
+
+from collections import Counter
+
+from django.db import connections
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+TOP_TAGS = 20
+
+# GROUPING(file_type, category, month, is_public) bitmask -> facet name
+_GROUPING_SETS = {
+    0b0111: 'file_type',
+    0b1011: 'category',
+    0b1101: 'created_at',
+    0b1110: 'is_public',
+}
+
+
+def _bucket(value):
+    return value.strftime('%Y-%m') if value else None
+
+
+def _entries(counts):
+    return [
+        {'value': value, 'count': count}
+        for value, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+        if value not in (None, '')
+    ]
+
+
+def compute_facets(queryset, top_tags=TOP_TAGS):
+    queryset = queryset.order_by()
+    if connections[queryset.db].vendor == 'postgresql':
+        facets = _postgres_facets(queryset, top_tags)
+    else:
+        facets = _generic_facets(queryset, top_tags)
+    # Date buckets read better in chronological order.
+    facets['created_at'].sort(key=lambda entry: entry['value'])
+    return facets
+
+
+def _postgres_facets(queryset, top_tags):
+    inner, params = queryset.values(
+        'id', 'file_type', 'category', 'created_at', 'is_public', 'tags'
+    ).query.sql_with_params()
+
+    counts = {name: Counter() for name in _GROUPING_SETS.values()}
+    month = "date_trunc('month', f.created_at)"
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT f.file_type, f.category, {month}, f.is_public,
+                   GROUPING(f.file_type, f.category, {month}, f.is_public), COUNT(*)
+            FROM ({inner}) AS f
+            GROUP BY GROUPING SETS ((f.file_type), (f.category), ({month}), (f.is_public))
+            """,
+            params,
+        )
+        for file_type, category, created, is_public, grouping, count in cursor.fetchall():
+            name = _GROUPING_SETS[grouping]
+            value = {
+                'file_type': file_type,
+                'category': category,
+                'created_at': _bucket(created),
+                'is_public': is_public,
+            }[name]
+            counts[name][value] += count
+
+        cursor.execute(
+            f"""
+            SELECT t.tag, COUNT(*)
+            FROM ({inner}) AS f
+            CROSS JOIN LATERAL jsonb_array_elements_text(
+                CASE WHEN jsonb_typeof(f.tags) = 'array' THEN f.tags ELSE '[]'::jsonb END
+            ) AS t(tag)
+            GROUP BY t.tag
+            ORDER BY COUNT(*) DESC, t.tag
+            LIMIT %s
+            """,
+            (*params, top_tags),
+        )
+        tags = [{'value': tag, 'count': count} for tag, count in cursor.fetchall()]
+
+    facets = {name: _entries(counter) for name, counter in counts.items()}
+    facets['tags'] = tags
+    return facets
+
+
+def _generic_facets(queryset, top_tags):
+    def grouped(field):
+        return Counter({
+            row[field]: row['n'] for row in queryset.values(field).annotate(n=Count('id'))
+        })
+
+    months = Counter()
+    for row in queryset.annotate(month=TruncMonth('created_at')).values('month').annotate(n=Count('id')):
+        months[_bucket(row['month'])] += row['n']
+
+    tags = Counter()
+    for tag_list in queryset.values_list('tags', flat=True).iterator():
+        if isinstance(tag_list, list):
+            tags.update(str(tag) for tag in tag_list)
+
+    return {
+        'file_type': _entries(grouped('file_type')),
+        'category': _entries(grouped('category')),
+        'created_at': _entries(months),
+        'is_public': _entries(grouped('is_public')),
+        'tags': [{'value': tag, 'count': count} for tag, count in tags.most_common(top_tags)],
+    }
@@ -0,0 +1,259 @@
+"""
+Bulk import of a directory tree (manage.py ingest_tree), e.g. a NAS share.
+
+A walker thread lists the tree one directory at a time into a bounded
+queue. The main thread drops files an earlier run already imported
+(IngestedFile rows) and keeps at most `in_flight` files on a process pool,
+where each file is hashed, sniffed for its type, perceptually hashed and
+given a colour palette if it is an image, and copied into storage. Finished
+files are inserted with bulk_create in batches; a batch commits its assets
+together with their IngestedFile rows, palette colours, usage counters, tag
+rows and change-feed entries, so an
+interrupted run resumes exactly where it stopped. Files copied for a batch
+that never committed are left for gc_media to reclaim.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from . import changes, palette, suggest, usage
+from .ingest_worker import init_worker, inspect_file
+from .models import Asset, AssetChange, AssetColor, IngestedFile
+from .phash import phash_fields
+
+_END = object()
+
+DEFAULT_BATCH_SIZE = 500
+REPORT_SECONDS = 10
+LOOKUP_BATCH = 1000
+
+
+def walk(root):
+    """Yield (dirpath, [(path, size)]) for the regular files of each directory."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        files = []
+        subdirectories = []
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False):
+                    files.append((entry.path, entry.stat(follow_symlinks=False).st_size))
+                elif entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+            except OSError:
+                continue
+        stack.extend(reversed(subdirectories))
+        if files:
+            yield directory, files
+
+
+class TreeIngest:
+    """One ingest_tree run; see the module docstring."""
+
+    def __init__(self, root, user, processes=None, batch_size=DEFAULT_BATCH_SIZE, in_flight=None,
+                 max_size=None, is_public=False, tags=(), dir_tags=False, skip_duplicates=False, report=None):
+        self.root = os.path.abspath(root)
+        self.user = user
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.in_flight = in_flight or self.processes * 4
+        self.max_size = max_size
+        self.is_public = is_public
+        self.tags = list(tags)
+        self.dir_tags = dir_tags
+        self.skip_duplicates = skip_duplicates
+        self.report = report or (lambda message: None)
+        self.stats = Counter()
+        self.started = None
+
+    # -- producer ------------------------------------------------------------
+
+    def _walk_into(self, directories, stop):
+        try:
+            for item in walk(self.root):
+                while not stop.is_set():
+                    try:
+                        directories.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        finally:
+            directories.put(_END)
+
+    def _new_files(self, files):
+        """Files of one directory that still need importing."""
+        wanted = []
+        for path, size in files:
+            self.stats['seen'] += 1
+            if self.max_size is not None and size > self.max_size:
+                self.stats['too_large'] += 1
+                self.report(f"skipped (too large): {path}")
+            else:
+                wanted.append(path)
+        done = set()
+        for start in range(0, len(wanted), LOOKUP_BATCH):
+            done.update(
+                IngestedFile.objects.filter(source__in=wanted[start:start + LOOKUP_BATCH]).values_list('source', flat=True)
+            )
+        self.stats['already_imported'] += len(done)
+        return [path for path in wanted if path not in done]
+
+    # -- consumer ------------------------------------------------------------
+
+    def _asset_tags(self, path):
+        tags = list(self.tags)
+        if self.dir_tags:
+            relative = os.path.relpath(os.path.dirname(path), self.root)
+            if relative != os.curdir:
+                tags.extend(part for part in relative.split(os.sep) if part)
+        return list(dict.fromkeys(tags))
+
+    def _flush(self, results):
+        if not results:
+            return
+        assets = []
+        records = []
+        colors = []
+        # Workers only see batches that had committed when they hashed a file;
+        # batches are flushed one at a time, so checking here again is complete.
+        known = {}
+        if self.skip_duplicates:
+            known = dict(
+                IngestedFile.objects.filter(
+                    sha256__in={result['sha256'] for result in results}, asset__isnull=False,
+                ).values_list('sha256', 'asset_id')
+            )
+        for result in results:
+            if 'duplicate_of' in result:
+                records.append(IngestedFile(source=result['path'], sha256=result['sha256'], asset_id=result['duplicate_of']))
+                continue
+            if result['sha256'] in known:
+                default_storage.delete(result['file'])
+                duplicate = known[result['sha256']]
+                records.append(IngestedFile(
+                    source=result['path'], sha256=result['sha256'],
+                    **({'asset': duplicate} if isinstance(duplicate, Asset) else {'asset_id': duplicate}),
+                ))
+                continue
+            asset = Asset(
+                user=self.user,
+                file=result['file'],
+                name=os.path.basename(result['path'])[:255],
+                file_type=result['file_type'],
+                file_size=result['size'],
+                tags=self._asset_tags(result['path']),
+                is_public=self.is_public,
+                palette=palette.encode(result['palette']),
+                **phash_fields(result['phash']),
+                phash_attempted=result['file_type'] == 'IMG',
+            )
+            assets.append(asset)
+            colors.extend(palette.color_rows(asset, result['palette']))
+            records.append(IngestedFile(source=result['path'], sha256=result['sha256'], asset=asset))
+            if self.skip_duplicates:
+                known[result['sha256']] = asset
+
+        with transaction.atomic():
+            Asset.objects.bulk_create(assets, batch_size=self.batch_size)
+            IngestedFile.objects.bulk_create(records, batch_size=self.batch_size)
+            AssetColor.objects.bulk_create(colors, batch_size=self.batch_size)
+            usage.record_bulk_created(assets)
+            suggest.sync_tags_bulk(assets)
+            changes.record_bulk([(asset.pk, asset.user_id, asset.is_public) for asset in assets], AssetChange.CREATED)
+
+        self.stats['imported'] += len(assets)
+        self.stats['duplicates'] += len(records) - len(assets)
+        self.stats['bytes'] += sum(asset.file_size for asset in assets)
+
+    def rate(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (self.stats['imported'] + self.stats['duplicates']) / elapsed
+
+    def progress(self):
+        s = self.stats
+        return (
+            f"{s['seen']} seen, {s['imported']} imported, {s['duplicates']} duplicate(s), "
+            f"{s['already_imported']} already imported, {s['failed']} failed, {s['too_large']} too large "
+            f"- {self.rate():.1f} files/s"
+        )
+
+    def run(self):
+        self.started = time.monotonic()
+        directories = queue.Queue(maxsize=max(self.in_flight // 8, 4))
+        stop = threading.Event()
+        walker = threading.Thread(target=self._walk_into, args=(directories, stop), name='ingest-walker', daemon=True)
+
+        # Forked workers must not share this process's database connections.
+        connections.close_all()
+        pool = ProcessPoolExecutor(max_workers=self.processes, initializer=init_worker)
+        walker.start()
+
+        candidates = deque()
+        pending = set()
+        batch = []
+        walked = False
+        next_report = self.started + REPORT_SECONDS
+        try:
+            while True:
+                while len(pending) < self.in_flight:
+                    if candidates:
+                        pending.add(pool.submit(inspect_file, candidates.popleft(), self.skip_duplicates))
+                        continue
+                    if walked:
+                        break
+                    try:
+                        # Only wait for the walker when there is nothing else to do
+                        item = directories.get(block=not pending, timeout=1)
+                    except queue.Empty:
+                        break
+                    if item is _END:
+                        walked = True
+                    else:
+                        candidates.extend(self._new_files(item[1]))
+
+                if not pending:
+                    if walked and not candidates:
+                        break
+                    continue
+
+                done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if 'error' in result:
+                        self.stats['failed'] += 1
+                        self.report(f"failed: {result['path']}: {result['error']}")
+                    else:
+                        batch.append(result)
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+
+                if time.monotonic() >= next_report:
+                    self.report(self.progress())
+                    next_report += REPORT_SECONDS
+        finally:
+            stop.set()
+            # Keep what has finished; files still in the pool are redone next run.
+            pool.shutdown(wait=True, cancel_futures=True)
+            for future in pending:
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    result = future.result()
+                    if 'error' not in result:
+                        batch.append(result)
+            self._flush(batch)
+        return self.stats
@@ -0,0 +1,122 @@
+"""
+Per-file work of `manage.py ingest_tree` (see assets/ingest.py), run in its
+process pool. Nothing here imports models at module level, so spawned
+workers can load this module before init_worker() has set Django up.
+"""
+
+import hashlib
+import os
+import signal
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils.text import get_valid_filename
+
+HEAD_BYTES = 64
+READ_SIZE = 1024 * 1024
+
+EXTENSION_TYPES = {
+    **dict.fromkeys(['jpg', 'jpeg', 'png', 'gif', 'bmp', 'tif', 'tiff', 'webp', 'heic', 'avif', 'svg'], 'IMG'),
+    **dict.fromkeys(['mp4', 'mov', 'm4v', 'avi', 'mkv', 'webm', 'wmv', 'mpg', 'mpeg'], 'VID'),
+    **dict.fromkeys(['obj', 'fbx', 'gltf', 'glb', 'stl', 'blend', '3ds', 'dae', 'ply', 'usd', 'usdz'], '3D'),
+    **dict.fromkeys(
+        ['pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'odt', 'ods', 'rtf', 'txt', 'md', 'csv'], 'DOC'
+    ),
+}
+
+# (offset, magic bytes, file type), checked in order; the content wins over a
+# missing or wrong extension. Containers such as ZIP are left to the extension.
+MAGIC = [
+    (0, b'\xff\xd8\xff', 'IMG'),
+    (0, b'\x89PNG\r\n\x1a\n', 'IMG'),
+    (0, b'GIF8', 'IMG'),
+    (0, b'II*\x00', 'IMG'),
+    (0, b'MM\x00*', 'IMG'),
+    (8, b'WEBP', 'IMG'),
+    (4, b'ftypheic', 'IMG'),
+    (4, b'ftypheix', 'IMG'),
+    (4, b'ftypmif1', 'IMG'),
+    (4, b'ftypavif', 'IMG'),
+    (4, b'ftyp', 'VID'),
+    (0, b'\x1aE\xdf\xa3', 'VID'),
+    (8, b'AVI ', 'VID'),
+    (0, b'glTF', '3D'),
+    (0, b'Kaydara FBX Binary', '3D'),
+    (0, b'BLENDER', '3D'),
+    (0, b'ply\n', '3D'),
+    (0, b'%PDF', 'DOC'),
+    (0, b'\xd0\xcf\x11\xe0', 'DOC'),  # OLE2: legacy Office files
+]
+
+def sniff(head, extension):
+    """One of Asset.FILE_TYPES from the first bytes of a file and its extension."""
+    for offset, magic, file_type in MAGIC:
+        if head.startswith(magic, offset):
+            return file_type
+    return EXTENSION_TYPES.get(extension, 'OTH')
+
+
+def _storage_name(path, digest):
+    try:
+        filename = get_valid_filename(os.path.basename(path))
+    except SuspiciousFileOperation:
+        filename = 'file'
+    return f"uploads/{digest[:2]}/{digest[2:12]}/{filename}"
+
+
+def init_worker():
+    import django
+    # Ctrl-C is handled by the parent, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    django.setup()
+
+
+def inspect_file(path, skip_duplicates=False):
+    """
+    Runs in the pool: hash, type and (for images) pHash and palette one file,
+    then copy it into storage. Returns a dict describing it; never raises for a bad file.
+    """
+    from django.core.files import File
+    from django.core.files.storage import default_storage
+    from PIL import Image
+
+    from .models import Asset, IngestedFile
+    from .palette import compute_palette
+    from .phash import compute_phash
+
+    try:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            head = f.read(HEAD_BYTES)
+            digest.update(head)
+            size = len(head)
+            for block in iter(lambda: f.read(READ_SIZE), b''):
+                digest.update(block)
+                size += len(block)
+        sha256 = digest.hexdigest()
+
+        if skip_duplicates:
+            duplicate = IngestedFile.objects.filter(sha256=sha256).values_list('asset_id', flat=True).first()
+            if duplicate is not None:
+                return {'path': path, 'sha256': sha256, 'duplicate_of': duplicate}
+
+        file_type = sniff(head, os.path.splitext(path)[1].lower().lstrip('.'))
+        value = None
+        colors = []
+        if file_type == 'IMG':
+            try:
+                value = compute_phash(path)
+                colors = compute_palette(path)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                pass
+
+        with open(path, 'rb') as f:
+            name = default_storage.save(
+                _storage_name(path, sha256), File(f), max_length=Asset._meta.get_field('file').max_length,
+            )
+    except Exception as e:
+        # Whatever goes wrong with one file is reported, not raised into the run
+        return {'path': path, 'error': str(e) or type(e).__name__}
+    return {
+        'path': path, 'sha256': sha256, 'size': size, 'file_type': file_type,
+        'phash': value, 'palette': colors, 'file': name,
+    }
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from assets.recommendations import TOP_K, refresh
+from assets.tasks import refresh_related
+
+
+class Command(BaseCommand):
+    help = "Recompute related-asset lists (see assets/recommendations.py); run it periodically."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recompute every list, not just changed ones.")
+        parser.add_argument(
+            '--neighbours', type=int, default=TOP_K,
+            help="Neighbours stored per asset.",
+        )
+        parser.add_argument('--enqueue', action='store_true', help="Queue a job instead of building here.")
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            job = refresh_related.enqueue(args={'full': options['full']}, dedup_key='assets.refresh_related')
+            self.stdout.write(self.style.SUCCESS(f"Queued job {job.pk}."))
+            return
+
+        summary = refresh(full=options['full'], k=max(1, options['neighbours']))
+        mode = 'full' if summary['full'] else 'incremental'
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {summary['recomputed']} of {summary['assets']} asset(s) ({mode}, up to change #{summary['cursor']})."
+        ))
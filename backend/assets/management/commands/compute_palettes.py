@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from assets.models import Asset
+from assets.palette import update_asset_palette
+
+
+class Command(BaseCommand):
+    help = "Extract dominant colour palettes for image assets that do not have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recompute palettes for every image asset.")
+
+    def handle(self, *args, **options):
+        assets = Asset.objects.filter(file_type='IMG')
+        if not options['all']:
+            assets = assets.filter(palette__isnull=True)
+
+        extracted = failed = 0
+        for asset in assets.iterator(chunk_size=500):
+            if update_asset_palette(asset) is None:
+                failed += 1
+            else:
+                extracted += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Extracted {extracted} palette(s), {failed} unreadable."))
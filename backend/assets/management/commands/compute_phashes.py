@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from assets.models import Asset
+from assets.phash import update_asset_phash
+
+
+class Command(BaseCommand):
+    help = "Compute perceptual hashes for image assets that do not have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recompute hashes for every image asset.")
+
+    def handle(self, *args, **options):
+        assets = Asset.objects.filter(file_type='IMG')
+        if not options['all']:
+            assets = assets.filter(phash_attempted=False)
+
+        hashed = failed = 0
+        for asset in assets.iterator(chunk_size=500):
+            if update_asset_phash(asset) is None:
+                failed += 1
+            else:
+                hashed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Hashed {hashed} image(s), {failed} unreadable."))
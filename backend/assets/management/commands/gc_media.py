@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from assets.cleanup import collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Remove stored files (media, archive, revision chunks) that no database row references."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=settings.GC_GRACE_HOURS,
+            help="Leave files younger than this alone (they may belong to uploads in progress).",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be removed.")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        verb = "would remove" if dry_run else "removed"
+
+        def report(kind, name, size):
+            if dry_run or options['verbosity'] > 1:
+                self.stdout.write(f"{verb} {kind}: {name} ({size} bytes)")
+
+        counts, sizes = collect_garbage(
+            dry_run=dry_run, grace=timedelta(hours=options['grace_hours']), report=report,
+        )
+        for kind in sorted(counts):
+            self.stdout.write(f"{kind}: {counts[kind]} file(s), {sizes[kind]} bytes")
+        total = sum(sizes.values())
+        message = f"{sum(counts.values())} orphan(s), {total} bytes {verb}."
+        self.stdout.write(self.style.SUCCESS(message) if not dry_run else message)
@@ -0,0 +1,71 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from activitylog.models import ActivityLog
+from assets.ingest import DEFAULT_BATCH_SIZE, TreeIngest
+from assets.serializers import MAX_UPLOAD_SIZE
+from users.models import User
+
+# Asset.file_size is a PositiveIntegerField
+FILE_SIZE_LIMIT = 2 ** 31 - 1
+
+
+class Command(BaseCommand):
+    help = "Import every file under a directory as assets (resumable; see assets/ingest.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Directory to import, e.g. a mounted NAS share.")
+        parser.add_argument('--user', required=True, help="Username that will own the assets.")
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 1,
+            help="Worker processes for hashing, type sniffing and copying.",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help="Assets inserted per transaction (also the resume granularity).",
+        )
+        parser.add_argument(
+            '--max-size', type=int, default=MAX_UPLOAD_SIZE,
+            help=f"Skip files larger than this many bytes (at most {FILE_SIZE_LIMIT}).",
+        )
+        parser.add_argument('--public', action='store_true', help="Make the imported assets public.")
+        parser.add_argument('--tag', action='append', default=[], help="Tag every imported asset (repeatable).")
+        parser.add_argument('--dir-tags', action='store_true', help="Also tag assets with their directory names.")
+        parser.add_argument(
+            '--skip-duplicates', action='store_true',
+            help="Don't import files whose content matches an already imported file.",
+        )
+
+    def handle(self, *args, **options):
+        root = options['path']
+        if not os.path.isdir(root):
+            raise CommandError(f"{root} is not a directory.")
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{options['user']}'.")
+
+        ingest = TreeIngest(
+            root,
+            user,
+            processes=max(options['processes'], 1),
+            batch_size=max(options['batch_size'], 1),
+            max_size=min(options['max_size'], FILE_SIZE_LIMIT),
+            is_public=options['public'],
+            tags=options['tag'],
+            dir_tags=options['dir_tags'],
+            skip_duplicates=options['skip_duplicates'],
+            report=self.stdout.write,
+        )
+        self.stdout.write(f"Importing {ingest.root} with {ingest.processes} process(es)")
+        try:
+            stats = ingest.run()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING(f"Interrupted: {ingest.progress()}. Run again to resume."))
+            return
+
+        ActivityLog.log(user, 'upload', f"Imported {stats['imported']} asset(s) from {ingest.root}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {ingest.progress()}, {stats['bytes']} bytes."
+        ))
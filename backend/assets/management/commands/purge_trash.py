@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from assets.cleanup import purge_expired_trash
+from assets.tasks import purge_trash
+
+
+class Command(BaseCommand):
+    help = "Permanently delete assets that have been in the trash too long."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=settings.TRASH_RETENTION_DAYS,
+            help="Purge assets trashed more than this many days ago.",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.PURGE_BATCH_SIZE,
+            help="Assets deleted per transaction.",
+        )
+        parser.add_argument('--enqueue', action='store_true', help="Queue a job instead of purging here.")
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            job = purge_trash.enqueue(
+                args={'older_than_days': options['older_than_days']}, dedup_key='assets.purge_trash',
+            )
+            self.stdout.write(self.style.SUCCESS(f"Queued job {job.pk}."))
+            return
+
+        purged = purge_expired_trash(options['older_than_days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} asset(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from assets.sharing import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the asset access table from the sharing grants (see assets/sharing.py)."
+
+    def handle(self, *args, **options):
+        added, removed = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Access table rebuilt: {added} row(s) added, {removed} removed."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from assets.usage import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute the asset usage counters from the Asset table to correct any drift."
+
+    def handle(self, *args, **options):
+        corrected = reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled usage counters, {corrected} row(s) corrected."))
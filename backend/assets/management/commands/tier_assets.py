@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from assets.tiering import archive_asset, select_cold_assets, tiering_enabled
+
+
+class Command(BaseCommand):
+    help = "Move cold asset files to the compressed archive tier."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cold-after-days', type=int, default=settings.TIER_COLD_AFTER_DAYS,
+            help="Archive assets not accessed for this many days.",
+        )
+        parser.add_argument(
+            '--hot-max-bytes', type=int, default=settings.HOT_TIER_MAX_BYTES,
+            help="Also archive least recently used assets until the hot tier fits in this many bytes.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be archived.")
+
+    def handle(self, *args, **options):
+        if not tiering_enabled():
+            raise CommandError("The default storage is not assets.storage.TieredStorage.")
+
+        assets = select_cold_assets(options['cold_after_days'], options['hot_max_bytes'])
+        total_bytes = sum(asset.file_size for asset in assets)
+
+        if options['dry_run']:
+            for asset in assets:
+                self.stdout.write(f"would archive [id={asset.id}] {asset.file.name} ({asset.file_size} bytes)")
+            self.stdout.write(f"{len(assets)} asset(s), {total_bytes} bytes would be archived.")
+            return
+
+        archived = 0
+        for asset in assets:
+            if archive_asset(asset):
+                archived += 1
+            else:
+                self.stderr.write(f"Skipped [id={asset.id}] {asset.file.name}: file not on the hot tier")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} asset(s), {total_bytes} bytes."))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0004_rename_uploaded_at_asset_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='phash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='phash_band0',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='phash_band1',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='phash_band2',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='phash_band3',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
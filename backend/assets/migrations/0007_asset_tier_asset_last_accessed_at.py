@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0006_chunk_assetrevision_revisionchunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='tier',
+            field=models.CharField(choices=[('hot', 'Hot'), ('cold', 'Cold (archived)')], db_index=True, default='hot', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='last_accessed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_counters(apps, schema_editor):
+    Asset = apps.get_model('assets', 'Asset')
+    UsageCounter = apps.get_model('assets', 'UsageCounter')
+    rows = (
+        Asset.objects.order_by()
+        .values('user_id', 'file_type')
+        .annotate(count=Count('id'), public=Count('id', filter=Q(is_public=True)), size=Sum('file_size'))
+    )
+    UsageCounter.objects.bulk_create([
+        UsageCounter(
+            user_id=row['user_id'],
+            file_type=row['file_type'],
+            asset_count=row['count'],
+            public_count=row['public'],
+            total_bytes=row['size'] or 0,
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0007_asset_tier_asset_last_accessed_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_type', models.CharField(max_length=50)),
+                ('asset_count', models.BigIntegerField(default=0)),
+                ('public_count', models.BigIntegerField(default=0)),
+                ('total_bytes', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'file_type'), name='unique_usage_counter')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # tags @> '["car"]'
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS asset_tags_gin_idx ON assets_asset USING gin (tags jsonb_path_ops)'
+    )
+    # name__icontains compiles to UPPER("name"::text) LIKE UPPER(%s)
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS asset_name_trgm_idx ON assets_asset USING gin ((UPPER("name"::text)) gin_trgm_ops)'
+    )
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS asset_tags_gin_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS asset_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0008_usagecounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['-created_at'], name='asset_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['file_type', '-created_at'], name='asset_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['category'], name='asset_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['file_size'], name='asset_size_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['polygon_count'], name='asset_polys_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['name'], name='asset_name_idx'),
+        ),
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
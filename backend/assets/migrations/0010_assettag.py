@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_tags(apps, schema_editor):
+    Asset = apps.get_model('assets', 'Asset')
+    AssetTag = apps.get_model('assets', 'AssetTag')
+    rows = []
+    for asset_id, tags in Asset.objects.values_list('id', 'tags').iterator():
+        if not isinstance(tags, list):
+            continue
+        for tag in {str(t).strip()[:100] for t in tags}:
+            if tag:
+                rows.append(AssetTag(asset_id=asset_id, tag=tag))
+        if len(rows) >= 1000:
+            AssetTag.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    AssetTag.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # name__istartswith / tag__istartswith compile to UPPER(col::text) LIKE UPPER(%s);
+    # text_pattern_ops lets a B-tree serve the anchored LIKE in any collation.
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS asset_name_prefix_idx ON assets_asset ((UPPER("name"::text)) text_pattern_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS asset_tag_prefix_idx ON assets_assettag ((UPPER("tag"::text)) text_pattern_ops)'
+    )
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS asset_name_prefix_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS asset_tag_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0009_asset_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=100)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_rows', to='assets.asset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag'], name='asset_tag_idx')],
+                'constraints': [models.UniqueConstraint(fields=('asset', 'tag'), name='unique_asset_tag')],
+            },
+        ),
+        migrations.RunPython(populate_tags, migrations.RunPython.noop),
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
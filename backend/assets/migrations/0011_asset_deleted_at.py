@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0010_assettag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+def seed_changes(apps, schema_editor):
+    # One 'created' row per live asset, so syncing from cursor 0 is complete.
+    Asset = apps.get_model('assets', 'Asset')
+    AssetChange = apps.get_model('assets', 'AssetChange')
+    rows = Asset.objects.filter(deleted_at__isnull=True).order_by('id').values_list('id', 'user_id', 'is_public')
+    batch = []
+    for asset_id, owner_id, is_public in rows.iterator():
+        batch.append(AssetChange(asset_id=asset_id, kind='created', owner_id=owner_id, is_public=is_public))
+        if len(batch) >= 1000:
+            AssetChange.objects.bulk_create(batch)
+            batch = []
+    AssetChange.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0011_asset_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asset_id', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('owner_id', models.BigIntegerField(blank=True, null=True)),
+                ('is_public', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner_id', 'id'], name='asset_change_owner_idx'), models.Index(fields=['is_public', 'id'], name='asset_change_public_idx')],
+            },
+        ),
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
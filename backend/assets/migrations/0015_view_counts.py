@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-19 22:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0014_ingestedfile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetDailyViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('viewers', models.BinaryField(default=b'')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='view_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['view_count', 'id'], name='asset_views_idx'),
+        ),
+        migrations.AddField(
+            model_name='assetdailyviews',
+            name='asset',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='assets.asset'),
+        ),
+        migrations.AddConstraint(
+            model_name='assetdailyviews',
+            constraint=models.UniqueConstraint(fields=('asset', 'day'), name='unique_asset_day'),
+        ),
+    ]
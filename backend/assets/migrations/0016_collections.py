@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-19 23:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0015_view_counts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Collection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('path', models.CharField(db_index=True, default='', editable=False, max_length=1024)),
+                ('depth', models.PositiveSmallIntegerField(default=0, editable=False)),
+                ('is_public', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='children', to='assets.collection')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CollectionAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added_at', models.DateTimeField(auto_now_add=True)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='assets.asset')),
+                ('collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='assets.collection')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='collection',
+            name='assets',
+            field=models.ManyToManyField(related_name='collections', through='assets.CollectionAsset', to='assets.asset'),
+        ),
+        migrations.AddConstraint(
+            model_name='collectionasset',
+            constraint=models.UniqueConstraint(fields=('collection', 'asset'), name='unique_collection_asset'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-19 23:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0016_collections'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='palette',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='AssetColor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('red', models.PositiveSmallIntegerField()),
+                ('green', models.PositiveSmallIntegerField()),
+                ('blue', models.PositiveSmallIntegerField()),
+                ('weight', models.PositiveSmallIntegerField()),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='colors', to='assets.asset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='asset_color_bucket_idx')],
+            },
+        ),
+    ]
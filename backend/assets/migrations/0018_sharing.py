@@ -0,0 +1,85 @@
+# Generated by Django 5.2.6 on 2026-10-19 23:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0017_palettes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AssetGrant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='assetchange',
+            name='recipient_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='assetchange',
+            index=models.Index(fields=['recipient_id', 'id'], name='asset_change_recipient_idx'),
+        ),
+        migrations.AddField(
+            model_name='assetaccess',
+            name='asset',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access_rows', to='assets.asset'),
+        ),
+        migrations.AddField(
+            model_name='assetaccess',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='assetgrant',
+            name='asset',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grants', to='assets.asset'),
+        ),
+        migrations.AddField(
+            model_name='assetgrant',
+            name='granted_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='assetgrant',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='asset_grants', to='auth.group'),
+        ),
+        migrations.AddField(
+            model_name='assetgrant',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='asset_grants', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='assetaccess',
+            constraint=models.UniqueConstraint(fields=('user', 'asset'), name='unique_asset_access'),
+        ),
+        migrations.AddConstraint(
+            model_name='assetgrant',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('group__isnull', True), ('user__isnull', False)), models.Q(('group__isnull', False), ('user__isnull', True)), _connector='OR'), name='asset_grant_one_grantee'),
+        ),
+        migrations.AddConstraint(
+            model_name='assetgrant',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('asset', 'user'), name='unique_asset_user_grant'),
+        ),
+        migrations.AddConstraint(
+            model_name='assetgrant',
+            constraint=models.UniqueConstraint(condition=models.Q(('group__isnull', False)), fields=('asset', 'group'), name='unique_asset_group_grant'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-20 10:05
+
+from django.db import migrations
+
+
+def create_postgres_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # A C-collation B-tree serves both the anchored LIKE and ORDER BY on the
+    # same expression; text_pattern_ops (0010) could only do the former.
+    schema_editor.execute('DROP INDEX IF EXISTS asset_name_prefix_idx')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS asset_name_prefix_idx ON assets_asset ((UPPER("name"::text) COLLATE "C"))'
+    )
+
+
+def restore_postgres_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS asset_name_prefix_idx')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS asset_name_prefix_idx ON assets_asset ((UPPER("name"::text)) text_pattern_ops)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0018_sharing'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_postgres_index, restore_postgres_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-20 14:20
+
+from django.db import migrations, models
+
+
+def mark_unextracted(apps, schema_editor):
+    # '' used to mean both "not extracted yet" and "no palette"; give those
+    # assets one more attempt, after which '' only means the latter.
+    Asset = apps.get_model('assets', 'Asset')
+    Asset._base_manager.filter(palette='').update(palette=None)
+
+
+def unmark_unextracted(apps, schema_editor):
+    Asset = apps.get_model('assets', 'Asset')
+    Asset._base_manager.filter(palette__isnull=True).update(palette='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0019_asset_name_prefix_c_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asset',
+            name='palette',
+            field=models.CharField(blank=True, default=None, max_length=64, null=True),
+        ),
+        migrations.RunPython(mark_unextracted, unmark_unextracted),
+    ]
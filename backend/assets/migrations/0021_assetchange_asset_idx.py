@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-20 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0020_asset_palette_null'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assetchange',
+            index=models.Index(fields=['asset_id', 'id'], name='asset_change_asset_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:33
+
+from django.db import migrations, models
+
+
+def mark_hashed(apps, schema_editor):
+    # Images without a hash get one more attempt; the rest are done
+    Asset = apps.get_model('assets', 'Asset')
+    Asset._base_manager.filter(phash__isnull=False).update(phash_attempted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0021_assetchange_asset_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='phash_attempted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_hashed, migrations.RunPython.noop),
+    ]
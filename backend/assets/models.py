@@ -1,6 +1,40 @@
 from django.db import models
 from django.conf import settings
 
+
+class AssetQuerySet(models.QuerySet):
+    def visible_to(self, user, shared=True):
+        """
+        Admins see every asset; everyone else their own, public ones and ones
+        shared with them. Shares only grant reading: pass shared=False for the
+        assets a user may change.
+        """
+        if getattr(user, 'role', None) == 'Admin':
+            return self.all()
+        condition = models.Q(user=user) | models.Q(is_public=True)
+        if shared:
+            # Shares are pre-expanded into AssetAccess (assets/sharing.py), so
+            # this is one index range on (user, asset) rather than rule checks.
+            condition |= models.Q(pk__in=AssetAccess.objects.filter(user=user).values('asset_id'))
+        return self.filter(condition)
+
+    def delete(self):
+        # Keep the usage counters in step with bulk deletes. Trashed rows
+        # were already taken off the counters when they were soft-deleted.
+        from .usage import grouped_usage, record_bulk_deleted
+        rows = grouped_usage(self.filter(deleted_at__isnull=True))
+        result = super().delete()
+        record_bulk_deleted(rows)
+        return result
+
+
+class LiveAssetManager(models.Manager.from_queryset(AssetQuerySet)):
+    """Assets that are not in the trash."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Asset(models.Model):
     FILE_TYPES = [
         ('3D', '3D Model'),
@@ -10,6 +44,13 @@ class Asset(models.Model):
         ('OTH', 'Other'),
     ]
 
+    TIER_HOT = 'hot'
+    TIER_COLD = 'cold'
+    TIERS = [
+        (TIER_HOT, 'Hot'),
+        (TIER_COLD, 'Cold (archived)'),
+    ]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
     file = models.FileField(upload_to='uploads/')
     name = models.CharField(max_length=255)
@@ -29,5 +70,341 @@ class Asset(models.Model):
     polygon_count = models.IntegerField(blank=True, null=True)
     dimensions = models.JSONField(blank=True, null=True) 
 
+    # Perceptual hash of images (see assets/phash.py). The 64-bit hash is also
+    # split into four indexed 16-bit bands for Hamming-distance lookups.
+    phash = models.BigIntegerField(blank=True, null=True)
+    phash_band0 = models.IntegerField(blank=True, null=True, db_index=True)
+    phash_band1 = models.IntegerField(blank=True, null=True, db_index=True)
+    phash_band2 = models.IntegerField(blank=True, null=True, db_index=True)
+    phash_band3 = models.IntegerField(blank=True, null=True, db_index=True)
+    # Set once hashing was tried, so images that cannot be read are not retried
+    phash_attempted = models.BooleanField(default=False)
+
+    # Storage tier of `file` (see assets/storage.py and assets/tiering.py)
+    tier = models.CharField(max_length=10, choices=TIERS, default=TIER_HOT, db_index=True)
+    last_accessed_at = models.DateTimeField(blank=True, null=True)
+
+    # Set when the asset is moved to the trash (see assets/cleanup.py)
+    deleted_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    # Views, flushed in batches from an in-memory buffer (assets/popularity.py)
+    view_count = models.PositiveBigIntegerField(default=0)
+
+    # Dominant colours of images, "rrggbb:percent" (see assets/palette.py).
+    # None until extracted; '' once tried on an image with no palette
+    # (unreadable or fully transparent), so it is not retried.
+    palette = models.CharField(max_length=64, blank=True, null=True, default=None)
+
+    objects = LiveAssetManager()
+    all_objects = AssetQuerySet.as_manager()  # including trashed assets
+
+    class Meta:
+        # B-tree indexes behind the ?q= search operators and sort keys
+        # (assets/query.py). Postgres also gets GIN indexes on tags and a
+        # trigram index on name, created in migration 0009.
+        indexes = [
+            models.Index(fields=['-created_at'], name='asset_created_idx'),
+            models.Index(fields=['file_type', '-created_at'], name='asset_type_created_idx'),
+            models.Index(fields=['category'], name='asset_category_idx'),
+            models.Index(fields=['file_size'], name='asset_size_idx'),
+            models.Index(fields=['polygon_count'], name='asset_polys_idx'),
+            models.Index(fields=['name'], name='asset_name_idx'),
+            models.Index(fields=['view_count', 'id'], name='asset_views_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.file_type})"
+
+
+class Chunk(models.Model):
+    """A content-addressed piece of a revision file, stored once in CHUNK_STORE_DIR."""
+    digest = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.digest[:12]} ({self.size} bytes)"
+
+
+class AssetRevision(models.Model):
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField()
+    file_name = models.CharField(max_length=255)
+    file_size = models.PositiveBigIntegerField(default=0)
+    # Bytes of chunks that did not exist before this revision
+    stored_size = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64)
+    comment = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-number']
+        constraints = [
+            models.UniqueConstraint(fields=['asset', 'number'], name='unique_asset_revision_number'),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id} r{self.number}"
+
+
+class RevisionChunk(models.Model):
+    revision = models.ForeignKey(AssetRevision, on_delete=models.CASCADE, related_name='chunk_refs')
+    position = models.PositiveIntegerField()
+    chunk = models.ForeignKey(Chunk, on_delete=models.PROTECT, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['revision', 'position'], name='unique_revision_chunk_position'),
+        ]
+
+
+class UsageCounter(models.Model):
+    """
+    Asset count and bytes per (owner, file_type), kept current by delta
+    updates (assets/usage.py) so usage never needs a scan over Asset.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    file_type = models.CharField(max_length=50)
+    asset_count = models.BigIntegerField(default=0)
+    public_count = models.BigIntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'file_type'], name='unique_usage_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}/{self.file_type}: {self.asset_count} assets, {self.total_bytes} bytes"
+
+
+class AssetTag(models.Model):
+    """
+    One row per (asset, tag), mirroring Asset.tags so tag completions can
+    use a prefix index instead of scanning JSON (see assets/suggest.py).
+    """
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='tag_rows')
+    tag = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['asset', 'tag'], name='unique_asset_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['tag'], name='asset_tag_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id}: {self.tag}"
+
+
+class AssetChange(models.Model):
+    """
+    Append-only log of asset writes behind GET /api/assets/changes/. The id is
+    the sync cursor. Rows keep no foreign key so tombstones outlive the asset.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    KINDS = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+
+    asset_id = models.BigIntegerField()
+    kind = models.CharField(max_length=10, choices=KINDS)
+    owner_id = models.BigIntegerField(blank=True, null=True)
+    # Public before or after the change, i.e. who must hear about it
+    is_public = models.BooleanField(default=False)
+    # Set on rows meant for one user only: the asset was shared with or
+    # unshared from them (assets/sharing.py)
+    recipient_id = models.BigIntegerField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner_id', 'id'], name='asset_change_owner_idx'),
+            models.Index(fields=['is_public', 'id'], name='asset_change_public_idx'),
+            models.Index(fields=['recipient_id', 'id'], name='asset_change_recipient_idx'),
+            # Changes to assets shared with the user (the feed's AssetAccess arm)
+            models.Index(fields=['asset_id', 'id'], name='asset_change_asset_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.kind} asset {self.asset_id}"
+
+
+class RelatedAsset(models.Model):
+    """One precomputed neighbour of an asset, best first (assets/recommendations.py)."""
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='related_rows')
+    related = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            # Also the index behind GET /api/assets/{id}/related/
+            models.UniqueConstraint(fields=['asset', 'rank'], name='unique_related_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class RelatedIndexState(models.Model):
+    """Single row: how far the related-asset lists have followed the change feed."""
+    change_cursor = models.BigIntegerField(default=0)
+    built_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"related assets at change #{self.change_cursor}"
+
+
+class IngestedFile(models.Model):
+    """
+    A source file imported by `manage.py ingest_tree`. Written in the same
+    transaction as its asset, so an interrupted run resumes where it stopped.
+    """
+    source = models.CharField(max_length=1024, unique=True)  # absolute path on the ingesting host
+    sha256 = models.CharField(max_length=64, db_index=True)
+    asset = models.ForeignKey(Asset, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.source
+
+
+class AssetDailyViews(models.Model):
+    """Views of an asset on one day, with a HyperLogLog sketch of its viewers (assets/hll.py)."""
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='daily_views')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    viewers = models.BinaryField(default=b'')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['asset', 'day'], name='unique_asset_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id} on {self.day}: {self.views} views"
+
+
+class AssetColor(models.Model):
+    """One palette colour of an image, bucketed for ?color= searches (assets/palette.py)."""
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='colors')
+    red = models.PositiveSmallIntegerField()
+    green = models.PositiveSmallIntegerField()
+    blue = models.PositiveSmallIntegerField()
+    weight = models.PositiveSmallIntegerField()  # percent of the image
+    bucket = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bucket'], name='asset_color_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id}: #{self.red:02x}{self.green:02x}{self.blue:02x} ({self.weight}%)"
+
+
+class AssetGrant(models.Model):
+    """An asset shared with one user or one group (assets/sharing.py)."""
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='grants')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, blank=True, null=True, related_name='asset_grants'
+    )
+    group = models.ForeignKey('auth.Group', on_delete=models.CASCADE, blank=True, null=True, related_name='asset_grants')
+    granted_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True, related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(user__isnull=False, group__isnull=True) | models.Q(user__isnull=True, group__isnull=False),
+                name='asset_grant_one_grantee',
+            ),
+            models.UniqueConstraint(
+                fields=['asset', 'user'], condition=models.Q(user__isnull=False), name='unique_asset_user_grant'
+            ),
+            models.UniqueConstraint(
+                fields=['asset', 'group'], condition=models.Q(group__isnull=False), name='unique_asset_group_grant'
+            ),
+        ]
+
+    def __str__(self):
+        grantee = f"user {self.user_id}" if self.user_id else f"group {self.group_id}"
+        return f"{self.asset_id} shared with {grantee}"
+
+
+class AssetAccess(models.Model):
+    """
+    One row per (user, asset) the user can see through any grant: the grants
+    with group memberships already expanded. Maintained by assets/sharing.py.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False, related_name='+')
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='access_rows')
+
+    class Meta:
+        constraints = [
+            # Also the index behind Asset.objects.visible_to()
+            models.UniqueConstraint(fields=['user', 'asset'], name='unique_asset_access'),
+        ]
+
+    def __str__(self):
+        return f"user {self.user_id} -> asset {self.asset_id}"
+
+
+class CollectionQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Admins see all, everyone else their own plus public ones (collections are not shared)."""
+        if getattr(user, 'role', None) == 'Admin':
+            return self.all()
+        return self.filter(models.Q(owner=user) | models.Q(is_public=True))
+
+
+class Collection(models.Model):
+    """
+    A folder or project. Collections nest through `parent`; `path` holds the
+    ids from the root down ("3/17/42/") so a whole subtree is one prefix match
+    (see assets/collection_tree.py). Assets can be in any number of them.
+    """
+    name = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    # Subtrees are deleted by path in one statement, not level by level
+    parent = models.ForeignKey('self', on_delete=models.DO_NOTHING, blank=True, null=True, related_name='children')
+    path = models.CharField(max_length=1024, db_index=True, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True)
+    is_public = models.BooleanField(default=True)
+    assets = models.ManyToManyField(Asset, through='CollectionAsset', related_name='collections')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CollectionQuerySet.as_manager()
+
+    def delete(self, *args, **kwargs):
+        from .collection_tree import delete_subtree
+        return delete_subtree(self)
+
+    def __str__(self):
+        return self.name
+
+
+class CollectionAsset(models.Model):
+    collection = models.ForeignKey(Collection, on_delete=models.CASCADE, related_name='memberships')
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='memberships')
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['collection', 'asset'], name='unique_collection_asset'),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id} in {self.collection_id}"
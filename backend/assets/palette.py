@@ -0,0 +1,185 @@
+"""
+Dominant colour palettes of images, and search by colour.
+
+Each image is downsampled to at most 64x64 pixels and clustered with k-means
+(vectorised NumPy, deterministic seeding). The cluster centres covering at
+least MIN_WEIGHT percent of the image are its palette, kept on the asset in
+a compact form ("aa3300:42 1f1f1f:30", hex colour and percentage) and as
+AssetColor rows.
+
+Every AssetColor row also stores a bucket: the colour quantised to 3 bits per
+channel, i.e. one of 512 cubes of the RGB space. ?color=#aa3300&tolerance=40
+first works out which cubes come within `tolerance` of the colour (a fixed
+512-cube computation), so the database only measures exact distances for
+rows in those buckets, found through the index on bucket, instead of for
+every row in the table.
+"""
+
+import numpy as np
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, IntegerField
+from PIL import Image, ImageOps
+
+from .models import AssetColor
+
+CLUSTERS = 5
+MIN_WEIGHT = 5  # percent of the (opaque) pixels
+# Clusters closer than this are shades of one colour and are merged
+MERGE_DISTANCE = 24
+ITERATIONS = 20
+_SAMPLE_SIZE = 64
+_SEED = 0
+
+BUCKET_BITS = 3
+_LEVELS = 1 << BUCKET_BITS
+_BUCKET_WIDTH = 256 // _LEVELS
+
+DEFAULT_TOLERANCE = 40
+MAX_TOLERANCE = 128
+
+
+def _sample(fileobj):
+    """The image's opaque pixels as an (n, 3) float array, from a small copy."""
+    with Image.open(fileobj) as image:
+        image.draft('RGB', (_SAMPLE_SIZE, _SAMPLE_SIZE))  # JPEGs decode at reduced size
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA')
+        image.thumbnail((_SAMPLE_SIZE, _SAMPLE_SIZE), Image.Resampling.BILINEAR)
+        pixels = np.asarray(image, dtype=np.float64).reshape(-1, 4)
+    return pixels[pixels[:, 3] >= 128, :3]
+
+
+def kmeans(pixels, k=CLUSTERS, iterations=ITERATIONS):
+    """Cluster (n, 3) pixels; returns (centres, pixels per centre)."""
+    rng = np.random.default_rng(_SEED)
+    k = min(k, len(np.unique(pixels, axis=0)))
+
+    # k-means++ seeding: spread the starting centres out
+    centres = [pixels[rng.integers(len(pixels))]]
+    nearest = ((pixels - centres[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        centres.append(pixels[rng.choice(len(pixels), p=nearest / nearest.sum())])
+        nearest = np.minimum(nearest, ((pixels - centres[-1]) ** 2).sum(axis=1))
+    centres = np.array(centres)
+
+    labels = None
+    for _ in range(iterations):
+        # Squared distances of every pixel to every centre, in one go
+        distances = (
+            (pixels ** 2).sum(axis=1)[:, None]
+            - 2 * pixels @ centres.T
+            + (centres ** 2).sum(axis=1)[None, :]
+        )
+        new_labels = distances.argmin(axis=1)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=k)
+        sums = np.stack([np.bincount(labels, weights=pixels[:, c], minlength=k) for c in range(3)], axis=1)
+        filled = counts > 0
+        centres[filled] = sums[filled] / counts[filled, None]
+    return centres, np.bincount(labels, minlength=k)
+
+
+def compute_palette(fileobj):
+    """Return [(r, g, b, percent)] of an image's dominant colours, largest first."""
+    pixels = _sample(fileobj)
+    if not len(pixels):
+        return []
+    centres, counts = kmeans(pixels)
+
+    # Largest first; a cluster near one already kept is folded into it
+    kept = []
+    for i in np.argsort(-counts, kind='stable'):
+        for entry in kept:
+            if np.linalg.norm(centres[i] - entry[0]) < MERGE_DISTANCE:
+                entry[1] += counts[i]
+                break
+        else:
+            kept.append([centres[i], counts[i]])
+
+    palette = [
+        (*(int(c) for c in np.clip(np.rint(centre), 0, 255)), round(100 * count / len(pixels)))
+        for centre, count in kept
+    ]
+    return sorted((p for p in palette if p[3] >= MIN_WEIGHT), key=lambda p: (-p[3], p[:3]))
+
+
+def encode(palette):
+    return ' '.join(f"{r:02x}{g:02x}{b:02x}:{weight}" for r, g, b, weight in palette)
+
+
+def decode(value):
+    palette = []
+    for entry in (value or '').split():
+        color, weight = entry.split(':')
+        palette.append((*parse_color(color), int(weight)))
+    return palette
+
+
+def parse_color(value):
+    """'#aa3300', 'aa3300' or '#a30' -> (r, g, b). Raises ValueError."""
+    value = value.strip().lstrip('#')
+    if len(value) == 3:
+        value = ''.join(c * 2 for c in value)
+    if len(value) != 6:
+        raise ValueError(f"'{value}' is not a hex colour")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def bucket(r, g, b):
+    shift = 8 - BUCKET_BITS
+    return (r >> shift) << (2 * BUCKET_BITS) | (g >> shift) << BUCKET_BITS | (b >> shift)
+
+
+def buckets_near(color, tolerance):
+    """Every bucket with a colour within `tolerance` (RGB distance) of color."""
+    low = np.arange(_LEVELS) * _BUCKET_WIDTH
+    high = low + _BUCKET_WIDTH - 1
+    # Per channel, how far the colour is from each level's range (0 if inside)
+    gaps = [np.maximum(np.maximum(low - c, c - high), 0) ** 2 for c in color]
+    distance = gaps[0][:, None, None] + gaps[1][None, :, None] + gaps[2][None, None, :]
+    r, g, b = np.nonzero(distance <= tolerance ** 2)
+    return [int(i) for i in (r << (2 * BUCKET_BITS) | g << BUCKET_BITS | b)]
+
+
+def color_rows(asset, palette):
+    return [
+        AssetColor(asset=asset, red=r, green=g, blue=b, weight=weight, bucket=bucket(r, g, b))
+        for r, g, b, weight in palette
+    ]
+
+
+def update_asset_palette(asset):
+    """
+    Extract and store the palette of an image asset. Returns it, or None if
+    unreadable. Either way the asset is marked as done (palette '' when there
+    is none), so it is not picked up again.
+    """
+    try:
+        with asset.file.open('rb') as f:
+            palette = compute_palette(f)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        palette = None
+
+    asset.palette = encode(palette or [])
+    with transaction.atomic():
+        type(asset).all_objects.filter(pk=asset.pk).update(palette=asset.palette)
+        AssetColor.objects.filter(asset=asset).delete()
+        AssetColor.objects.bulk_create(color_rows(asset, palette or []))
+    return palette
+
+
+def filter_by_color(queryset, color, tolerance=DEFAULT_TOLERANCE):
+    """Assets of queryset with a palette colour within `tolerance` of color (r, g, b)."""
+    r, g, b = color
+    distance = ExpressionWrapper(
+        (F('red') - r) * (F('red') - r) + (F('green') - g) * (F('green') - g) + (F('blue') - b) * (F('blue') - b),
+        output_field=IntegerField(),
+    )
+    matches = (
+        AssetColor.objects.filter(bucket__in=buckets_near(color, tolerance))
+        .alias(distance=distance).filter(distance__lte=tolerance ** 2)
+        .values('asset_id')
+    )
+    return queryset.filter(pk__in=matches)
@@ -0,0 +1,127 @@
+"""
+Perceptual hashing (DCT pHash) for near-duplicate image detection.
+
+Hashes are 64 bits, split into four 16-bit bands that are stored in separate
+indexed columns (multi-index hashing). If two hashes are within Hamming
+distance d, then by pigeonhole at least one band differs in at most d // 4
+bits, so probing each band's index with the values within that radius finds
+every candidate without scanning the table.
+"""
+
+from itertools import combinations
+
+import numpy as np
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+BANDS = 4
+BAND_BITS = 16
+BAND_MASK = (1 << BAND_BITS) - 1
+# Radius 2 per band: 1 + 16 + 120 = 137 indexed probes per band.
+MAX_DISTANCE = 3 * BANDS - 1
+DEFAULT_DISTANCE = 6
+
+_IMAGE_SIZE = 32
+_HASH_SIZE = 8
+
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix * np.sqrt(2 / n)
+
+
+_DCT = _dct_matrix(_IMAGE_SIZE)
+
+
+def compute_phash(fileobj):
+    """Return the 64-bit pHash of an image as an unsigned int."""
+    with Image.open(fileobj) as image:
+        image = ImageOps.exif_transpose(image).convert('L')
+        image = image.resize((_IMAGE_SIZE, _IMAGE_SIZE), Image.Resampling.LANCZOS)
+        pixels = np.asarray(image, dtype=np.float64)
+
+    # 2D DCT, keep the lowest 8x8 frequencies and threshold on their median
+    # (the DC term is left out of the median since it only tracks brightness).
+    low = (_DCT @ pixels @ _DCT.T)[:_HASH_SIZE, :_HASH_SIZE].flatten()
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def to_signed(value):
+    """Postgres has no unsigned bigint, so store the hash two's-complement."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def bands(value):
+    shift = BAND_BITS * (BANDS - 1)
+    return [(value >> (shift - BAND_BITS * i)) & BAND_MASK for i in range(BANDS)]
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def _band_neighbours(value, radius):
+    values = [value]
+    for r in range(1, radius + 1):
+        for positions in combinations(range(BAND_BITS), r):
+            flipped = value
+            for p in positions:
+                flipped ^= 1 << p
+            values.append(flipped)
+    return values
+
+
+def phash_fields(value):
+    """Model field values for an unsigned hash (or None to clear them)."""
+    if value is None:
+        return {'phash': None, **{f'phash_band{i}': None for i in range(BANDS)}}
+    return {
+        'phash': to_signed(value),
+        **{f'phash_band{i}': band for i, band in enumerate(bands(value))},
+    }
+
+
+def update_asset_phash(asset):
+    """
+    Compute and store the hash of an image asset. Returns it, or None if
+    unreadable. Either way the asset is marked as attempted, so it is not
+    picked up again.
+    """
+    try:
+        with asset.file.open('rb') as f:
+            value = compute_phash(f)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        value = None
+
+    fields = {**phash_fields(value), 'phash_attempted': True}
+    type(asset).objects.filter(pk=asset.pk).update(**fields)
+    for name, field_value in fields.items():
+        setattr(asset, name, field_value)
+    return value
+
+
+def find_similar(queryset, value, max_distance=DEFAULT_DISTANCE):
+    """Return [(asset, distance)] within max_distance of value, closest first."""
+    radius = max_distance // BANDS
+    lookup = Q()
+    for i, band in enumerate(bands(value)):
+        lookup |= Q(**{f'phash_band{i}__in': _band_neighbours(band, radius)})
+
+    distances = {}
+    for pk, phash in queryset.filter(lookup).values_list('pk', 'phash'):
+        distance = hamming(value, to_unsigned(phash))
+        if distance <= max_distance:
+            distances[pk] = distance
+
+    assets = queryset.model.objects.in_bulk(list(distances))
+    return sorted(
+        ((assets[pk], d) for pk, d in distances.items() if pk in assets),
+        key=lambda item: (item[1], item[0].pk),
+    )
@@ -0,0 +1,137 @@
+"""
+View counting. Fetching an asset (GET /api/assets/{id}/) counts as a view.
+
+Logging an ActivityLog row or running an UPDATE per view would flood the
+database, so each process buffers views in memory: a count and the set of
+viewers per (asset, day). The buffer is flushed every VIEW_FLUSH_SECONDS, or
+as soon as it holds VIEW_FLUSH_MAX_KEYS entries, in one transaction that
+adds the counts to Asset.view_count (indexed, behind ?sort=-views) and to
+AssetDailyViews rows. The flush runs on a background thread (one at a time
+per process), so the request that fills the buffer does not wait for it. Each daily row keeps a HyperLogLog sketch of its
+viewers (assets/hll.py), so unique viewers per day, or over any range of
+days, are estimated from a fixed, small amount of data.
+
+Views still buffered when a process is killed are lost; these are
+popularity numbers, not an audit trail.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .hll import HyperLogLog
+from .models import Asset, AssetDailyViews
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 365
+
+
+class ViewBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._viewers = defaultdict(set)
+        self._flushed_at = time.monotonic()
+        self._flusher = None
+
+    def add(self, asset_id, viewer, day=None):
+        key = (int(asset_id), day or timezone.localdate())
+        with self._lock:
+            self._counts[key] += 1
+            self._viewers[key].add(viewer)
+            due = (
+                len(self._counts) >= settings.VIEW_FLUSH_MAX_KEYS
+                or time.monotonic() - self._flushed_at >= settings.VIEW_FLUSH_SECONDS
+            )
+            if due and not (self._flusher and self._flusher.is_alive()):
+                self._flusher = threading.Thread(target=self._flush_in_background, name='view-flush', daemon=True)
+                self._flusher.start()
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            # The thread's own database connections
+            connections.close_all()
+
+    def _drain(self):
+        with self._lock:
+            counts, viewers = self._counts, self._viewers
+            self._counts, self._viewers = Counter(), defaultdict(set)
+            self._flushed_at = time.monotonic()
+        return counts, viewers
+
+    def flush(self):
+        """Write the buffered views. Returns the number of views written."""
+        counts, viewers = self._drain()
+        if not counts:
+            return 0
+        try:
+            write_views(counts, viewers)
+        except Exception:
+            logger.exception("Could not flush %d buffered view counter(s)", len(counts))
+            return 0
+        return sum(counts.values())
+
+
+def write_views(counts, viewers):
+    """Add {(asset_id, day): views} and their viewer sets to the database."""
+    db = router.db_for_write(AssetDailyViews)
+    # Assets purged since they were viewed have nothing left to count against
+    existing = set(
+        Asset.all_objects.using(db).filter(pk__in={asset_id for asset_id, _ in counts}).values_list('pk', flat=True)
+    )
+    per_asset = Counter()
+    with transaction.atomic(using=db):
+        # Fixed order, so concurrent flushes from several processes cannot deadlock
+        for (asset_id, day), views in sorted(counts.items()):
+            if asset_id not in existing:
+                continue
+            per_asset[asset_id] += views
+            row, _ = (
+                AssetDailyViews.objects.using(db).select_for_update()
+                .get_or_create(asset_id=asset_id, day=day)
+            )
+            sketch = HyperLogLog.from_bytes(row.viewers).update(viewers[(asset_id, day)])
+            row.views = F('views') + views
+            row.viewers = sketch.to_bytes()
+            row.save(update_fields=['views', 'viewers'])
+        for asset_id, views in sorted(per_asset.items()):
+            Asset.all_objects.using(db).filter(pk=asset_id).update(view_count=F('view_count') + views)
+
+
+views = ViewBuffer()
+atexit.register(views.flush)
+
+
+def record_view(asset, user):
+    views.add(asset.pk, f"user:{user.pk}" if user and user.is_authenticated else 'anonymous')
+
+
+def view_stats(asset, days=DEFAULT_DAYS):
+    """Total views, and views and estimated unique viewers per day for the last `days` days."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = AssetDailyViews.objects.filter(asset=asset, day__gte=since).order_by('day')
+    total = HyperLogLog()
+    daily = []
+    for row in rows:
+        sketch = HyperLogLog.from_bytes(row.viewers)
+        total.merge(sketch)
+        daily.append({'day': row.day, 'views': row.views, 'unique_viewers': sketch.count()})
+    return {
+        'view_count': asset.view_count,
+        'days': days,
+        'views': sum(entry['views'] for entry in daily),
+        'unique_viewers': total.count(),
+        'daily': daily,
+    }
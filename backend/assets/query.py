@@ -0,0 +1,231 @@
+"""
+Structured asset search (?q=).
+
+    type:3D tag:car size>10MB polys<50000 created:2026-01..2026-03 "red paint"
+
+Terms are ANDed; a leading '-' negates a field term. Every supported
+operator compiles to a predicate an index can serve: exact matches on
+file_type/category, JSON containment for tags (GIN on Postgres), plain
+range bounds on file_size/polygon_count/created_at (no functions wrapped
+around the column), and trigram-indexed substring search on name.
+Patterns no index can help with (leading wildcards, very short substrings,
+too many terms) are rejected instead of turned into a full scan.
+"""
+
+import calendar
+import re
+import shlex
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.utils import timezone
+
+MAX_TERMS = 12
+MAX_TEXT_TERMS = 4
+MIN_TEXT_LENGTH = 3  # trigram indexes cannot serve shorter substrings
+
+TYPE_ALIASES = {
+    '3d': '3D', 'model': '3D',
+    'img': 'IMG', 'image': 'IMG',
+    'vid': 'VID', 'video': 'VID',
+    'doc': 'DOC', 'document': 'DOC',
+    'oth': 'OTH', 'other': 'OTH',
+}
+SIZE_UNITS = {'': 1, 'b': 1, 'kb': 1024, 'mb': 1024 ** 2, 'gb': 1024 ** 3}
+SORT_FIELDS = {
+    'file_size': 'file_size', 'size': 'file_size',
+    'polygon_count': 'polygon_count', 'polys': 'polygon_count',
+    'name': 'name',
+    'created_at': 'created_at', 'created': 'created_at',
+    'view_count': 'view_count', 'views': 'view_count', 'popularity': 'view_count',
+}
+
+_TERM_RE = re.compile(r'^(?P<neg>-?)(?P<field>[a-z_]+)(?P<op>:|>=|<=|>|<)(?P<value>.+)$', re.IGNORECASE)
+_SIZE_RE = re.compile(r'^(\d+(?:\.\d+)?)\s*([kmg]?b?)$')
+
+
+class QueryError(ValueError):
+    pass
+
+
+def tag_filter(tag, using=DEFAULT_DB_ALIAS):
+    """Index-friendly "has this tag" predicate for the `using` database."""
+    if connections[using].vendor == 'postgresql':
+        # jsonb @> '["tag"]', served by the GIN index on tags
+        return Q(tags__contains=[tag])
+    # Other backends have no JSON containment; match the quoted element.
+    return Q(tags__icontains=f'"{tag}"')
+
+
+def _parse_size(value):
+    match = _SIZE_RE.match(value.lower())
+    if not match:
+        raise QueryError(f"Invalid size '{value}' (use e.g. 500KB, 10MB, 2GB)")
+    number, unit = match.groups()
+    if unit and not unit.endswith('b'):
+        unit += 'b'
+    try:
+        return int(float(number) * SIZE_UNITS[unit])
+    except OverflowError:
+        raise QueryError(f"Size '{value}' is too large")
+
+
+def _parse_int(value, field):
+    try:
+        return int(value.replace('_', '').replace(',', ''))
+    except ValueError:
+        raise QueryError(f"'{field}' needs a whole number, got '{value}'")
+
+
+def _parse_date_bounds(value):
+    """'2026', '2026-03' or '2026-03-15' -> [start, end) as aware datetimes."""
+    try:
+        parts = [int(p) for p in value.split('-')]
+    except ValueError:
+        parts = []
+    try:
+        if len(parts) == 1:
+            start, end = date(parts[0], 1, 1), date(parts[0] + 1, 1, 1)
+        elif len(parts) == 2:
+            start = date(parts[0], parts[1], 1)
+            end = start + timedelta(days=calendar.monthrange(parts[0], parts[1])[1])
+        elif len(parts) == 3:
+            start = date(*parts)
+            end = start + timedelta(days=1)
+        else:
+            raise ValueError
+        tz = timezone.get_current_timezone()
+        # In UTC already, so a bound at the ends of the calendar fails here
+        # rather than when the database adapts it
+        return tuple(
+            timezone.make_aware(datetime.combine(day, time.min), tz).astimezone(dt_timezone.utc)
+            for day in (start, end)
+        )
+    except (ValueError, OverflowError):
+        raise QueryError(f"Invalid date '{value}' (use YYYY, YYYY-MM or YYYY-MM-DD)")
+
+
+def _compare(field, op, value):
+    lookup = {':': 'exact', '>': 'gt', '<': 'lt', '>=': 'gte', '<=': 'lte'}[op]
+    return Q(**{f'{field}__{lookup}': value})
+
+
+def _compile_created(op, value):
+    if op == ':' and '..' in value:
+        first, _, last = value.partition('..')
+        start = _parse_date_bounds(first)[0] if first else None
+        end = _parse_date_bounds(last)[1] if last else None
+        if start is None and end is None:
+            raise QueryError("A date range needs at least one end")
+        q = Q()
+        if start is not None:
+            q &= Q(created_at__gte=start)
+        if end is not None:
+            q &= Q(created_at__lt=end)
+        return q
+
+    start, end = _parse_date_bounds(value)
+    if op == ':':
+        return Q(created_at__gte=start, created_at__lt=end)
+    # Compare against the whole period: >2026-03 means after March.
+    return {
+        '>': Q(created_at__gte=end),
+        '>=': Q(created_at__gte=start),
+        '<': Q(created_at__lt=start),
+        '<=': Q(created_at__lt=end),
+    }[op]
+
+
+def _compile_numeric(field, op, value, parse):
+    if op == ':' and '..' in value:
+        first, _, last = value.partition('..')
+        q = Q()
+        if first:
+            q &= Q(**{f'{field}__gte': parse(first)})
+        if last:
+            q &= Q(**{f'{field}__lte': parse(last)})
+        return q
+    return _compare(field, op, parse(value))
+
+
+def _compile_field(field, op, value, using):
+    if field == 'type':
+        if op != ':':
+            raise QueryError("'type' only supports ':'")
+        return Q(file_type=TYPE_ALIASES.get(value.lower(), value))
+    if field == 'tag':
+        if op != ':':
+            raise QueryError("'tag' only supports ':'")
+        return tag_filter(value, using)
+    if field == 'category':
+        if op != ':':
+            raise QueryError("'category' only supports ':'")
+        return Q(category=value)
+    if field == 'is':
+        if op != ':' or value.lower() not in ('public', 'private'):
+            raise QueryError("Use is:public or is:private")
+        return Q(is_public=value.lower() == 'public')
+    if field == 'size':
+        return _compile_numeric('file_size', op, value, _parse_size)
+    if field in ('polys', 'polygons'):
+        return _compile_numeric('polygon_count', op, value, lambda v: _parse_int(v, field))
+    if field == 'created':
+        return _compile_created(op, value)
+    raise QueryError(f"Unknown field '{field}'")
+
+
+def _compile_text(text):
+    if text.startswith(('*', '%')) or '*' in text:
+        raise QueryError(f"Wildcards are not supported in '{text}'")
+    if len(text) < MIN_TEXT_LENGTH:
+        raise QueryError(f"Search text must be at least {MIN_TEXT_LENGTH} characters: '{text}'")
+    return Q(name__icontains=text)
+
+
+def parse(query, using=DEFAULT_DB_ALIAS):
+    """Split a query into (filter Q, sort field or None) for the `using` database."""
+    try:
+        tokens = shlex.split(query)
+    except ValueError:
+        raise QueryError("Unbalanced quotes in query")
+    if len(tokens) > MAX_TERMS:
+        raise QueryError(f"Too many terms (max {MAX_TERMS})")
+
+    q = Q()
+    sort = None
+    text_terms = 0
+    for token in tokens:
+        match = _TERM_RE.match(token)
+        field = match['field'].lower() if match else None
+        if field == 'sort':
+            sort = parse_sort(match['value'])
+            continue
+        if match:
+            term = _compile_field(field, match['op'], match['value'], using)
+            q &= ~term if match['neg'] else term
+            continue
+        text_terms += 1
+        if text_terms > MAX_TEXT_TERMS:
+            raise QueryError(f"Too many text terms (max {MAX_TEXT_TERMS})")
+        q &= _compile_text(token)
+    return q, sort
+
+
+def parse_sort(value):
+    descending = value.startswith('-')
+    field = SORT_FIELDS.get(value.lstrip('-').lower())
+    if field is None:
+        raise QueryError(f"Cannot sort by '{value}' (use {', '.join(sorted(set(SORT_FIELDS.values())))})")
+    return f"-{field}" if descending else field
+
+
+def apply(queryset, query, sort=None):
+    """Filter and order a queryset by a ?q= expression and an optional ?sort=."""
+    q, inline_sort = parse(query or '', queryset.db)
+    queryset = queryset.filter(q)
+    order = parse_sort(sort) if sort else inline_sort
+    if order:
+        # id as tie-breaker keeps pages stable for equal keys
+        return queryset.order_by(order, '-id' if order.startswith('-') else 'id')
+    return queryset.order_by('-created_at')
@@ -0,0 +1,336 @@
+"""
+Related-asset recommendations (GET /api/assets/{id}/related/).
+
+Every live asset becomes a sparse TF-IDF vector over its tags, keywords,
+category and name tokens, and its neighbours are the assets with the highest
+cosine similarity. The vectors are held as a CSR matrix (indptr / indices /
+data NumPy arrays) together with its transpose, which serves as an inverted
+index: scoring one asset only touches the postings of its own terms instead
+of comparing it with every other row.
+
+The top TOP_K neighbours of each asset are stored as RelatedAsset rows, so
+the endpoint is one indexed lookup. refresh() is the offline job: it follows
+the change feed (assets/changes.py) from where the last run stopped and
+recomputes the lists of changed assets, of assets that listed them, and of
+assets they now outrank a current neighbour of. The first run, or one where
+most assets changed, recomputes every list. Lists that were not recomputed
+keep scores from older document frequencies, which only reorders near-ties;
+an occasional full run (build_related --full) evens that out.
+
+Each run also saves the raw term counts (Corpus) to RELATED_INDEX_PATH,
+tagged with the change cursor it reached. The next incremental run loads
+them, re-reads and re-tokenises only the changed assets, and re-weights the
+whole matrix with NumPy (document frequencies, IDF and norms are array
+passes), so it no longer reads the whole asset table. Without a saved corpus
+for the current cursor (first run, another host, --full) every asset is read.
+"""
+
+import logging
+import math
+import os
+import re
+import zipfile
+from collections import Counter
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Asset, AssetChange, RelatedAsset, RelatedIndexState
+from .suggest import tag_values
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 20
+DEFAULT_LIMIT = 10
+# Terms on more than this share of assets say nothing about relatedness
+MAX_DF = 0.5
+MIN_ASSETS_FOR_MAX_DF = 20
+# Recompute everything once this share of assets changed since the last run
+FULL_REFRESH_FRACTION = 0.3
+WRITE_BATCH = 500
+LOOKUP_BATCH = 1000
+
+FIELD_WEIGHTS = {'tag': 1.0, 'kw': 1.0, 'cat': 0.5, 'name': 0.75}
+_FIELDS = ('id', 'name', 'tags', 'keywords', 'category')
+
+_WORD = re.compile(r'[^\W_]{2,}')
+
+
+def asset_terms(name, tags, keywords, category):
+    """Weighted term counts of one asset, keyed 'field:token'."""
+    terms = Counter()
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    for tag in tag_values(tags):
+        terms[f'tag:{tag.lower()}'] += FIELD_WEIGHTS['tag']
+    for word in _WORD.findall((keywords or '').lower()):
+        terms[f'kw:{word}'] += FIELD_WEIGHTS['kw']
+    if category:
+        terms[f'cat:{category.strip().lower()}'] += FIELD_WEIGHTS['cat']
+    stem = (name or '').rsplit('.', 1)[0]
+    for word in _WORD.findall(stem.lower()):
+        terms[f'name:{word}'] += FIELD_WEIGHTS['name']
+    return terms
+
+
+def _gather(starts, ends):
+    """Concatenated ranges [start, end) as one index array."""
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+class Corpus:
+    """Raw weighted term counts per asset in CSR form, columns indexing `terms`."""
+
+    def __init__(self, ids, indptr, indices, counts, terms):
+        self.ids = ids
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+        self.terms = terms
+
+    @classmethod
+    def from_rows(cls, rows, terms=()):
+        """rows: (id, name, tags, keywords, category) tuples; new terms extend a copy of `terms`."""
+        terms = list(terms)
+        column_of = {term: column for column, term in enumerate(terms)}
+        ids, indptr, indices, counts = [], [0], [], []
+        for asset_id, name, tags, keywords, category in rows:
+            ids.append(asset_id)
+            for term, weight in asset_terms(name, tags, keywords, category).items():
+                column = column_of.get(term)
+                if column is None:
+                    column = column_of[term] = len(terms)
+                    terms.append(term)
+                indices.append(column)
+                counts.append(weight)
+            indptr.append(len(indices))
+        return cls(
+            np.asarray(ids, dtype=np.int64), np.asarray(indptr, dtype=np.int64),
+            np.asarray(indices, dtype=np.int64), np.asarray(counts, dtype=np.float64), terms,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def replace(self, asset_ids, rows):
+        """Copy without asset_ids, plus `rows` (their current state, if still live), in id order."""
+        added = Corpus.from_rows(rows, self.terms)
+        keep = ~np.isin(self.ids, np.fromiter(asset_ids, dtype=np.int64))
+        ids = np.concatenate((self.ids[keep], added.ids))
+        starts = np.concatenate((self.indptr[:-1][keep], added.indptr[:-1] + len(self.indices)))
+        lengths = np.concatenate((np.diff(self.indptr)[keep], np.diff(added.indptr)))
+        indices = np.concatenate((self.indices, added.indices))
+        counts = np.concatenate((self.counts, added.counts))
+
+        order = np.argsort(ids, kind='stable')
+        entries = _gather(starts[order], starts[order] + lengths[order])
+        indptr = np.concatenate(([0], np.cumsum(lengths[order]))).astype(np.int64)
+        return Corpus(ids[order], indptr, indices[entries], counts[entries], added.terms)
+
+    def save(self, path, cursor):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f, ids=self.ids, indptr=self.indptr, indices=self.indices, counts=self.counts,
+                terms=np.asarray(self.terms, dtype=str), cursor=cursor,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, cursor):
+        """The corpus saved at change `cursor`, or None if there is none."""
+        try:
+            with np.load(path) as saved:
+                if int(saved['cursor']) != cursor:
+                    return None
+                return cls(saved['ids'], saved['indptr'], saved['indices'], saved['counts'], saved['terms'].tolist())
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+
+
+class TfidfIndex:
+    """L2-normalised TF-IDF rows in CSR form plus a column-major copy."""
+
+    def __init__(self, ids, indptr, indices, data):
+        self.ids = ids
+        self.row_of = {int(asset_id): row for row, asset_id in enumerate(ids)}
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+        # Transpose: for each term, the rows it occurs in and its weight there.
+        rows = np.repeat(np.arange(len(ids)), np.diff(indptr))
+        order = np.argsort(indices, kind='stable')
+        self.post_rows = rows[order]
+        self.post_data = data[order]
+        counts = np.bincount(indices, minlength=int(indices.max()) + 1 if len(indices) else 0)
+        self.col_ptr = np.concatenate(([0], np.cumsum(counts)))
+
+    @classmethod
+    def build(cls, rows):
+        """rows: (id, name, tags, keywords, category) tuples in id order."""
+        return cls.from_corpus(Corpus.from_rows(rows))
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        n = len(corpus)
+        df = np.bincount(corpus.indices, minlength=len(corpus.terms))
+        max_df = MAX_DF * n if n >= MIN_ASSETS_FOR_MAX_DF else n
+        # A term on one asset cannot relate it to anything
+        kept = (df > 1) & (df <= max_df)
+        column_of = np.cumsum(kept) - 1
+        idf = np.log((1 + n) / (1 + df[kept])) + 1
+
+        entry_kept = kept[corpus.indices]
+        row_of_entry = np.repeat(np.arange(n), np.diff(corpus.indptr))[entry_kept]
+        indices = column_of[corpus.indices[entry_kept]].astype(np.int64)
+        counts = corpus.counts[entry_kept]
+        data = np.where(counts > 1, 1 + np.log(np.maximum(counts, 1)), counts) * idf[indices]
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(row_of_entry, minlength=n)))).astype(np.int64)
+
+        norms = np.sqrt(np.bincount(row_of_entry, weights=data ** 2, minlength=n))
+        norms[norms == 0] = 1
+        data = data / norms[row_of_entry]
+        return cls(corpus.ids, indptr, indices, data)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, asset_id):
+        """(ids, cosine similarities) of every asset sharing a term with asset_id."""
+        row = self.row_of[asset_id]
+        start, end = self.indptr[row], self.indptr[row + 1]
+        terms = self.indices[start:end]
+        weights = self.data[start:end]
+        if not len(terms):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        starts, ends = self.col_ptr[terms], self.col_ptr[terms + 1]
+        postings = _gather(starts, ends)
+        contributions = self.post_data[postings] * np.repeat(weights, ends - starts)
+        rows, inverse = np.unique(self.post_rows[postings], return_inverse=True)
+        sums = np.bincount(inverse, weights=contributions)
+        keep = rows != row
+        return self.ids[rows[keep]], sums[keep]
+
+    def top_k(self, asset_id, k=TOP_K):
+        """[(id, score)] of the k most similar assets, best first."""
+        ids, sums = self.scores(asset_id)
+        # Ties go to the lower id, so incremental and full runs agree
+        order = np.lexsort((ids, -np.round(sums, 9)))[:k]
+        return [(int(ids[i]), float(sums[i])) for i in order]
+
+
+def _chunks(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _asset_rows(asset_ids=None):
+    """(id, name, tags, keywords, category) of live assets in id order: all, or those of asset_ids."""
+    if asset_ids is None:
+        return Asset.objects.order_by('id').values_list(*_FIELDS).iterator(chunk_size=5000)
+    return (
+        row
+        for chunk in _chunks(sorted(asset_ids), LOOKUP_BATCH)
+        for row in Asset.objects.filter(id__in=chunk).order_by('id').values_list(*_FIELDS)
+    )
+
+
+def _entry_floors(asset_ids, k):
+    """Score of the k-th neighbour for assets whose list is full."""
+    floors = {}
+    for chunk in _chunks(asset_ids, LOOKUP_BATCH):
+        floors.update(
+            RelatedAsset.objects.filter(asset_id__in=chunk, rank=k - 1).values_list('asset_id', 'score')
+        )
+    return floors
+
+
+def _affected(index, changed, k):
+    """Assets whose neighbour lists the changed assets may have altered."""
+    live = [asset_id for asset_id in changed if asset_id in index.row_of]
+    targets = set(live)
+    for chunk in _chunks(changed, LOOKUP_BATCH):
+        # Lists holding a changed (or trashed) asset carry a stale score for it
+        targets.update(RelatedAsset.objects.filter(related_id__in=chunk).values_list('asset_id', flat=True))
+    for asset_id in live:
+        ids, sums = index.scores(asset_id)
+        if not len(ids):
+            continue
+        floors = _entry_floors(ids.tolist(), k)
+        for other, score in zip(ids.tolist(), sums.tolist()):
+            if score > floors.get(other, 0):
+                targets.add(other)
+    return targets
+
+
+def _write(index, asset_ids, k):
+    for batch in _chunks(sorted(asset_ids), WRITE_BATCH):
+        rows = [
+            RelatedAsset(asset_id=asset_id, related_id=related_id, score=score, rank=rank)
+            for asset_id in batch if asset_id in index.row_of
+            for rank, (related_id, score) in enumerate(index.top_k(asset_id, k))
+        ]
+        with transaction.atomic():
+            RelatedAsset.objects.filter(asset_id__in=batch).delete()
+            RelatedAsset.objects.bulk_create(rows)
+
+
+def refresh(full=False, k=TOP_K):
+    """Bring the stored neighbour lists up to date. Returns a summary dict."""
+    state, _ = RelatedIndexState.objects.get_or_create(pk=1)
+    # Same settle lag as the change feed, so late-committing rows are not skipped
+    settled = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+    head = AssetChange.objects.filter(created_at__lte=settled).aggregate(head=Max('id'))['head'] or 0
+
+    changed = set(
+        AssetChange.objects.filter(id__gt=state.change_cursor, id__lte=head).values_list('asset_id', flat=True)
+    )
+
+    corpus = None
+    if not full and state.change_cursor:
+        corpus = Corpus.load(settings.RELATED_INDEX_PATH, state.change_cursor)
+    if corpus is not None and len(changed) <= FULL_REFRESH_FRACTION * max(len(corpus), 1):
+        corpus = corpus.replace(changed, _asset_rows(changed))
+    else:
+        corpus = Corpus.from_rows(_asset_rows())
+    index = TfidfIndex.from_corpus(corpus)
+    full = full or state.change_cursor == 0 or len(changed) > FULL_REFRESH_FRACTION * max(len(index), 1)
+
+    if full:
+        RelatedAsset.objects.filter(asset__deleted_at__isnull=False).delete()
+        targets = set(index.row_of)
+    else:
+        gone = [asset_id for asset_id in changed if asset_id not in index.row_of]
+        for chunk in _chunks(gone, LOOKUP_BATCH):
+            RelatedAsset.objects.filter(asset_id__in=chunk).delete()
+        targets = _affected(index, changed, k)
+    _write(index, targets, k)
+
+    try:
+        corpus.save(settings.RELATED_INDEX_PATH, head)
+    except OSError:
+        # Only costs the next run a full read of the assets
+        logger.warning("Could not save the related-asset terms to %s", settings.RELATED_INDEX_PATH, exc_info=True)
+    state.change_cursor = head
+    state.built_at = timezone.now()
+    state.save(update_fields=['change_cursor', 'built_at'])
+    return {'assets': len(index), 'recomputed': len(targets), 'full': full, 'cursor': head}
+
+
+def related_to(asset, visible, limit=DEFAULT_LIMIT):
+    """[(asset, score)] of the stored neighbours of asset found in `visible`."""
+    rows = (
+        RelatedAsset.objects.filter(asset=asset, related__in=visible)
+        .select_related('related')
+        .order_by('rank')[:limit]
+    )
+    return [(row.related, row.score) for row in rows]
@@ -0,0 +1,221 @@
+"""
+On-demand image renditions (resized and/or re-encoded variants of an image
+asset), cached on disk with a size cap and LRU eviction.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# fmt query value -> (Pillow format, content type, file extension)
+FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+    'jpg': ('JPEG', 'image/jpeg', 'jpg'),
+    'png': ('PNG', 'image/png', 'png'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+}
+MAX_DIMENSION = 4096
+RENDER_WAIT_TIMEOUT = 30  # seconds a follower waits for the leader's render
+
+
+class RenditionError(ValueError):
+    pass
+
+
+class SourceMissing(RenditionError):
+    """The asset's file is gone from storage."""
+
+
+def parse_spec(params):
+    """Validate ?w=&h=&fmt= and return (width, height, fmt)."""
+    def dimension(name):
+        value = params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            value = int(value)
+        except ValueError:
+            raise RenditionError(f"'{name}' must be an integer")
+        if not 0 < value <= MAX_DIMENSION:
+            raise RenditionError(f"'{name}' must be between 1 and {MAX_DIMENSION}")
+        return value
+
+    width, height = dimension('w'), dimension('h')
+    fmt = (params.get('fmt') or 'jpeg').lower()
+    if fmt not in FORMATS:
+        raise RenditionError(f"'fmt' must be one of: {', '.join(sorted(FORMATS))}")
+    if fmt == 'jpg':
+        fmt = 'jpeg'
+    return width, height, fmt
+
+
+def content_type(fmt):
+    return FORMATS[fmt][1]
+
+
+def render_image(fileobj, width, height, fmt):
+    """Fit the image inside width x height (never upscaling) and encode it."""
+    with Image.open(fileobj) as image:
+        image = ImageOps.exif_transpose(image)
+        if width or height:
+            image.thumbnail((width or MAX_DIMENSION, height or MAX_DIMENSION), Image.Resampling.LANCZOS)
+
+        pil_format = FORMATS[fmt][0]
+        if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        out = BytesIO()
+        options = {'quality': 85, 'optimize': True} if pil_format in ('JPEG', 'WEBP') else {'optimize': True}
+        image.save(out, pil_format, **options)
+        return out.getvalue()
+
+
+class RenditionCache:
+    """
+    Disk cache of rendered variants. Recency is tracked in memory and mirrored
+    to file mtimes so the LRU order survives restarts. Concurrent requests for
+    the same variant in this process are collapsed into a single render; across
+    processes, writes are atomic so duplicate renders are harmless.
+    """
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = None  # OrderedDict: relative path -> size, oldest first
+        self._total = 0
+        self._inflight = {}
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, key[:2], f"{key}.{ext}")
+
+    def _load(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, path, st.st_size))
+        entries.sort()
+        self._entries = OrderedDict((path, size) for _, path, size in entries)
+        self._total = sum(self._entries.values())
+
+    def get(self, key, ext):
+        path = self._path(key, ext)
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            if path in self._entries:
+                self._entries.move_to_end(path)
+            elif os.path.exists(path):
+                # Rendered by another process.
+                size = os.path.getsize(path)
+                self._entries[path] = size
+                self._total += size
+            else:
+                return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process since we looked.
+            with self._lock:
+                self._total -= self._entries.pop(path, 0)
+            return None
+        return path
+
+    def get_or_render(self, key, ext, render):
+        path = self.get(key, ext)
+        if path:
+            return path
+
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+
+        if not leader:
+            event.wait(RENDER_WAIT_TIMEOUT)
+            path = self.get(key, ext)
+            if path:
+                return path
+            # The leader failed; render on our own.
+            return self._store(key, ext, render())
+
+        try:
+            return self._store(key, ext, render())
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _store(self, key, ext, data):
+        path = self._path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            self._total -= self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            self._total += len(data)
+            self._evict()
+        return path
+
+    def _evict(self):
+        # Never evict the entry that was just written (the newest one).
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            path, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RenditionCache(settings.RENDITION_CACHE_DIR, settings.RENDITION_CACHE_MAX_BYTES)
+    return _cache
+
+
+def get_rendition(asset, width, height, fmt):
+    """Return the path of the cached variant, rendering it on first request."""
+    # updated_at is part of the key so editing an asset invalidates its variants.
+    version = asset.updated_at.timestamp() if asset.updated_at else 0
+    key = hashlib.sha256(
+        f"{asset.pk}:{asset.file.name}:{version}:{width}x{height}:{fmt}".encode()
+    ).hexdigest()
+
+    def render():
+        try:
+            f = asset.file.open('rb')
+        except FileNotFoundError:
+            raise SourceMissing("The asset's file is missing")
+        with f:
+            try:
+                return render_image(f, width, height, fmt)
+            except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+                raise RenditionError("The image could not be read")
+
+    return key, get_cache().get_or_render(key, FORMATS[fmt][2], render)
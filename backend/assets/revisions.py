@@ -0,0 +1,187 @@
+"""
+Asset revision history with chunk-level deduplication.
+
+Each revision's file is split with content-defined chunking: a cut is made
+where a rolling hash over the last WINDOW bytes hits a bit pattern, so
+boundaries depend only on local content and re-synchronise right after an
+edit. Chunks are stored once, keyed by SHA-256, so a new revision only costs
+the chunks that actually changed.
+"""
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Max
+
+from .models import AssetRevision, Chunk, RevisionChunk
+
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 256 * 1024
+CUT_MASK = (1 << 16) - 1  # ~64KB average chunk
+WINDOW = 64
+READ_SIZE = 4 * 1024 * 1024
+
+# Fixed random table for the gear hash; changing it changes every boundary.
+_GEAR = np.random.default_rng(0x5EED).integers(0, 2 ** 63, size=256, dtype=np.uint64)
+
+
+def _find_cut(data):
+    """Length of the next chunk at the start of data (len(data) <= MAX_CHUNK)."""
+    n = len(data)
+    if n <= MIN_CHUNK:
+        return n
+
+    sums = np.cumsum(_GEAR[np.frombuffer(data, dtype=np.uint8)], dtype=np.uint64)
+    # Window sum ending at i is sums[i] - sums[i - WINDOW] (uint64 wraps consistently)
+    start = MIN_CHUNK - 1
+    window = sums[start:] - sums[start - WINDOW:n - WINDOW]
+    hits = np.flatnonzero((window & np.uint64(CUT_MASK)) == 0)
+    if hits.size:
+        return start + int(hits[0]) + 1
+    return n
+
+
+def iter_chunks(fileobj):
+    buf = b''
+    pos = 0
+    eof = False
+    while True:
+        if not eof and len(buf) - pos < MAX_CHUNK:
+            data = fileobj.read(READ_SIZE)
+            if data:
+                buf = buf[pos:] + data
+                pos = 0
+                continue
+            eof = True
+        if pos >= len(buf):
+            return
+        window = memoryview(buf)[pos:pos + MAX_CHUNK]
+        cut = _find_cut(window)
+        yield bytes(window[:cut])
+        pos += cut
+
+
+def _chunk_path(digest):
+    return os.path.join(settings.CHUNK_STORE_DIR, digest[:2], digest[2:4], digest)
+
+
+def _write_chunk(digest, data):
+    path = _chunk_path(digest)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def store_revision(asset, fileobj, user=None, file_name=None, comment=''):
+    """Chunk fileobj into the store and record it as the asset's next revision."""
+    digest = hashlib.sha256()
+    positions = []
+    sizes = {}
+    for data in iter_chunks(fileobj):
+        chunk_digest = hashlib.sha256(data).hexdigest()
+        digest.update(data)
+        _write_chunk(chunk_digest, data)
+        positions.append(chunk_digest)
+        sizes[chunk_digest] = len(data)
+
+    with transaction.atomic():
+        existing = set(
+            Chunk.objects.filter(digest__in=list(sizes)).values_list('digest', flat=True)
+        )
+        Chunk.objects.bulk_create(
+            [Chunk(digest=d, size=s) for d, s in sizes.items() if d not in existing],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+        # Lock the asset row so concurrent uploads get distinct numbers.
+        type(asset).objects.select_for_update().filter(pk=asset.pk).first()
+        number = (asset.revisions.aggregate(n=Max('number'))['n'] or 0) + 1
+        revision = AssetRevision.objects.create(
+            asset=asset,
+            number=number,
+            file_name=file_name or os.path.basename(asset.file.name),
+            file_size=sum(sizes[d] for d in positions),
+            stored_size=sum(s for d, s in sizes.items() if d not in existing),
+            sha256=digest.hexdigest(),
+            comment=comment,
+            created_by=user,
+        )
+        RevisionChunk.objects.bulk_create(
+            [RevisionChunk(revision=revision, position=i, chunk_id=d) for i, d in enumerate(positions)],
+            batch_size=1000,
+        )
+    return revision
+
+
+def ensure_baseline(asset, user=None):
+    """Record the asset's current file as revision 1 if it has no history yet."""
+    if asset.revisions.exists():
+        return None
+    with asset.file.open('rb') as f:
+        return store_revision(asset, f, user=user or asset.user, comment='Initial version')
+
+
+def iter_revision(revision):
+    """Stream a revision's bytes back, one chunk at a time."""
+    digests = (
+        RevisionChunk.objects.filter(revision=revision)
+        .order_by('position')
+        .values_list('chunk_id', flat=True)
+    )
+    for chunk_digest in digests.iterator(chunk_size=1000):
+        with open(_chunk_path(chunk_digest), 'rb') as f:
+            yield f.read()
+
+
+def rollback(asset, revision, user=None):
+    """
+    Make `revision` current again: record it as a new revision (reusing its
+    chunks, so it costs no storage) and restore the asset's file from it.
+    """
+    with transaction.atomic():
+        type(asset).objects.select_for_update().filter(pk=asset.pk).first()
+        number = (asset.revisions.aggregate(n=Max('number'))['n'] or 0) + 1
+        restored = AssetRevision.objects.create(
+            asset=asset,
+            number=number,
+            file_name=revision.file_name,
+            file_size=revision.file_size,
+            stored_size=0,
+            sha256=revision.sha256,
+            comment=f"Rolled back to revision {revision.number}",
+            created_by=user,
+        )
+        RevisionChunk.objects.bulk_create(
+            [
+                RevisionChunk(revision=restored, position=position, chunk_id=chunk_id)
+                for position, chunk_id in revision.chunk_refs.values_list('position', 'chunk_id')
+            ],
+            batch_size=1000,
+        )
+
+    with tempfile.TemporaryFile() as tmp:
+        for data in iter_revision(revision):
+            tmp.write(data)
+        tmp.seek(0)
+        replace_file(asset, File(tmp), revision.file_name)
+    return restored
+
+
+def replace_file(asset, content, file_name):
+    """Swap the asset's current file for `content`; history stays in the chunk store."""
+    old_name = asset.file.name
+    asset.file.save(file_name, content, save=False)
+    asset.file_size = asset.file.size
+    asset.save()
+    if old_name and old_name != asset.file.name:
+        asset.file.storage.delete(old_name)
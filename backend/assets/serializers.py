@@ -1,7 +1,11 @@
 from rest_framework import serializers
-from .models import Asset
+from .models import Asset, AssetRevision, Collection
+from . import palette
 import json
 
+MAX_UPLOAD_SIZE = 100 * 1024 * 1024  # 100MB
+
+
 class AssetSerializer(serializers.ModelSerializer):
     # Accept tags as a list directly
     tags = serializers.ListField(
@@ -10,6 +14,7 @@ class AssetSerializer(serializers.ModelSerializer):
         allow_empty=True,
         default=list
     )
+    palette = serializers.SerializerMethodField()
     
     class Meta:
         model = Asset
@@ -17,20 +22,54 @@ class AssetSerializer(serializers.ModelSerializer):
             'id', 'user', 'file', 'name', 'description', 'file_type', 
             'file_size', 'tags', 'keywords', 'category', 'created_at', 
             'updated_at', 'thumbnail', 'is_public', 'preview_url', 
-            'polygon_count', 'dimensions'
+            'polygon_count', 'dimensions', 'tier', 'deleted_at', 'view_count',
+            'palette'
         ]
-        read_only_fields = ['id', 'user', 'created_at', 'updated_at']
+        # file_size is derived from the stored file, never trusted from the client
+        read_only_fields = ['id', 'user', 'file_size', 'created_at', 'updated_at', 'tier', 'deleted_at', 'view_count']
     
     def validate_file(self, value):
         # Validate file size (100MB max)
-        max_size = 100 * 1024 * 1024  # 100MB
-        if value.size > max_size:
+        if value.size > MAX_UPLOAD_SIZE:
             raise serializers.ValidationError("File size cannot exceed 100MB")
         return value
+
+    def get_palette(self, obj):
+        return [
+            {'color': f"#{r:02x}{g:02x}{b:02x}", 'weight': weight}
+            for r, g, b, weight in palette.decode(obj.palette)
+        ]
     
     def create(self, validated_data):
         # Auto-assign the logged-in user
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             validated_data['user'] = request.user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class AssetRevisionSerializer(serializers.ModelSerializer):
+    created_by = serializers.CharField(source='created_by.username', read_only=True, default=None)
+
+    class Meta:
+        model = AssetRevision
+        fields = [
+            'id', 'number', 'file_name', 'file_size', 'stored_size',
+            'sha256', 'comment', 'created_by', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class CollectionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Collection
+        fields = [
+            'id', 'name', 'description', 'parent', 'path', 'depth',
+            'owner', 'is_public', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'path', 'depth', 'owner', 'created_at', 'updated_at']
+
+    def validate(self, attrs):
+        if self.instance is not None and 'parent' in attrs and attrs['parent'] != self.instance.parent:
+            raise serializers.ValidationError({'parent': "Use the move endpoint to change the parent"})
+        return attrs
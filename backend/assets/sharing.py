@@ -0,0 +1,161 @@
+"""
+Sharing assets with users and groups.
+
+Owners share through AssetGrant rows (one user or one group each). Working
+out visibility from grants would mean checking every grant and group
+membership per listed row, so the effective result is kept in AssetAccess:
+one (user, asset) row per user who can see an asset through any grant.
+Asset.objects.visible_to() then only needs the (user, asset) index.
+
+AssetAccess is updated incrementally, touching only the pairs a change can
+affect:
+- sharing inserts rows for the user, or for the group's members;
+- joining a group inserts rows for the group's assets;
+- unsharing, leaving a group or deleting one recomputes the affected
+  (asset, user) pairs from the grants that remain, since a user may still
+  see the asset through another grant.
+Group membership changes arrive through the User.groups m2m signals
+(assets/signals.py). Every pair gained or lost goes to that user's change
+feed. `manage.py rebuild_asset_access` recomputes the whole table.
+"""
+
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from . import changes
+from .models import AssetAccess, AssetGrant
+
+BATCH_SIZE = 1000
+
+
+def _members(group_ids):
+    Membership = get_user_model().groups.through
+    return Membership.objects.filter(group_id__in=group_ids)
+
+
+def _granted_pairs(asset_ids=None, user_ids=None):
+    """(asset_id, user_id) pairs the grants give, limited to some assets and/or users."""
+    direct = {'user__isnull': False}
+    # Group grants joined to the group's memberships. One filter() call, so
+    # the membership conditions and values share a single join.
+    via_groups = {'group__isnull': False, 'group__user__isnull': False}
+    if asset_ids is not None:
+        direct['asset_id__in'] = via_groups['asset_id__in'] = asset_ids
+    if user_ids is not None:
+        direct['user_id__in'] = via_groups['group__user__in'] = user_ids
+    direct = AssetGrant.objects.filter(**direct)
+    via_groups = AssetGrant.objects.filter(**via_groups)
+    return (
+        set(direct.values_list('asset_id', 'user_id'))
+        | set(via_groups.values_list('asset_id', 'group__user'))
+    )
+
+
+def _insert(pairs):
+    """Add access rows; returns the pairs that were new."""
+    pairs = set(pairs)
+    if not pairs:
+        return set()
+    existing = set(
+        AssetAccess.objects.filter(
+            asset_id__in={asset_id for asset_id, _ in pairs},
+            user_id__in={user_id for _, user_id in pairs},
+        ).values_list('asset_id', 'user_id')
+    )
+    added = pairs - existing
+    AssetAccess.objects.bulk_create(
+        [AssetAccess(asset_id=asset_id, user_id=user_id) for asset_id, user_id in added],
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+    return added
+
+
+def _delete(pairs):
+    by_asset = defaultdict(list)
+    for asset_id, user_id in pairs:
+        by_asset[asset_id].append(user_id)
+    for asset_id, user_ids in by_asset.items():
+        AssetAccess.objects.filter(asset_id=asset_id, user_id__in=user_ids).delete()
+
+
+def _sync(asset_ids, user_ids):
+    """Make the access rows of these assets x users match the grants; returns the pairs removed."""
+    if not asset_ids or not user_ids:
+        return set()
+    have = set(
+        AssetAccess.objects.filter(asset_id__in=asset_ids, user_id__in=user_ids).values_list('asset_id', 'user_id')
+    )
+    stale = have - _granted_pairs(asset_ids, user_ids)
+    _delete(stale)
+    return stale
+
+
+def grant(asset, users=(), groups=(), granted_by=None):
+    """Share an asset with users and/or groups. Returns the number of new grants."""
+    with transaction.atomic():
+        before = AssetGrant.objects.filter(asset=asset).count()
+        AssetGrant.objects.bulk_create(
+            [AssetGrant(asset=asset, user=user, granted_by=granted_by) for user in users]
+            + [AssetGrant(asset=asset, group=group, granted_by=granted_by) for group in groups],
+            ignore_conflicts=True,
+        )
+        user_ids = {user.pk for user in users}
+        user_ids.update(_members([group.pk for group in groups]).values_list('user_id', flat=True))
+        added = _insert((asset.pk, user_id) for user_id in user_ids)
+        changes.record_access(added)
+        return AssetGrant.objects.filter(asset=asset).count() - before
+
+
+def revoke(asset, users=(), groups=()):
+    """Stop sharing an asset with users and/or groups. Returns the number of grants removed."""
+    with transaction.atomic():
+        user_ids = {user.pk for user in users}
+        group_ids = [group.pk for group in groups]
+        user_ids.update(_members(group_ids).values_list('user_id', flat=True))
+        deleted, _ = AssetGrant.objects.filter(asset=asset, user__in=users).delete()
+        deleted += AssetGrant.objects.filter(asset=asset, group_id__in=group_ids).delete()[0]
+        changes.record_access(_sync([asset.pk], user_ids))
+        return deleted
+
+
+def joined_groups(user_ids, group_ids):
+    """Users were added to groups: give them the groups' shared assets."""
+    asset_ids = set(AssetGrant.objects.filter(group_id__in=group_ids).values_list('asset_id', flat=True))
+    changes.record_access(_insert((asset_id, user_id) for asset_id in asset_ids for user_id in user_ids))
+
+
+def left_groups(user_ids, group_ids):
+    """Users were removed from groups: drop what only those groups gave them."""
+    asset_ids = set(AssetGrant.objects.filter(group_id__in=group_ids).values_list('asset_id', flat=True))
+    changes.record_access(_sync(asset_ids, set(user_ids)))
+
+
+def group_deleted(group):
+    """Called before a group is deleted, while its memberships still exist."""
+    user_ids = set(_members([group.pk]).values_list('user_id', flat=True))
+    asset_ids = set(AssetGrant.objects.filter(group=group).values_list('asset_id', flat=True))
+    AssetGrant.objects.filter(group=group).delete()
+    changes.record_access(_sync(asset_ids, user_ids))
+
+
+def grants_of(asset):
+    """(users, groups) an asset is shared with."""
+    grants = AssetGrant.objects.filter(asset=asset).select_related('user', 'group').order_by('id')
+    users = [grant.user for grant in grants if grant.user_id]
+    groups = [grant.group for grant in grants if grant.group_id]
+    return users, groups
+
+
+def rebuild():
+    """Recompute AssetAccess from all grants. Returns (rows added, rows removed)."""
+    with transaction.atomic():
+        wanted = _granted_pairs()
+        have = set(AssetAccess.objects.values_list('asset_id', 'user_id'))
+        _delete(have - wanted)
+        AssetAccess.objects.bulk_create(
+            [AssetAccess(asset_id=asset_id, user_id=user_id) for asset_id, user_id in wanted - have],
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+    return len(wanted - have), len(have - wanted)
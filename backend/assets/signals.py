@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+
+from . import sharing
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def group_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep AssetAccess in step with group memberships (assets/sharing.py)."""
+    if action == 'pre_clear':
+        # clear() does not say what it removed; note it while it is still there
+        if reverse:
+            instance._cleared_members = set(instance.user_set.values_list('pk', flat=True))
+        else:
+            instance._cleared_groups = set(instance.groups.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_members' if reverse else '_cleared_groups', set())
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if not pk_set:
+        return
+
+    user_ids, group_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+    if action == 'post_add':
+        sharing.joined_groups(user_ids, group_ids)
+    else:
+        sharing.left_groups(user_ids, group_ids)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    sharing.group_deleted(instance)
@@ -0,0 +1,95 @@
+"""
+Tiered file storage for asset files.
+
+Files start on the hot tier (MEDIA_ROOT). The tiering job (manage.py
+tier_assets) moves cold ones to the archive tier (ARCHIVE_ROOT) gzip
+compressed. Opening an archived file rehydrates it back to the hot tier
+first, so names and URLs never change.
+"""
+
+import gzip
+import os
+import shutil
+import struct
+import threading
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils._os import safe_join
+
+_rehydrate_lock = threading.Lock()
+
+
+class TieredStorage(FileSystemStorage):
+    def __init__(self, archive_location=None, **kwargs):
+        super().__init__(**kwargs)
+        self._archive_location = archive_location
+
+    @property
+    def archive_location(self):
+        return os.path.abspath(self._archive_location or settings.ARCHIVE_ROOT)
+
+    def archive_path(self, name):
+        return safe_join(self.archive_location, f"{name}.gz")
+
+    def is_archived(self, name):
+        return not os.path.exists(self.path(name)) and os.path.exists(self.archive_path(name))
+
+    def archive(self, name):
+        """Move a hot file to the archive tier, compressed."""
+        src = self.path(name)
+        dst = self.archive_path(name)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        with open(src, 'rb') as fin, gzip.open(tmp, 'wb', compresslevel=6) as fout:
+            shutil.copyfileobj(fin, fout, 1024 * 1024)
+        os.replace(tmp, dst)
+        os.remove(src)
+
+    def rehydrate(self, name):
+        """Bring an archived file back to the hot tier."""
+        with _rehydrate_lock:
+            if not self.is_archived(name):
+                return False
+            src = self.archive_path(name)
+            dst = self.path(name)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            tmp = f"{dst}.{os.getpid()}.tmp"
+            with gzip.open(src, 'rb') as fin, open(tmp, 'wb') as fout:
+                shutil.copyfileobj(fin, fout, 1024 * 1024)
+            os.replace(tmp, dst)
+            try:
+                os.remove(src)
+            except FileNotFoundError:
+                pass  # another process rehydrated it at the same time
+
+        from .tiering import mark_rehydrated
+        mark_rehydrated(name)
+        return True
+
+    def _open(self, name, mode='rb'):
+        if self.is_archived(name):
+            self.rehydrate(name)
+        from .tiering import mark_accessed
+        mark_accessed(name)
+        return super()._open(name, mode)
+
+    def exists(self, name):
+        # Archived names are still taken, so new uploads don't reuse them.
+        return super().exists(name) or os.path.exists(self.archive_path(name))
+
+    def size(self, name):
+        if self.is_archived(name):
+            # gzip stores the uncompressed size (mod 2**32) in its last 4 bytes
+            with open(self.archive_path(name), 'rb') as f:
+                f.seek(-4, os.SEEK_END)
+                return struct.unpack('<I', f.read(4))[0]
+        return super().size(name)
+
+    def delete(self, name):
+        super().delete(name)
+        try:
+            os.remove(self.archive_path(name))
+        except FileNotFoundError:
+            pass
+
@@ -0,0 +1,96 @@
+"""
+Typeahead completions for the search box (/api/assets/suggest/?q=).
+
+Both lookups are anchored prefix matches. On Postgres names are served by
+an index on UPPER(name) COLLATE "C" (migration 0019): the C collation lets
+one B-tree both answer the anchored LIKE and return the matches already in
+order, so a keystroke reads at most `limit` index entries rather than
+sorting every match, let alone running the full `name__icontains` list
+query. Tag completions are grouped and ranked by use, so they scan the
+matching range of the UPPER(tag) text_pattern_ops index (migration 0010).
+Tags are read from AssetTag, a row-per-tag copy of Asset.tags that every
+write path keeps in step via sync_tags().
+"""
+
+from django.db import connections
+from django.db.models import Count, Value
+from django.db.models.functions import Collate, Upper
+
+from .models import Asset, AssetTag
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+MAX_PREFIX_LENGTH = 100
+TAG_MAX_LENGTH = AssetTag._meta.get_field('tag').max_length
+
+
+def tag_values(tags):
+    """The distinct, non-empty tag strings of an Asset.tags value."""
+    if not isinstance(tags, list):
+        return set()
+    values = set()
+    for tag in tags:
+        tag = str(tag).strip()[:TAG_MAX_LENGTH]
+        if tag:
+            values.add(tag)
+    return values
+
+
+def sync_tags(asset):
+    """Bring the asset's AssetTag rows in line with asset.tags."""
+    wanted = tag_values(asset.tags)
+    existing = set(AssetTag.objects.filter(asset=asset).values_list('tag', flat=True))
+    stale = existing - wanted
+    if stale:
+        AssetTag.objects.filter(asset=asset, tag__in=stale).delete()
+    missing = wanted - existing
+    if missing:
+        AssetTag.objects.bulk_create(
+            [AssetTag(asset=asset, tag=tag) for tag in missing], ignore_conflicts=True
+        )
+
+
+def sync_tags_bulk(assets):
+    """AssetTag rows for freshly created assets (nothing to remove yet)."""
+    AssetTag.objects.bulk_create(
+        [AssetTag(asset_id=asset.pk, tag=tag) for asset in assets for tag in tag_values(asset.tags)],
+        ignore_conflicts=True,
+    )
+
+
+def name_matches(queryset, prefix):
+    """Assets of queryset whose name starts with prefix, ignoring case, in name order."""
+    if connections[queryset.db].vendor == 'postgresql':
+        # Filter and sort on exactly the indexed expression
+        return (
+            queryset.alias(name_key=Collate(Upper('name'), 'C'))
+            .filter(name_key__startswith=Upper(Value(prefix)))
+            .order_by('name_key', 'id')
+        )
+    return queryset.filter(name__istartswith=prefix).order_by(Upper('name'), 'id')
+
+
+def suggest_names(queryset, prefix, limit=DEFAULT_LIMIT):
+    return list(name_matches(queryset, prefix).values('id', 'name', 'file_type')[:limit])
+
+
+def suggest_tags(queryset, prefix, limit=DEFAULT_LIMIT):
+    """Most used tags starting with prefix among the assets in queryset."""
+    rows = (
+        AssetTag.objects.filter(tag__istartswith=prefix, asset__in=queryset.order_by().values('pk'))
+        .values('tag')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'tag')[:limit]
+    )
+    return [{'tag': row['tag'], 'count': row['count']} for row in rows]
+
+
+def suggest(user, prefix, limit=DEFAULT_LIMIT):
+    prefix = prefix.strip()[:MAX_PREFIX_LENGTH]
+    if not prefix:
+        return {'names': [], 'tags': []}
+    visible = Asset.objects.visible_to(user)
+    return {
+        'names': suggest_names(visible, prefix, limit),
+        'tags': suggest_tags(visible, prefix, limit),
+    }
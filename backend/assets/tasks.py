@@ -0,0 +1,43 @@
+"""Background tasks for assets, run by the job workers (see jobs/queue.py)."""
+
+from jobs.registry import task
+
+from . import palette, phash
+from .models import Asset
+
+
+@task('assets.process_upload', max_attempts=3)
+def process_upload(asset_id):
+    """
+    Heavy per-upload work: perceptual hash and colour palette. The baseline
+    revision is stored only when the asset is first revised.
+    """
+    asset = Asset.objects.filter(pk=asset_id).first()
+    if asset is None:
+        return 'asset deleted'
+    if asset.file_type == 'IMG':
+        if not asset.phash_attempted:
+            phash.update_asset_phash(asset)
+        if asset.palette is None:
+            palette.update_asset_palette(asset)
+    return 'processed'
+
+
+def enqueue_process_upload(asset, user=None):
+    return process_upload.enqueue(
+        args={'asset_id': asset.pk}, dedup_key=f'assets.process_upload:{asset.pk}', user=user,
+    )
+
+
+@task('assets.purge_trash', max_attempts=3)
+def purge_trash(older_than_days=None):
+    """Hard-delete assets that have been in the trash longer than the retention period."""
+    from .cleanup import purge_expired_trash
+    return {'purged': purge_expired_trash(older_than_days)}
+
+
+@task('assets.refresh_related', max_attempts=3)
+def refresh_related(full=False):
+    """Recompute related-asset lists for assets changed since the last run."""
+    from .recommendations import refresh
+    return refresh(full=full)
@@ -1,3 +1,1295 @@
-from django.test import TestCase
+import io
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+try:
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+import boto3
+import numpy as np
+import requests
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from users.models import User
+from .hll import HyperLogLog
+from .models import (
+    Asset, AssetAccess, AssetChange, AssetColor, AssetDailyViews, AssetRevision, Collection, CollectionAsset,
+    IngestedFile, RelatedAsset, UsageCounter,
+)
+from .ingest import TreeIngest
+from .ingest_worker import inspect_file, sniff
+from .views import AssetViewSet
+from . import (
+    admission, changes, cleanup, collection_tree, facets, palette, phash, popularity, query, recommendations,
+    renditions, sharing, suggest, tasks, tiering, usage,
+)
+from . import revisions as revision_store
+
+
+def _at(year, month, day):
+    return datetime(year, month, day, 12, tzinfo=dt_timezone.utc)
+
+
+class TempMediaMixin:
+    """Keep the media, archive and chunk files a test writes in a temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.enterContext(override_settings(
+            MEDIA_ROOT=os.path.join(root, 'media'),
+            ARCHIVE_ROOT=os.path.join(root, 'archive'),
+            CHUNK_STORE_DIR=os.path.join(root, 'chunks'),
+            RENDITION_CACHE_DIR=os.path.join(root, 'renditions'),
+        ))
+
+
+class AssetQueryCorpusTests(TestCase):
+    """Each query in CORPUS must return exactly the listed asset names."""
+
+    CORPUS = [
+        ('type:3D', {'car', 'truck'}),
+        ('type:image', {'red paint', 'logo'}),
+        ('tag:car', {'car', 'red paint'}),
+        ('-tag:car', {'truck', 'logo', 'manual'}),
+        ('size>10MB', {'car', 'manual'}),
+        ('size<=1MB', {'logo'}),
+        ('size:1MB..20MB', {'red paint', 'truck', 'car'}),
+        ('polys<50000', {'truck'}),
+        ('polys:40000..200000', {'car', 'truck'}),
+        ('created:2026-01..2026-03', {'car', 'red paint', 'truck'}),
+        ('created:2026-02', {'red paint'}),
+        ('created>2026-03', {'logo', 'manual'}),
+        ('created<2026-01', set()),
+        ('category:vehicles', {'car', 'truck'}),
+        ('is:private', {'manual'}),
+        ('"red paint"', {'red paint'}),
+        ('type:3D tag:car size>10MB polys<150000', {'car'}),
+        ('type:3D tag:car size>10MB polys<50000 created:2026-01..2026-03 "red paint"', set()),
+        ('TYPE:img LOGO', {'logo'}),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='Admin')
+        rows = [
+            ('car', '3D', ['car', 'vehicle'], 'vehicles', 15 * 1024 ** 2, 120000, _at(2026, 1, 10), True),
+            ('truck', '3D', ['vehicle'], 'vehicles', 8 * 1024 ** 2, 45000, _at(2026, 3, 31), True),
+            ('red paint', 'IMG', ['car', 'paint'], 'textures', 2 * 1024 ** 2, None, _at(2026, 2, 14), True),
+            ('logo', 'IMG', ['brand'], 'branding', 300 * 1024, None, _at(2026, 4, 2), True),
+            ('manual', 'DOC', [], 'docs', 40 * 1024 ** 2, None, _at(2026, 5, 20), False),
+        ]
+        for name, file_type, tags, category, size, polys, created, public in rows:
+            asset = Asset.objects.create(
+                user=cls.admin, file=f'uploads/{name}.bin', name=name, file_type=file_type,
+                tags=tags, category=category, file_size=size, polygon_count=polys, is_public=public,
+            )
+            # created_at is auto_now_add, so set it afterwards
+            Asset.objects.filter(pk=asset.pk).update(created_at=created)
+
+    def test_corpus(self):
+        for expression, expected in self.CORPUS:
+            with self.subTest(q=expression):
+                names = set(query.apply(Asset.objects.all(), expression).values_list('name', flat=True))
+                self.assertEqual(names, expected)
+
+    def test_sorting(self):
+        by_size = query.apply(Asset.objects.all(), '', sort='-size')
+        self.assertEqual(list(by_size.values_list('name', flat=True)), ['manual', 'car', 'truck', 'red paint', 'logo'])
+        by_name = query.apply(Asset.objects.all(), 'sort:name type:3D')
+        self.assertEqual(list(by_name.values_list('name', flat=True)), ['car', 'truck'])
+
+
+class AssetQueryRejectionTests(SimpleTestCase):
+    def test_rejects_expensive_or_invalid_queries(self):
+        for expression in [
+            '*car',             # leading wildcard
+            'ab',               # too short for the trigram index
+            'owner:bob',        # unknown field
+            'size>lots',        # bad unit
+            'created:2026-13',  # bad month
+            'created:9999-12-31',  # the day after is past the calendar
+            'size>' + '9' * 400,
+            'type>3D',          # operator not supported for the field
+            '"unbalanced',
+            ' '.join(f'word{i}' for i in range(query.MAX_TEXT_TERMS + 1)),
+            ' '.join(f'tag:t{i}' for i in range(query.MAX_TERMS + 1)),
+        ]:
+            with self.subTest(q=expression):
+                with self.assertRaises(query.QueryError):
+                    query.parse(expression)
+
+    def test_rejects_unknown_sort(self):
+        with self.assertRaises(query.QueryError):
+            query.parse_sort('description')
+
+    def test_tag_predicate_follows_the_querysets_database(self):
+        vendors = {'default': mock.Mock(vendor='postgresql'), 'replica': mock.Mock(vendor='sqlite')}
+        with mock.patch.object(query, 'connections', vendors):
+            self.assertEqual(query.parse('tag:car')[0], Q(tags__contains=['car']))
+            self.assertEqual(query.parse('tag:car', 'replica')[0], Q(tags__icontains='"car"'))
+
+
+@skipUnless(connection.vendor == 'postgresql', "EXPLAIN checks need Postgres")
+class AssetQueryExplainTests(TestCase):
+    """Every supported operator must be answerable from an index."""
+
+    OPERATORS = [
+        ('type:3D', 'asset_type_created_idx'),
+        ('category:vehicles', 'asset_category_idx'),
+        ('tag:car', 'asset_tags_gin_idx'),
+        ('size>10MB', 'asset_size_idx'),
+        ('polys<50000', 'asset_polys_idx'),
+        ('created:2026-01..2026-03', 'asset_created_idx'),
+        ('"red paint"', 'asset_name_trgm_idx'),
+    ]
+
+    def test_operators_use_indexes(self):
+        with connection.cursor() as cursor:
+            # Tiny test tables would otherwise always be scanned sequentially.
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                for expression, index in self.OPERATORS:
+                    with self.subTest(q=expression):
+                        q, _ = query.parse(expression)
+                        plan = Asset.objects.filter(q).explain()
+                        self.assertIn(index, plan)
+            finally:
+                cursor.execute('SET enable_seqscan = on')
+
+
+class RenditionCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def test_evicts_least_recently_used(self):
+        cache = renditions.RenditionCache(self.root, max_bytes=250)
+        cache.get_or_render('a' * 64, 'jpg', lambda: b'x' * 100)
+        cache.get_or_render('b' * 64, 'jpg', lambda: b'x' * 100)
+        self.assertIsNotNone(cache.get('a' * 64, 'jpg'))  # now the most recent
+        cache.get_or_render('c' * 64, 'jpg', lambda: b'x' * 100)
+
+        self.assertIsNone(cache.get('b' * 64, 'jpg'))
+        self.assertIsNotNone(cache.get('a' * 64, 'jpg'))
+        self.assertIsNotNone(cache.get('c' * 64, 'jpg'))
+        # A new cache over the same directory picks the entries up again
+        self.assertEqual(renditions.RenditionCache(self.root, max_bytes=250).get('c' * 64, 'jpg'), cache.get('c' * 64, 'jpg'))
+
+    def test_concurrent_requests_render_once(self):
+        cache = renditions.RenditionCache(self.root, max_bytes=10 ** 6)
+        rendered = []
+        started = threading.Event()
+
+        def render():
+            rendered.append(1)
+            started.set()
+            time.sleep(0.2)
+            return b'variant'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_render('d' * 64, 'png', render)))
+            for _ in range(4)
+        ]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(rendered), 1)
+        self.assertEqual(len(set(results)), 1)
+
+    def test_render_fits_without_upscaling(self):
+        source = io.BytesIO()
+        Image.new('RGB', (400, 200), (200, 30, 30)).save(source, 'PNG')
+        for width, height, expected in [(100, None, (100, 50)), (None, 50, (100, 50)), (800, 800, (400, 200))]:
+            with self.subTest(w=width, h=height):
+                source.seek(0)
+                data = renditions.render_image(source, width, height, 'webp')
+                with Image.open(io.BytesIO(data)) as image:
+                    self.assertEqual((image.format, image.size), ('WEBP', expected))
+
+    def test_rejects_bad_specs(self):
+        for params in [{'w': '0'}, {'w': 'wide'}, {'h': str(renditions.MAX_DIMENSION + 1)}, {'fmt': 'gif'}]:
+            with self.subTest(params=params):
+                with self.assertRaises(renditions.RenditionError):
+                    renditions.parse_spec(params)
+
+
+class RenderVariantTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch.object(renditions, '_cache', None))
+        self.user = User.objects.create_user('viewer', 'viewer@example.com', 'pw', role='Viewer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _render(self, content):
+        asset = Asset(user=self.user, name='a', file_type='IMG')
+        asset.file.save('a.png', ContentFile(content))
+        return self.client.get(f'/api/assets/{asset.pk}/render/', {'w': 10})
+
+    def _png(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 20), (0, 90, 200)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_unreadable_and_missing_sources(self):
+        self.assertEqual(self._render(b'not an image').status_code, 400)
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 10):
+            self.assertEqual(self._render(self._png()).status_code, 400)  # decompression bomb
+
+        asset = Asset.objects.create(user=self.user, name='gone', file_type='IMG', file='uploads/gone.png')
+        self.assertEqual(self.client.get(f'/api/assets/{asset.pk}/render/').status_code, 404)
+
+    def test_rerenders_a_variant_evicted_before_it_is_opened(self):
+        real = renditions.get_rendition
+        looked_up = []
+
+        def lookup(*args):
+            key, path = real(*args)
+            if not looked_up:
+                os.remove(path)  # evicted by another process in between
+            looked_up.append(path)
+            return key, path
+
+        with mock.patch.object(renditions, 'get_rendition', side_effect=lookup):
+            response = self._render(self._png())
+        self.assertEqual(len(looked_up), 2)
+        self.assertEqual(response.status_code, 200)
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (10, 5))
+
+
+class PerceptualHashTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='Admin')
+
+    def test_band_lookup_finds_everything_within_distance(self):
+        rng = random.Random(1)
+        target = rng.getrandbits(64)
+        hashes = [rng.getrandbits(64) for _ in range(40)]
+        # Near neighbours with their flipped bits spread over several bands
+        for distance in range(1, phash.MAX_DISTANCE + 1):
+            value = target
+            for bit in rng.sample(range(64), distance):
+                value ^= 1 << bit
+            hashes.append(value)
+        for i, value in enumerate(hashes):
+            Asset.objects.create(
+                user=self.admin, file=f'uploads/{i}.png', name=str(i), file_type='IMG', **phash.phash_fields(value)
+            )
+
+        for max_distance in (0, 3, phash.DEFAULT_DISTANCE, phash.MAX_DISTANCE):
+            with self.subTest(distance=max_distance):
+                found = {asset.name: d for asset, d in phash.find_similar(Asset.objects.all(), target, max_distance)}
+                expected = {
+                    str(i): phash.hamming(target, value)
+                    for i, value in enumerate(hashes) if phash.hamming(target, value) <= max_distance
+                }
+                self.assertEqual(found, expected)
+
+    def test_hash_survives_resizing_and_reencoding(self):
+        image = Image.new('RGB', (256, 256))
+        for x in range(256):
+            for y in range(256):
+                image.putpixel((x, y), (x, y, (x * y) % 256))
+        original, resized = io.BytesIO(), io.BytesIO()
+        image.save(original, 'PNG')
+        image.resize((120, 120)).save(resized, 'JPEG', quality=70)
+        original.seek(0)
+        resized.seek(0)
+        self.assertLessEqual(
+            phash.hamming(phash.compute_phash(original), phash.compute_phash(resized)), phash.DEFAULT_DISTANCE
+        )
+
+    def test_unreadable_images_are_not_retried(self):
+        broken = Asset.objects.create(user=self.admin, file='uploads/missing.png', name='missing', file_type='IMG')
+        for expected in ('Hashed 0 image(s), 1 unreadable.', 'Hashed 0 image(s), 0 unreadable.'):
+            out = io.StringIO()
+            call_command('compute_phashes', stdout=out)
+            self.assertIn(expected, out.getvalue())
+        self.assertEqual(Asset.objects.filter(phash_attempted=True).get().pk, broken.pk)
+        with mock.patch.object(phash, 'update_asset_phash') as update:
+            tasks.process_upload(broken.pk)
+        update.assert_not_called()
+
+
+class RevisionStoreTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+        self.data = random.Random(2).randbytes(1024 ** 2)
+        self.asset = Asset(user=self.user, name='model', file_type='3D')
+        self.asset.file.save('model.bin', ContentFile(self.data), save=False)
+        self.asset.file_size = len(self.data)
+        self.asset.save()
+
+    def test_chunk_boundaries_resynchronise_after_an_edit(self):
+        edited = self.data[:500000] + b'inserted' + self.data[500000:]
+        before = list(revision_store.iter_chunks(io.BytesIO(self.data)))
+        after = list(revision_store.iter_chunks(io.BytesIO(edited)))
+        self.assertEqual(b''.join(after), edited)
+        self.assertTrue(all(len(chunk) <= revision_store.MAX_CHUNK for chunk in after))
+        changed = set(after) - set(before)
+        self.assertLessEqual(len(changed), 2)
+
+    def test_revisions_store_only_changed_chunks_and_roll_back(self):
+        first = revision_store.ensure_baseline(self.asset, self.user)
+        self.assertEqual(first.stored_size, len(self.data))
+
+        edited = self.data[:500000] + b'inserted' + self.data[500000:]
+        second = revision_store.store_revision(self.asset, io.BytesIO(edited), user=self.user, file_name='model.bin')
+        revision_store.replace_file(self.asset, ContentFile(edited), 'model.bin')
+        self.assertEqual(second.number, 2)
+        self.assertLess(second.stored_size, 3 * revision_store.MAX_CHUNK)
+        self.assertEqual(b''.join(revision_store.iter_revision(second)), edited)
+
+        restored = revision_store.rollback(self.asset, first, user=self.user)
+        self.assertEqual((restored.number, restored.stored_size, restored.sha256), (3, 0, first.sha256))
+        with self.asset.file.open('rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(self.asset.file_size, len(self.data))
+
+
+class ArchiveDownloadTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pw', role='Editor')
+        self.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'pw', role='Viewer')
+        self.assets = [
+            self._asset('photo.jpg', b'jpeg bytes' * 1000, public=True),
+            self._asset('notes.txt', b'plain text ' * 1000, public=True),
+            self._asset('notes.txt', b'other notes', public=True),
+            self._asset('secret.txt', b'private', public=False),
+        ]
+
+    def _asset(self, file_name, data, public):
+        asset = Asset(user=self.owner, name=file_name, file_type='DOC', is_public=public)
+        asset.file.save(file_name, ContentFile(data), save=False)
+        asset.file_size = len(data)
+        asset.save()
+        return asset
+
+    def test_streams_visible_assets_as_zip(self):
+        client = APIClient()
+        client.force_authenticate(self.viewer)
+        response = client.post(
+            '/api/assets/download-archive/', {'ids': [asset.pk for asset in self.assets]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as zf:
+            self.assertIsNone(zf.testzip())
+            infos = {info.filename: info for info in zf.infolist()}
+            # The private asset is left out, the duplicate name numbered
+            self.assertEqual(len(infos), 3)
+            photo = next(name for name in infos if name.endswith('.jpg'))
+            self.assertEqual(infos[photo].compress_type, zipfile.ZIP_STORED)
+            texts = sorted(name for name in infos if name.endswith('.txt'))
+            self.assertTrue(all(infos[name].compress_type == zipfile.ZIP_DEFLATED for name in texts))
+            self.assertEqual(sorted(zf.read(name) for name in texts), [b'other notes', b'plain text ' * 1000])
+
+    def test_rejects_bad_selections(self):
+        client = APIClient()
+        client.force_authenticate(self.viewer)
+        for ids in [[], ['x'], list(range(AssetViewSet.archive_max_assets + 1))]:
+            with self.subTest(ids=ids[:3]):
+                response = client.post('/api/assets/download-archive/', {'ids': ids}, format='json')
+                self.assertEqual(response.status_code, 400)
+        response = client.post('/api/assets/download-archive/', {'ids': [self.assets[3].pk]}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class TieringTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        tiering._last_touch.clear()
+        self.user = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+        now = timezone.now()
+        self.old = self._asset('old.bin', 100, last_used=now - timedelta(days=60))
+        self.stale = self._asset('stale.bin', 300, last_used=now - timedelta(days=10))
+        self.recent = self._asset('recent.bin', 200, last_used=now - timedelta(days=1))
+
+    def _asset(self, file_name, size, last_used):
+        asset = Asset(user=self.user, name=file_name, file_type='DOC')
+        asset.file.save(file_name, ContentFile(file_name.encode() * size), save=False)
+        asset.file_size = asset.file.size
+        asset.save()
+        Asset.objects.filter(pk=asset.pk).update(last_accessed_at=last_used)
+        return asset
+
+    def test_selects_cold_then_least_recently_used(self):
+        self.assertEqual(tiering.select_cold_assets(30), [self.old])
+        # Over the hot cap: the least recently used go next until it fits
+        hot_cap = self.recent.file_size + 1
+        self.assertEqual(tiering.select_cold_assets(30, hot_cap), [self.old, self.stale])
+
+    def test_archived_files_rehydrate_on_access(self):
+        self.assertTrue(tiering.archive_asset(self.old))
+        self.assertFalse(tiering.archive_asset(self.old))
+        storage = self.old.file.storage
+        name = self.old.file.name
+        self.assertTrue(storage.is_archived(name))
+        self.assertEqual(Asset.objects.get(pk=self.old.pk).tier, Asset.TIER_COLD)
+        self.assertEqual(storage.size(name), self.old.file_size)
+
+        with storage.open(name) as f:
+            self.assertEqual(f.read(), b'old.bin' * 100)
+        self.assertFalse(storage.is_archived(name))
+        self.assertEqual(Asset.objects.get(pk=self.old.pk).tier, Asset.TIER_HOT)
+
+    def test_media_url_rehydrates_archived_files_outside_debug(self):
+        tiering.archive_asset(self.old)
+        url = f"{settings.MEDIA_URL}{self.old.file.name}"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'old.bin' * 100)
+        self.assertFalse(self.old.file.storage.is_archived(self.old.file.name))
+        # Hot files are the web server's job; Django does not serve them without DEBUG
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@skipUnless(mock_aws, "direct upload tests need moto")
+@override_settings(STORAGES={
+    **settings.STORAGES,
+    'default': {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': 'dam-test', 'region_name': 'us-east-1',
+            'access_key': 'testing', 'secret_key': 'testing', 'file_overwrite': False,
+        },
+    },
+})
+class DirectUploadTests(TestCase):
+    def setUp(self):
+        self.enterContext(mock_aws())
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='dam-test')
+        self.editor = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.editor)
+
+    def _put(self, data, filename='model.glb'):
+        response = self.client.post(
+            '/api/assets/upload-url/', {'filename': filename, 'content_type': 'model/gltf-binary'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        uploaded = requests.put(body['url'], data=data, headers=body['headers'])
+        self.assertEqual(uploaded.status_code, 200)
+        return body['upload_token']
+
+    def _confirm(self, token, **fields):
+        return self.client.post(
+            '/api/assets/confirm-upload/',
+            {'upload_token': token, 'name': 'Model', 'file_type': '3D', **fields}, format='json',
+        )
+
+    def test_presign_put_confirm(self):
+        token = self._put(b'glTF' * 256)
+        response = self._confirm(token, tags=['car'])
+        self.assertEqual(response.status_code, 201, response.content)
+
+        asset = Asset.objects.get(pk=response.json()['asset']['id'])
+        self.assertEqual((asset.name, asset.file_size, asset.user), ('Model', 1024, self.editor))
+        self.assertTrue(asset.file.name.startswith('uploads/') and asset.file.name.endswith('/model.glb'))
+        self.assertIn('Signature=', self.client.get(f'/api/assets/{asset.pk}/download-url/').json()['url'])
+
+        # A token confirms one asset only
+        response = self._confirm(token)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Asset.objects.count(), 1)
+
+    def test_confirm_rejects_missing_upload_and_fields(self):
+        response = self.client.post(
+            '/api/assets/upload-url/', {'filename': 'model.glb'}, format='json'
+        )
+        self.assertEqual(self._confirm(response.json()['upload_token']).status_code, 400)  # never PUT
+
+        token = self._put(b'glTF')
+        response = self.client.post('/api/assets/confirm-upload/', {'upload_token': token}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('name', response.json()['details'])
+        self.assertFalse(Asset.objects.exists())
+
+    def test_confirm_rejects_oversized_uploads(self):
+        token = self._put(b'x' * 2048)
+        with mock.patch('assets.views.MAX_UPLOAD_SIZE', 1024):
+            response = self._confirm(token)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Asset.objects.exists())
+        # The object is deleted from the bucket too
+        self.assertEqual(self._confirm(token).status_code, 400)
+
+    def test_confirm_enforces_the_quota(self):
+        token = self._put(b'x' * 2048)
+        with override_settings(STORAGE_QUOTAS={**settings.STORAGE_QUOTAS, 'Editor': 1024}):
+            response = self._confirm(token)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Asset.objects.exists())
+
+
+class UploadAdmissionTests(TestCase):
+    def test_in_flight_limit(self):
+        uploads = admission.InFlightBytes(limit=100)
+        # A lone request is admitted whatever its size
+        self.assertTrue(uploads.try_acquire(500))
+        self.assertFalse(uploads.try_acquire(1))
+        uploads.release(500)
+        self.assertTrue(uploads.try_acquire(60))
+        self.assertTrue(uploads.try_acquire(40))
+        self.assertFalse(uploads.try_acquire(1))
+        uploads.release(40)
+        self.assertEqual(uploads.in_flight, 60)
+
+    def test_busy_uploads_are_turned_away(self):
+        editor = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+        client = APIClient()
+        client.force_authenticate(editor)
+        uploads = admission.InFlightBytes(limit=1024)
+        uploads.try_acquire(1024)  # another upload in progress
+
+        with mock.patch.object(admission, 'uploads', uploads):
+            response = client.post('/api/assets/', {
+                'file': SimpleUploadedFile('a.png', b'x' * 10), 'name': 'a', 'file_type': 'Image',
+            })
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(settings.UPLOAD_RETRY_AFTER))
+        self.assertFalse(Asset.objects.exists())
+        self.assertEqual(uploads.in_flight, 1024)
+
+        # An admitted request gives its bytes back however it ends
+        uploads.release(1024)
+        with mock.patch.object(admission, 'uploads', uploads):
+            response = client.post('/api/assets/', {'name': 'no file'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(uploads.in_flight, 0)
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pw', role='Editor')
+        self.other = User.objects.create_user('other', 'other@example.com', 'pw', role='Viewer')
+        self.private = self._create('private', is_public=False)
+        self.public = self._create('public', is_public=True)
+
+    def _create(self, name, is_public):
+        asset = Asset.objects.create(user=self.owner, file=f'uploads/{name}.bin', name=name, file_type='3D', is_public=is_public)
+        changes.record(asset, AssetChange.CREATED)
+        return asset
+
+    def _feed(self, user, cursor=0, limit=changes.DEFAULT_LIMIT):
+        entries, cursor, has_more = changes.changes_since(user, cursor, limit)
+        return [(kind, getattr(value, 'name', value)) for _, kind, value in entries], cursor, has_more
+
+    def test_each_user_hears_about_what_they_can_see(self):
+        self.assertEqual(self._feed(self.owner)[0], [('upsert', 'private'), ('upsert', 'public')])
+        self.assertEqual(self._feed(self.other)[0], [('upsert', 'public')])
+
+        # Sharing and unsharing reach just that user
+        sharing.grant(self.private, users=[self.other])
+        entries, cursor, _ = self._feed(self.other)
+        self.assertEqual(entries, [('upsert', 'public'), ('upsert', 'private')])
+        sharing.revoke(self.private, users=[self.other])
+        self.assertEqual(self._feed(self.other, cursor)[0], [('delete', self.private.pk)])
+
+    def test_changes_collapse_and_trash_gives_tombstones(self):
+        _, cursor, _ = self._feed(self.owner)
+        changes.record(self.public, AssetChange.UPDATED)
+        changes.record(self.public, AssetChange.UPDATED)
+        cleanup.trash(self.private)
+        entries, next_cursor, has_more = self._feed(self.owner, cursor)
+        self.assertEqual(entries, [('upsert', 'public'), ('delete', self.private.pk)])
+        self.assertEqual((next_cursor, has_more), (AssetChange.objects.latest('id').pk, False))
+        self.assertEqual(self._feed(self.owner, next_cursor), ([], next_cursor, False))
+
+    def test_pages_follow_the_cursor(self):
+        entries, cursor, has_more = self._feed(self.owner, limit=1)
+        self.assertEqual((entries, has_more), ([('upsert', 'private')], True))
+        entries, cursor, has_more = self._feed(self.owner, cursor, limit=1)
+        self.assertEqual((entries, has_more), ([('upsert', 'public')], False))
+
+    def test_unsettled_changes_are_held_back(self):
+        with override_settings(CHANGE_FEED_SETTLE_SECONDS=60):
+            self.assertEqual(self._feed(self.owner), ([], 0, False))
+            AssetChange.objects.filter(asset_id=self.private.pk).update(
+                created_at=timezone.now() - timedelta(seconds=61)
+            )
+            self.assertEqual(self._feed(self.owner)[0], [('upsert', 'private')])
+
+    def test_api(self):
+        client = APIClient()
+        client.force_authenticate(self.other)
+        data = client.get('/api/assets/changes/').json()
+        self.assertEqual([(change['type'], change['asset']['name']) for change in data['changes']], [('upsert', 'public')])
+        self.assertEqual(data['next_cursor'], str(AssetChange.objects.get(asset_id=self.public.pk).pk))
+        self.assertEqual(client.get('/api/assets/changes/', {'since': data['next_cursor']}).json()['changes'], [])
+        self.assertEqual(client.get('/api/assets/changes/', {'since': 'abc'}).status_code, 400)
+        self.assertEqual(client.get('/api/assets/changes/', {'since': '-1'}).status_code, 400)
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0)
+class RecommendationTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.enterContext(override_settings(RELATED_INDEX_PATH=os.path.join(root, 'terms.npz')))
+        self.user = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+        rng = random.Random(3)
+        words = ['car', 'truck', 'red', 'blue', 'tree', 'house', 'road', 'night', 'snow', 'city']
+        self.assets = [
+            self._create(f'{rng.choice(words)} {i}.png', rng.sample(words, 3), ' '.join(rng.sample(words, 2)))
+            for i in range(30)
+        ]
+
+    def _create(self, name, tags, keywords=''):
+        asset = Asset.objects.create(
+            user=self.user, file=f'uploads/{name}', name=name, file_type='Image', tags=tags, keywords=keywords,
+        )
+        changes.record(asset, AssetChange.CREATED)
+        return asset
+
+    def _full_index(self):
+        return recommendations.TfidfIndex.build(
+            Asset.objects.order_by('id').values_list('id', 'name', 'tags', 'keywords', 'category')
+        )
+
+    def _stored(self):
+        lists = {}
+        for row in RelatedAsset.objects.order_by('asset_id', 'rank'):
+            lists.setdefault(row.asset_id, []).append(row.related_id)
+        return lists
+
+    def test_neighbours_share_terms(self):
+        car = self._create('car.png', ['vehicle', 'wheels'])
+        truck = self._create('truck.png', ['vehicle', 'wheels'])
+        self._create('tree.png', ['plant'])
+        index = self._full_index()
+        self.assertEqual(index.top_k(car.pk, 1)[0][0], truck.pk)
+        self.assertAlmostEqual(index.top_k(car.pk, 1)[0][1], index.top_k(truck.pk, 1)[0][1])
+
+    def test_incremental_run_reuses_the_saved_terms(self):
+        first = recommendations.refresh()
+        self.assertEqual((first['full'], first['recomputed']), (True, 30))
+
+        edited, trashed = self.assets[0], self.assets[1]
+        Asset.objects.filter(pk=edited.pk).update(tags=['snow', 'tree', 'mountain'])
+        changes.record(edited, AssetChange.UPDATED)
+        cleanup.trash(trashed)
+        added = self._create('mountain.png', ['mountain', 'snow'])
+
+        with mock.patch.object(recommendations, '_asset_rows', wraps=recommendations._asset_rows) as read:
+            second = recommendations.refresh()
+        self.assertFalse(second['full'])
+        # Only the changed assets were read from the database
+        read.assert_called_once_with({edited.pk, trashed.pk, added.pk})
+
+        # The updated corpus scores like one built from scratch
+        corpus = recommendations.Corpus.load(settings.RELATED_INDEX_PATH, second['cursor'])
+        incremental, full = recommendations.TfidfIndex.from_corpus(corpus), self._full_index()
+        self.assertEqual(incremental.ids.tolist(), full.ids.tolist())
+        for asset_id in full.ids.tolist():
+            self.assertEqual(
+                [(i, round(score, 6)) for i, score in incremental.top_k(asset_id)],
+                [(i, round(score, 6)) for i, score in full.top_k(asset_id)],
+            )
+        stored = self._stored()
+        self.assertNotIn(trashed.pk, stored)
+        self.assertNotIn(trashed.pk, [i for neighbours in stored.values() for i in neighbours])
+        self.assertEqual(stored[added.pk], [i for i, _ in full.top_k(added.pk)])
+
+    def test_missing_or_stale_terms_mean_a_full_read(self):
+        recommendations.refresh()
+        changes.record(self.assets[0], AssetChange.UPDATED)
+        os.remove(settings.RELATED_INDEX_PATH)
+        with mock.patch.object(recommendations, '_asset_rows', wraps=recommendations._asset_rows) as read:
+            summary = recommendations.refresh()
+        read.assert_called_once_with()
+        self.assertFalse(summary['full'])  # only the lists are incremental
+        self.assertIsNone(recommendations.Corpus.load(settings.RELATED_INDEX_PATH, summary['cursor'] - 1))
+
+
+class SniffTests(SimpleTestCase):
+    def test_content_wins_over_the_extension(self):
+        png = b'\x89PNG\r\n\x1a\n' + bytes(8)
+        self.assertEqual(sniff(png, 'txt'), 'IMG')
+        self.assertEqual(sniff(b'\x00\x00\x00\x18ftypheic', ''), 'IMG')
+        self.assertEqual(sniff(b'\x00\x00\x00\x18ftypisom', 'jpg'), 'VID')
+        self.assertEqual(sniff(b'RIFF\x00\x00\x00\x00AVI LIST', ''), 'VID')
+        self.assertEqual(sniff(b'glTF\x02\x00\x00\x00', 'bin'), '3D')
+        self.assertEqual(sniff(b'%PDF-1.7', ''), 'DOC')
+
+    def test_falls_back_to_the_extension(self):
+        self.assertEqual(sniff(b'PK\x03\x04', 'docx'), 'DOC')
+        self.assertEqual(sniff(b'solid cube', 'stl'), '3D')
+        self.assertEqual(sniff(b'', 'xyz'), 'OTH')
+        self.assertEqual(sniff(b'', ''), 'OTH')
+
+
+class TreeIngestTests(TempMediaMixin, TransactionTestCase):
+    """
+    Runs the pool as threads. TransactionTestCase, since a run closes the
+    database connections before starting its pool.
+    """
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.user = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+        self.enterContext(mock.patch(
+            'assets.ingest.ProcessPoolExecutor', lambda max_workers, initializer: ThreadPoolExecutor(max_workers),
+        ))
+
+    def _write(self, relative, data):
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def _run(self, **options):
+        with mock.patch('assets.ingest.inspect_file', wraps=inspect_file) as inspected:
+            stats = TreeIngest(self.root, self.user, processes=2, batch_size=2, **options).run()
+        return stats, sorted(call.args[0] for call in inspected.call_args_list)
+
+    def test_resumed_run_skips_imported_files(self):
+        first = self._write('cars/a.glb', b'glTF one')
+        second = self._write('cars/b.pdf', b'%PDF two')
+        stats, inspected = self._run(dir_tags=True)
+        self.assertEqual((stats['imported'], inspected), (2, [first, second]))
+        asset = Asset.objects.get(name='a.glb')
+        self.assertEqual((asset.file_type, asset.tags, asset.file_size), ('3D', ['cars'], 8))
+        self.assertEqual(IngestedFile.objects.get(source=first).asset, asset)
+
+        third = self._write('c.txt', b'three')
+        stats, inspected = self._run()
+        self.assertEqual((stats['imported'], stats['already_imported'], inspected), (1, 2, [third]))
+        self.assertEqual(Asset.objects.count(), 3)
+
+    def test_failed_files_are_reported_and_retried(self):
+        path = self._write('a.glb', b'glTF')
+        with mock.patch('django.core.files.storage.default_storage.save', side_effect=RuntimeError('disk full')):
+            self.assertEqual(inspect_file(path), {'path': path, 'error': 'disk full'})
+            stats, _ = self._run()
+        self.assertEqual((stats['failed'], stats['imported']), (1, 0))
+        self.assertEqual(set(inspect_file(os.path.join(self.root, 'missing'))), {'path', 'error'})
+
+        # Nothing was recorded for it, so the next run tries again
+        stats, inspected = self._run()
+        self.assertEqual((stats['imported'], inspected), (1, [path]))
+
+
+class HyperLogLogTests(SimpleTestCase):
+    def test_estimates_within_the_error_bound(self):
+        for n in (10, 1000, 50000):
+            estimate = HyperLogLog().update(range(n)).count()
+            # Three standard errors (3.3% each)
+            self.assertLessEqual(abs(estimate - n), max(1, 0.1 * n), n)
+        self.assertEqual(HyperLogLog().count(), 0)
+        self.assertEqual(HyperLogLog().update(['a'] * 100).count(), 1)
+
+    def test_sparse_and_dense_round_trip(self):
+        for n, form in ((20, b'S'), (5000, b'D')):
+            sketch = HyperLogLog().update(range(n))
+            data = sketch.to_bytes()
+            self.assertEqual(data[:1], form)
+            restored = HyperLogLog.from_bytes(memoryview(data))
+            np.testing.assert_array_equal(restored.registers, sketch.registers)
+        self.assertEqual(len(HyperLogLog().update(range(20)).to_bytes()), 1 + 3 * 20)
+        self.assertEqual(len(HyperLogLog().update(range(5000)).to_bytes()), 1 + 1024)
+        self.assertEqual(HyperLogLog.from_bytes(b'').count(), 0)
+        self.assertEqual(HyperLogLog.from_bytes(None).count(), 0)
+
+    def test_merge_is_the_union(self):
+        merged = HyperLogLog().update(range(1000)).merge(HyperLogLog().update(range(500, 1500)))
+        union = HyperLogLog().update(range(1500))
+        np.testing.assert_array_equal(merged.registers, union.registers)
+        self.assertLessEqual(abs(merged.count() - 1500), 150)
+
+
+class ViewBufferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+        self.asset = Asset.objects.create(user=self.user, file='uploads/a.png', name='a', file_type='Image')
+        self.buffer = popularity.ViewBuffer()
+
+    def _daily(self):
+        return {
+            row.day: (row.views, HyperLogLog.from_bytes(row.viewers).count())
+            for row in AssetDailyViews.objects.filter(asset=self.asset)
+        }
+
+    def test_flush_writes_counts_and_viewers(self):
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
+        for viewer, day in (('user:1', today), ('user:1', today), ('user:2', today), ('anonymous', yesterday)):
+            self.buffer.add(self.asset.pk, viewer, day)
+        self.assertEqual(self.buffer.flush(), 4)
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self._daily(), {today: (3, 2), yesterday: (1, 1)})
+
+        self.buffer.add(self.asset.pk, 'user:3', today)
+        self.buffer.add(self.asset.pk, 'user:1', today)
+        self.buffer.flush()
+        self.assertEqual(self._daily()[today], (5, 3))
+        self.asset.refresh_from_db()
+        self.assertEqual(self.asset.view_count, 6)
+
+        stats = popularity.view_stats(self.asset, days=7)
+        self.assertEqual((stats['views'], stats['unique_viewers']), (6, 4))
+
+    def test_purged_assets_are_skipped(self):
+        today = timezone.localdate()
+        live, purged = (self.asset.pk, today), (self.asset.pk + 1, today)
+        popularity.write_views(Counter({live: 2, purged: 1}), {live: {'a'}, purged: {'b'}})
+        self.assertEqual(list(AssetDailyViews.objects.values_list('asset_id', 'views')), [(self.asset.pk, 2)])
+
+    def test_failed_flush_is_logged(self):
+        self.buffer.add(self.asset.pk, 'user:1')
+        with mock.patch.object(popularity, 'write_views', side_effect=RuntimeError), \
+                self.assertLogs('assets.popularity', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+
+    @override_settings(VIEW_FLUSH_MAX_KEYS=2, VIEW_FLUSH_SECONDS=3600)
+    def test_full_buffer_flushes_off_the_request_thread(self):
+        flushed = []
+        with mock.patch.object(self.buffer, 'flush', side_effect=lambda: flushed.append(threading.current_thread())):
+            self.buffer.add(self.asset.pk, 'user:1')
+            self.assertIsNone(self.buffer._flusher)
+            self.buffer.add(self.asset.pk + 1, 'user:1')
+            self.buffer._flusher.join(10)
+        self.assertEqual(len(flushed), 1)
+        self.assertIsNot(flushed[0], threading.current_thread())
+
+
+class CollectionTreeTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pw', role='Editor')
+        self.asset = Asset.objects.create(user=self.owner, file='uploads/a.png', name='a', file_type='Image')
+
+    def _chain(self, depth, name):
+        """root -> ... -> leaf, `depth` levels, each holding the asset; returns the collections."""
+        chain = [collection_tree.create(name=f'{name}0', owner=self.owner)]
+        for level in range(1, depth):
+            chain.append(collection_tree.create(parent=chain[-1], name=f'{name}{level}', owner=self.owner))
+        for collection in chain:
+            collection_tree.add_assets(collection, [self.asset.pk])
+        return chain
+
+    def _queries(self, operation):
+        with CaptureQueriesContext(connection) as queries:
+            operation()
+        return len(queries)
+
+    def test_subtree_move_and_delete_take_fixed_queries(self):
+        counts = {}
+        for depth in (3, 9):
+            chain = self._chain(depth, f'd{depth}-')
+            target = collection_tree.create(name=f'target{depth}', owner=self.owner)
+            counts[depth] = (
+                self._queries(lambda: list(collection_tree.subtree(chain[0]))),
+                self._queries(lambda: collection_tree.move(chain[1], target)),
+                self._queries(lambda: collection_tree.delete_subtree(target)),
+            )
+        self.assertEqual(counts[3], counts[9])
+
+    def test_move_rewrites_paths_and_depths(self):
+        a, b, c = self._chain(3, 'a')
+        other = collection_tree.create(name='other', owner=self.owner)
+        collection_tree.move(b, other)
+        b.refresh_from_db()
+        c.refresh_from_db()
+        self.assertEqual((b.parent, b.path, b.depth), (other, f'{other.pk}/{b.pk}/', 1))
+        self.assertEqual((c.path, c.depth), (f'{other.pk}/{b.pk}/{c.pk}/', 2))
+        self.assertEqual([node.pk for node in collection_tree.subtree(a)], [a.pk])
+
+        collection_tree.move(b, None)
+        c.refresh_from_db()
+        self.assertEqual((c.path, c.depth), (f'{b.pk}/{c.pk}/', 1))
+        with self.assertRaises(collection_tree.CollectionError):
+            collection_tree.move(b, c)
+
+    def test_delete_removes_the_branch_but_not_the_assets(self):
+        a, b, c = self._chain(3, 'a')
+        collection_tree.delete_subtree(b)
+        self.assertEqual(list(Collection.objects.values_list('pk', flat=True)), [a.pk])
+        self.assertEqual(list(CollectionAsset.objects.values_list('collection_id', flat=True)), [a.pk])
+        self.assertTrue(Asset.objects.filter(pk=self.asset.pk).exists())
+
+    def test_only_own_collections_can_be_parents(self):
+        other = User.objects.create_user('other', 'other@example.com', 'pw', role='Editor')
+        theirs = collection_tree.create(name='theirs', owner=other, is_public=True)
+        mine = collection_tree.create(name='mine', owner=self.owner)
+        client = APIClient()
+        client.force_authenticate(self.owner)
+
+        response = client.post('/api/collections/', {'name': 'sneaky', 'parent': theirs.pk}, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = client.post(f'/api/collections/{mine.pk}/move/', {'parent': theirs.pk}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Collection.objects.filter(parent=theirs).count(), 0)
+
+        response = client.post('/api/collections/', {'name': 'child', 'parent': mine.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='Admin')
+        client.force_authenticate(admin)
+        response = client.post(f'/api/collections/{mine.pk}/move/', {'parent': theirs.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+class PaletteTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+
+    def _image(self, name, content):
+        asset = Asset(user=self.user, name=name, file_type='IMG')
+        asset.file.save(name, ContentFile(content))
+        return asset
+
+    def _png(self, color, mode='RGB'):
+        buffer = io.BytesIO()
+        Image.new(mode, (32, 32), color).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_buckets_near_matches_brute_force(self):
+        values = np.arange(256)
+        level_of = values >> (8 - palette.BUCKET_BITS)
+        rng = random.Random(5)
+        for _ in range(50):
+            color = tuple(rng.randrange(256) for _ in range(3))
+            tolerance = rng.choice([0, 1, 10, 40, 90, 128])
+            # Per channel, the smallest squared distance to any value of each level
+            nearest = [
+                np.array([((values[level_of == level] - c) ** 2).min() for level in range(8)])
+                for c in color
+            ]
+            expected = sorted(
+                palette.bucket(r * 32, g * 32, b * 32)
+                for r in range(8) for g in range(8) for b in range(8)
+                if nearest[0][r] + nearest[1][g] + nearest[2][b] <= tolerance ** 2
+            )
+            self.assertEqual(sorted(palette.buckets_near(color, tolerance)), expected, (color, tolerance))
+            self.assertIn(palette.bucket(*color), expected)
+
+    def test_filter_by_color(self):
+        rng = random.Random(7)
+        colors = {}
+        for i in range(40):
+            asset = Asset.objects.create(user=self.user, file=f'uploads/{i}.png', name=str(i), file_type='IMG')
+            colors[asset.pk] = [tuple(rng.randrange(256) for _ in range(3)) for _ in range(3)]
+            AssetColor.objects.bulk_create(palette.color_rows(asset, [(*color, 30) for color in colors[asset.pk]]))
+
+        for target, tolerance in (((200, 30, 30), 40), ((10, 10, 10), 90), ((128, 128, 128), 0)):
+            expected = {
+                asset_id for asset_id, rgb in colors.items()
+                if any(sum((a - b) ** 2 for a, b in zip(color, target)) <= tolerance ** 2 for color in rgb)
+            }
+            found = set(palette.filter_by_color(Asset.objects.all(), target, tolerance).values_list('pk', flat=True))
+            self.assertEqual(found, expected)
+
+    def test_images_without_a_palette_are_not_retried(self):
+        red = self._image('red.png', self._png((255, 0, 0)))
+        clear = self._image('clear.png', self._png((0, 0, 0, 0), 'RGBA'))
+        broken = self._image('broken.png', b'not a png')
+        self.assertIsNone(red.palette)
+
+        out = io.StringIO()
+        call_command('compute_palettes', stdout=out)
+        self.assertIn('Extracted 2 palette(s), 1 unreadable.', out.getvalue())
+        stored = dict(Asset.objects.values_list('pk', 'palette'))
+        self.assertEqual((stored[red.pk], stored[clear.pk], stored[broken.pk]), ('ff0000:100', '', ''))
+
+        out = io.StringIO()
+        call_command('compute_palettes', stdout=out)
+        self.assertIn('Extracted 0 palette(s), 0 unreadable.', out.getvalue())
+        with mock.patch.object(palette, 'update_asset_palette') as update:
+            tasks.process_upload(broken.pk)
+        update.assert_not_called()
+        # The file is only copied into the revision store once it is revised
+        self.assertFalse(AssetRevision.objects.exists())
+
+
+class SharingTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pw', role='Editor')
+        self.ann = User.objects.create_user('ann', 'ann@example.com', 'pw', role='Viewer')
+        self.bob = User.objects.create_user('bob', 'bob@example.com', 'pw', role='Viewer')
+        self.team = Group.objects.create(name='team')
+        self.asset = Asset.objects.create(
+            user=self.owner, file='uploads/a.png', name='a', file_type='IMG', is_public=False,
+        )
+
+    def _access(self):
+        return set(AssetAccess.objects.values_list('asset_id', 'user_id'))
+
+    def _sees(self, user):
+        return Asset.objects.visible_to(user).filter(pk=self.asset.pk).exists()
+
+    def _notified(self):
+        return sorted(AssetChange.objects.filter(recipient_id__isnull=False).values_list('recipient_id', flat=True))
+
+    def test_grant_and_revoke(self):
+        self.ann.groups.add(self.team)
+        self.assertEqual(sharing.grant(self.asset, users=[self.ann], groups=[self.team], granted_by=self.owner), 2)
+        self.assertEqual(sharing.grant(self.asset, users=[self.ann]), 0)
+        self.assertEqual(self._access(), {(self.asset.pk, self.ann.pk)})
+        self.assertEqual(self._notified(), [self.ann.pk])
+        self.assertTrue(self._sees(self.ann))
+        self.assertFalse(self._sees(self.bob))
+
+        # Still shared through the group
+        self.assertEqual(sharing.revoke(self.asset, users=[self.ann]), 1)
+        self.assertTrue(self._sees(self.ann))
+        self.assertEqual(sharing.revoke(self.asset, groups=[self.team]), 1)
+        self.assertFalse(self._sees(self.ann))
+        self.assertEqual(self._access(), set())
+        self.assertEqual(self._notified(), [self.ann.pk, self.ann.pk])
+
+    def test_membership_changes_follow_group_grants(self):
+        sharing.grant(self.asset, groups=[self.team])
+        self.ann.groups.add(self.team)
+        self.team.user_set.add(self.bob)
+        self.assertEqual(self._access(), {(self.asset.pk, self.ann.pk), (self.asset.pk, self.bob.pk)})
+
+        self.team.user_set.remove(self.bob)
+        self.assertFalse(self._sees(self.bob))
+
+        # clear() from either side, and a direct grant outlives the group
+        sharing.grant(self.asset, users=[self.ann])
+        self.ann.groups.clear()
+        self.assertTrue(self._sees(self.ann))
+        sharing.revoke(self.asset, users=[self.ann])
+        self.ann.groups.add(self.team)
+        self.team.user_set.clear()
+        self.assertFalse(self._sees(self.ann))
+
+    def test_deleting_a_group_removes_its_access(self):
+        self.team.user_set.add(self.ann, self.bob)
+        sharing.grant(self.asset, users=[self.bob], groups=[self.team])
+        self.team.delete()
+        self.assertEqual(self._access(), {(self.asset.pk, self.bob.pk)})
+        self.assertEqual(sharing.grants_of(self.asset), ([self.bob], []))
+
+    def test_rebuild(self):
+        self.team.user_set.add(self.ann)
+        sharing.grant(self.asset, groups=[self.team])
+        expected = self._access()
+        self.assertEqual(sharing.rebuild(), (0, 0))
+
+        AssetAccess.objects.all().delete()
+        AssetAccess.objects.create(asset=self.asset, user=self.bob)
+        out = io.StringIO()
+        call_command('rebuild_asset_access', stdout=out)
+        self.assertIn('1 row(s) added, 1 removed', out.getvalue())
+        self.assertEqual(self._access(), expected)
+
+    def test_shares_grant_reading_only(self):
+        editor = User.objects.create_user('ed', 'ed@example.com', 'pw', role='Editor')
+        sharing.grant(self.asset, users=[editor])
+        client = APIClient()
+        client.force_authenticate(editor)
+        url = f'/api/assets/{self.asset.pk}/'
+
+        self.assertEqual(client.get(url).status_code, 200)
+        self.assertEqual(client.get(f'{url}revisions/').status_code, 200)
+        self.assertEqual(client.patch(url, {'name': 'mine now'}, format='multipart').status_code, 404)
+        self.assertEqual(client.post(f'{url}revisions/1/rollback/').status_code, 404)
+        upload = SimpleUploadedFile('b.png', b'new', content_type='image/png')
+        self.assertEqual(client.post(f'{url}revisions/', {'file': upload}, format='multipart').status_code, 404)
+        self.assertEqual(Asset.objects.get(pk=self.asset.pk).name, 'a')
+
+
+class FacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+        rows = [
+            ('car', '3D', ['car', 'vehicle'], 'vehicles', _at(2026, 1, 10), True),
+            ('truck', '3D', ['vehicle'], 'vehicles', _at(2026, 1, 20), True),
+            ('paint', 'IMG', ['car'], 'textures', _at(2026, 2, 14), True),
+            ('draft', '3D', ['vehicle'], 'vehicles', _at(2026, 3, 1), False),
+        ]
+        other = User.objects.create_user('other', 'other@example.com', 'pw', role='Editor')
+        for name, file_type, tags, category, created, public in rows:
+            asset = Asset.objects.create(
+                user=cls.editor if public else other, file=f'uploads/{name}.bin', name=name,
+                file_type=file_type, tags=tags, category=category, is_public=public,
+            )
+            Asset.objects.filter(pk=asset.pk).update(created_at=created)
+
+    def test_counts_follow_the_filter_and_visibility(self):
+        client = APIClient()
+        client.force_authenticate(self.editor)
+        response = client.get('/api/assets/', {'facets': 'true', 'category': 'vehicles'})
+        self.assertEqual(response.status_code, 200)
+        counts = response.json()['facets']
+        # 'draft' belongs to another user and is private
+        self.assertEqual(counts['file_type'], [{'value': '3D', 'count': 2}])
+        self.assertEqual(counts['created_at'], [{'value': '2026-01', 'count': 2}])
+        self.assertEqual(counts['tags'], [{'value': 'vehicle', 'count': 2}, {'value': 'car', 'count': 1}])
+
+        counts = facets.compute_facets(Asset.objects.filter(is_public=True))
+        self.assertEqual(counts['category'], [{'value': 'vehicles', 'count': 2}, {'value': 'textures', 'count': 1}])
+        self.assertEqual([entry['value'] for entry in counts['created_at']], ['2026-01', '2026-02'])
+        self.assertEqual(counts['is_public'], [{'value': True, 'count': 3}])
+
+
+class UsageCounterTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.editor = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='Admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.editor)
+
+    def _upload(self, name, size, **fields):
+        data = {'file': SimpleUploadedFile(name, b'x' * size), 'name': name, 'file_type': 'DOC', 'tags[]': ['doc'], **fields}
+        return self.client.post('/api/assets/', data, format='multipart')
+
+    def test_counters_follow_every_write(self):
+        first = self._upload('a.txt', 100).json()['asset']['id']
+        self._upload('b.txt', 50, is_public='true')
+        self.client.patch(f'/api/assets/{first}/', {'file_type': '3D', 'is_public': 'true'}, format='multipart')
+
+        stats = self.client.get('/api/assets/stats/').json()
+        self.assertEqual((stats['asset_count'], stats['public_count'], stats['total_bytes']), (2, 2, 150))
+        self.assertEqual(
+            [(row['file_type'], row['asset_count'], row['total_bytes']) for row in stats['by_type']],
+            [('3D', 1, 100), ('DOC', 1, 50)],
+        )
+
+        self.client.force_authenticate(self.admin)
+        self.client.delete(f'/api/assets/{first}/')
+        self.assertEqual(usage.user_usage(self.editor)['total_bytes'], 50)
+        # Nothing has drifted from a full recount
+        self.assertEqual(usage.reconcile(), 0)
+
+        UsageCounter.objects.filter(user=self.editor).update(total_bytes=999)
+        self.assertEqual(usage.reconcile(), 1)
+        self.assertEqual(usage.user_usage(self.editor)['total_bytes'], 50)
+
+    def test_uploads_over_quota_are_rejected(self):
+        with override_settings(STORAGE_QUOTAS={**settings.STORAGE_QUOTAS, 'Editor': 150}):
+            self.assertEqual(self._upload('a.txt', 100).status_code, 201)
+            response = self._upload('b.txt', 100)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual((response.json()['used'], response.json()['requested']), (100, 100))
+
+
+class SuggestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+        other = User.objects.create_user('other', 'other@example.com', 'pw', role='Editor')
+        for name, owner, public, tags in [
+            ('Car door', cls.editor, False, ['car', 'door']),
+            ('car_wheel', other, True, ['car']),
+            ('Cargo ship', other, True, ['cargo']),
+            ('carbon fibre', other, False, ['carbon']),
+            ('Bus', cls.editor, True, ['car']),
+        ]:
+            asset = Asset.objects.create(user=owner, file=f'uploads/{name}.bin', name=name, is_public=public, tags=tags)
+            suggest.sync_tags(asset)
+
+    def test_prefix_matches_in_order(self):
+        result = suggest.suggest(self.editor, 'CAR')
+        # 'carbon fibre' is another user's private asset
+        self.assertEqual([row['name'] for row in result['names']], ['Car door', 'Cargo ship', 'car_wheel'])
+        self.assertEqual(result['tags'], [{'tag': 'car', 'count': 3}, {'tag': 'cargo', 'count': 1}])
+        # LIKE wildcards in the prefix are literal
+        self.assertEqual([row['name'] for row in suggest.suggest(self.editor, 'car_')['names']], ['car_wheel'])
+        self.assertEqual(len(suggest.suggest(self.editor, 'c', limit=2)['names']), 2)
+
+    @skipUnless(connection.vendor == 'postgresql', "EXPLAIN checks need Postgres")
+    def test_names_are_read_in_index_order(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                plan = suggest.name_matches(Asset.objects.all(), 'car')[:suggest.DEFAULT_LIMIT].explain()
+            finally:
+                cursor.execute('SET enable_seqscan = on')
+        self.assertIn('asset_name_prefix_idx', plan)
+        # Matches come out of the index already sorted
+        self.assertNotIn('Sort', plan)
+
+
+class TrashAndPurgeTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='Admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _asset(self, name):
+        asset = Asset(user=self.admin, name=name, file_type='DOC')
+        asset.file.save(f'{name}.txt', ContentFile(name.encode()), save=False)
+        asset.file_size = asset.file.size
+        asset.save()
+        return asset
+
+    def test_trash_restore_and_purge(self):
+        assets = [self._asset(f'doc{i}') for i in range(5)]
+        for asset in assets:
+            self.assertEqual(self.client.delete(f'/api/assets/{asset.pk}/').status_code, 204)
+        self.assertEqual(self.client.get('/api/assets/').json(), [])
+        self.assertEqual(len(self.client.get('/api/assets/trash/').json()), 5)
+
+        self.assertEqual(self.client.post(f'/api/assets/{assets[0].pk}/restore/').status_code, 200)
+        self.assertEqual([row['id'] for row in self.client.get('/api/assets/').json()], [assets[0].pk])
+
+        # Only what has been in the trash long enough goes, in batches
+        Asset.all_objects.filter(pk__in=[a.pk for a in assets[1:4]]).update(deleted_at=timezone.now() - timedelta(days=40))
+        with mock.patch.object(cleanup, '_delete_file', wraps=cleanup._delete_file) as delete_file:
+            self.assertEqual(cleanup.purge_expired_trash(older_than_days=30, batch_size=2), 3)
+        self.assertEqual(delete_file.call_count, 6)  # file and thumbnail of each
+        self.assertEqual(set(Asset.all_objects.values_list('pk', flat=True)), {assets[0].pk, assets[4].pk})
+        storage = assets[1].file.storage
+        self.assertFalse(storage.exists(assets[1].file.name))
+        self.assertTrue(storage.exists(assets[4].file.name))
+
+    def test_gc_removes_only_old_unreferenced_files(self):
+        kept = self._asset('kept')
+        storage = kept.file.storage
+        orphan = storage.save('uploads/orphan.txt', ContentFile(b'orphan'))
+        young = storage.save('uploads/young.txt', ContentFile(b'young'))
+        old = time.time() - 2 * 3600
+        for name in (kept.file.name, orphan):
+            os.utime(storage.path(name), (old, old))
+
+        counts, sizes = cleanup.collect_garbage(dry_run=True, grace=timedelta(hours=1))
+        self.assertEqual((counts['media'], sizes['media']), (1, 6))
+        self.assertTrue(storage.exists(orphan))
+
+        cleanup.collect_garbage(grace=timedelta(hours=1))
+        self.assertFalse(storage.exists(orphan))
+        self.assertTrue(storage.exists(young))
+        self.assertTrue(storage.exists(kept.file.name))
@@ -0,0 +1,75 @@
+"""
+Hot/cold tiering policy for asset files (the storage side is in storage.py).
+"""
+
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Asset
+from .storage import TieredStorage
+
+# Record at most one access per file per process in this window, so reads
+# don't turn into a write each time.
+ACCESS_TOUCH_INTERVAL = timedelta(hours=1)
+_TOUCH_CACHE_SIZE = 10000
+_last_touch = {}
+
+
+def mark_accessed(name):
+    now = timezone.now()
+    last = _last_touch.get(name)
+    if last is not None and now - last < ACCESS_TOUCH_INTERVAL:
+        return
+    if len(_last_touch) >= _TOUCH_CACHE_SIZE:
+        _last_touch.clear()
+    _last_touch[name] = now
+    Asset.objects.filter(file=name).update(last_accessed_at=now)
+
+
+def mark_rehydrated(name):
+    Asset.all_objects.filter(file=name).update(tier=Asset.TIER_HOT, last_accessed_at=timezone.now())
+
+
+def tiering_enabled():
+    return isinstance(default_storage, TieredStorage)
+
+
+def select_cold_assets(cold_after_days, hot_max_bytes=None):
+    """
+    Hot assets to archive: everything not accessed for cold_after_days, plus,
+    if the hot tier is over hot_max_bytes, the least recently used ones until
+    it fits again.
+    """
+    hot = Asset.objects.filter(tier=Asset.TIER_HOT).annotate(
+        last_used=Coalesce('last_accessed_at', 'created_at')
+    )
+    cutoff = timezone.now() - timedelta(days=cold_after_days)
+    selected = list(hot.filter(last_used__lt=cutoff).order_by('last_used'))
+
+    if hot_max_bytes is not None:
+        hot_bytes = hot.aggregate(total=Sum('file_size'))['total'] or 0
+        hot_bytes -= sum(asset.file_size for asset in selected)
+        if hot_bytes > hot_max_bytes:
+            already = {asset.pk for asset in selected}
+            for asset in hot.filter(last_used__gte=cutoff).order_by(F('last_used').asc()).iterator():
+                if hot_bytes <= hot_max_bytes:
+                    break
+                if asset.pk in already:
+                    continue
+                selected.append(asset)
+                hot_bytes -= asset.file_size
+    return selected
+
+
+def archive_asset(asset):
+    """Move one asset's file to the archive tier. Returns False if it was missing."""
+    name = asset.file.name
+    if not default_storage.exists(name) or default_storage.is_archived(name):
+        return False
+    default_storage.archive(name)
+    Asset.objects.filter(pk=asset.pk).update(tier=Asset.TIER_COLD)
+    return True
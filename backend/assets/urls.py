@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AssetViewSet
+from .views import AssetViewSet, CollectionViewSet
 
 router = DefaultRouter()
 router.register(r'assets', AssetViewSet, basename='asset')
+router.register(r'collections', CollectionViewSet, basename='collection')
 
 urlpatterns = [
     path('', include(router.urls)),
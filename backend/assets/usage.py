@@ -0,0 +1,191 @@
+"""
+Storage and usage counters.
+
+UsageCounter rows hold asset count, public count and bytes per (owner,
+file_type). Every write path applies a delta with atomic F() updates instead
+of recounting, so reading usage touches a handful of rows whatever the size
+of the library. `manage.py reconcile_usage` recomputes them to fix any drift.
+"""
+
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Asset, UsageCounter
+
+Snapshot = namedtuple('Snapshot', 'user_id file_type is_public file_size')
+
+
+def snapshot(asset):
+    """The fields that affect usage, captured before an update."""
+    return Snapshot(asset.user_id, asset.file_type, asset.is_public, asset.file_size or 0)
+
+
+def apply_delta(user_id, file_type, count=0, public=0, size=0):
+    if not (count or public or size):
+        return
+    changes = {
+        'asset_count': F('asset_count') + count,
+        'public_count': F('public_count') + public,
+        'total_bytes': F('total_bytes') + size,
+    }
+    counters = UsageCounter.objects.filter(user_id=user_id, file_type=file_type)
+    if counters.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            UsageCounter.objects.create(
+                user_id=user_id, file_type=file_type,
+                asset_count=count, public_count=public, total_bytes=size,
+            )
+    except IntegrityError:
+        # Another request created the row first.
+        counters.update(**changes)
+
+
+def _apply(snap, sign):
+    apply_delta(snap.user_id, snap.file_type, sign, sign * int(snap.is_public), sign * snap.file_size)
+
+
+def record_created(asset):
+    _apply(snapshot(asset), 1)
+
+
+def record_deleted(asset):
+    _apply(snapshot(asset), -1)
+
+
+def record_changed(before, asset):
+    after = snapshot(asset)
+    if before == after:
+        return
+    if (before.user_id, before.file_type) == (after.user_id, after.file_type):
+        apply_delta(
+            after.user_id, after.file_type,
+            public=int(after.is_public) - int(before.is_public),
+            size=after.file_size - before.file_size,
+        )
+    else:
+        _apply(before, -1)
+        _apply(after, 1)
+
+
+def _apply_grouped(rows, sign):
+    for (user_id, file_type), (count, public, size) in rows.items():
+        apply_delta(user_id, file_type, sign * count, sign * public, sign * size)
+
+
+def record_bulk_created(assets):
+    """One delta per (owner, file_type) for a batch from bulk_create."""
+    rows = {}
+    for asset in assets:
+        key = (asset.user_id, asset.file_type)
+        count, public, size = rows.get(key, (0, 0, 0))
+        rows[key] = (count + 1, public + int(asset.is_public), size + (asset.file_size or 0))
+    _apply_grouped(rows, 1)
+
+
+def grouped_usage(queryset):
+    """{(user_id, file_type): (count, public, bytes)} for a queryset, in one grouped query."""
+    rows = (
+        queryset.order_by()
+        .values('user_id', 'file_type')
+        .annotate(count=Count('id'), public=Count('id', filter=Q(is_public=True)), size=Sum('file_size'))
+    )
+    return {
+        (row['user_id'], row['file_type']): (row['count'], row['public'], row['size'] or 0)
+        for row in rows
+    }
+
+
+def record_bulk_deleted(rows):
+    """Apply the result of grouped_usage() for rows that have been deleted."""
+    _apply_grouped(rows, -1)
+
+
+def user_usage(user):
+    """Totals and per-type breakdown for one user (reads at most one row per file type)."""
+    by_type = list(
+        UsageCounter.objects.filter(user=user, asset_count__gt=0)
+        .values('file_type', 'asset_count', 'public_count', 'total_bytes')
+        .order_by('file_type')
+    )
+    return _summary(by_type)
+
+
+def global_usage():
+    rows = UsageCounter.objects.order_by('file_type').values('file_type').annotate(
+        count=Sum('asset_count'), public=Sum('public_count'), size=Sum('total_bytes'),
+    )
+    by_type = [
+        {
+            'file_type': row['file_type'],
+            'asset_count': row['count'],
+            'public_count': row['public'],
+            'total_bytes': row['size'],
+        }
+        for row in rows if row['count']
+    ]
+    return _summary(by_type)
+
+
+def _summary(by_type):
+    asset_count = sum(row['asset_count'] for row in by_type)
+    public_count = sum(row['public_count'] for row in by_type)
+    return {
+        'asset_count': asset_count,
+        'public_count': public_count,
+        'private_count': asset_count - public_count,
+        'total_bytes': sum(row['total_bytes'] for row in by_type),
+        'by_type': by_type,
+    }
+
+
+def quota_for(user):
+    """Byte quota for the user's role, or None for unlimited."""
+    return settings.STORAGE_QUOTAS.get(getattr(user, 'role', None))
+
+
+def used_bytes(user):
+    return UsageCounter.objects.filter(user=user).aggregate(total=Sum('total_bytes'))['total'] or 0
+
+
+def check_quota(user, extra_bytes):
+    """Return an error payload if storing extra_bytes would exceed the user's quota."""
+    quota = quota_for(user)
+    if quota is None or extra_bytes <= 0:
+        return None
+    used = used_bytes(user)
+    if used + extra_bytes > quota:
+        return {'error': 'Storage quota exceeded', 'quota': quota, 'used': used, 'requested': extra_bytes}
+    return None
+
+
+def reconcile():
+    """Recompute every counter from Asset. Returns the number of rows corrected."""
+    corrected = 0
+    with transaction.atomic():
+        # Lock the counters first so concurrent deltas wait for the recount.
+        existing = {
+            (c.user_id, c.file_type): c for c in UsageCounter.objects.select_for_update()
+        }
+        actual = grouped_usage(Asset.objects.all())
+        for key, (count, public, size) in actual.items():
+            counter = existing.pop(key, None)
+            if counter is None:
+                UsageCounter.objects.create(
+                    user_id=key[0], file_type=key[1],
+                    asset_count=count, public_count=public, total_bytes=size,
+                )
+                corrected += 1
+            elif (counter.asset_count, counter.public_count, counter.total_bytes) != (count, public, size):
+                counter.asset_count, counter.public_count, counter.total_bytes = count, public, size
+                counter.save(update_fields=['asset_count', 'public_count', 'total_bytes', 'updated_at'])
+                corrected += 1
+        for counter in existing.values():
+            if counter.asset_count or counter.public_count or counter.total_bytes:
+                corrected += 1
+            counter.delete()
+    return corrected
@@ -2,22 +2,62 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.parsers import MultiPartParser, FormParser
-from .models import Asset
-from .serializers import AssetSerializer
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from django.http import FileResponse, Http404, HttpResponseNotModified, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.db.models import Q
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.files.storage import default_storage
+from django.views import static
+from .models import Asset, AssetChange, Collection
+from .serializers import AssetSerializer, AssetRevisionSerializer, CollectionSerializer, MAX_UPLOAD_SIZE
+from . import (
+    admission, archive, changes, cleanup, collection_tree, direct_upload, facets, palette, phash, popularity, query,
+    recommendations, renditions, sharing, suggest, tasks, usage,
+)
+from .storage import TieredStorage
+from . import revisions as revision_store
+from users.models import User
 from users.permissions import IsAdmin, IsEditorOrAdmin, IsViewerOrHigher
 from activitylog.models import ActivityLog  
+from backend.routers import ReplicaReadMixin
 import json
 
-class AssetViewSet(viewsets.ModelViewSet):
+def serve_media(request, path):
+    """
+    Serve a MEDIA_ROOT file, rehydrating it from the archive tier if needed.
+    Outside DEBUG only archived files are served here: the web server serves
+    hot files itself and falls back to this view for names it cannot find.
+    """
+    if isinstance(default_storage, TieredStorage) and default_storage.is_archived(path):
+        default_storage.rehydrate(path)
+    elif not settings.DEBUG:
+        raise Http404("File not found")
+    return static.serve(request, path, document_root=settings.MEDIA_ROOT)
+
+
+class AssetViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Asset.objects.all()
     serializer_class = AssetSerializer
     parser_classes = [MultiPartParser, FormParser]  # Important for file uploads!
+    replica_actions = (
+        'list', 'retrieve', 'my_assets', 'public_assets', 'render_variant', 'similar',
+        'revision_file', 'download_archive', 'download_url', 'stats', 'suggest_completions', 'trash',
+        'change_feed', 'related', 'view_stats', 'shared',
+    )
+    archive_max_assets = 1000
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update']:
+        if self.action in [
+            'create', 'update', 'partial_update', 'rollback', 'upload_url', 'confirm_upload'
+        ] or (
+            self.action == 'revisions' and self.request.method == 'POST'
+        ):
             permission_classes = [IsEditorOrAdmin]  # Editor & Admin
-        elif self.action in ['destroy']:
+        elif self.action in ['destroy', 'trash', 'restore']:
             permission_classes = [IsAdmin]  # Only Admin can delete
         else:
             permission_classes = [IsViewerOrHigher]  # List & retrieve allowed to all
@@ -25,28 +65,21 @@ class AssetViewSet(viewsets.ModelViewSet):
 
     def log_action(self, user, action_type, description, ip_address):
         """Helper to create activity logs (model has no table_affected/record_id)."""
-        ActivityLog.objects.create(
-            user=user,
-            action_type=action_type,
-            description=description,
-            ip_address=ip_address,
-        )
+        ActivityLog.log(user, action_type, description, ip_address)
+
+    def _is_write(self):
+        if self.action in ('update', 'partial_update', 'rollback'):
+            return True
+        return self.action in ('revisions', 'shares') and self.request.method not in ('GET', 'HEAD', 'OPTIONS')
 
     def get_queryset(self):
         """Filter assets based on user permissions and query parameters"""
         user = self.request.user
         params = self.request.query_params
         
-        # Admin can see all assets
-        if hasattr(user, 'role') and user.role == 'Admin':
-            queryset = Asset.objects.all()
-        else:
-            # Regular users see their own assets + public assets
-            queryset = Asset.objects.filter(
-                user=user
-            ) | Asset.objects.filter(
-                is_public=True
-            )
+        # Admin can see all assets, regular users their own + public assets,
+        # plus ones shared with them when only reading
+        queryset = Asset.objects.visible_to(user, shared=not self._is_write())
         
         # Apply filters
         keyword = params.get('keyword')
@@ -57,20 +90,87 @@ class AssetViewSet(viewsets.ModelViewSet):
         if file_type:
             queryset = queryset.filter(file_type=file_type)
 
+        category = params.get('category')
+        if category:
+            queryset = queryset.filter(category=category)
+
+        is_public = params.get('is_public')
+        if is_public in ('true', 'false'):
+            queryset = queryset.filter(is_public=(is_public == 'true'))
+
         date_from = params.get('date_from')
+        if date_from:
+            queryset = queryset.filter(created_at__gte=date_from)
+
         date_to = params.get('date_to')
-        if date_from and date_to:
-            queryset = queryset.filter(created_at__range=[date_from, date_to])
+        if date_to:
+            queryset = queryset.filter(created_at__lte=date_to)
+
+        # ?collection=<id> (add &recursive=true to include sub-collections)
+        collection = params.get('collection')
+        if collection:
+            try:
+                collection = Collection.objects.visible_to(user).get(pk=int(collection))
+            except (ValueError, Collection.DoesNotExist):
+                raise ValidationError({'collection': 'Collection not found'})
+            if params.get('recursive') in ('true', '1'):
+                queryset = collection_tree.assets_under(collection, queryset)
+            else:
+                queryset = queryset.filter(memberships__collection=collection)
+
+        # ?color=#aa3300 (URL-encoded, or without the #) and ?tolerance= in RGB distance
+        color = params.get('color')
+        if color:
+            try:
+                color = palette.parse_color(color)
+                tolerance = int(params.get('tolerance', palette.DEFAULT_TOLERANCE))
+            except ValueError:
+                raise ValidationError({'color': "'color' must be a hex colour and 'tolerance' an integer"})
+            tolerance = max(0, min(tolerance, palette.MAX_TOLERANCE))
+            queryset = palette.filter_by_color(queryset, color, tolerance)
 
         tags = params.get('tags')
         if tags:
-            tag_list = tags.split(',')
-            queryset = queryset.filter(tags__overlap=tag_list)
+            tag_filter = Q()
+            for tag in tags.split(','):
+                tag_filter |= query.tag_filter(tag.strip(), queryset.db)
+            queryset = queryset.filter(tag_filter)
+
+        # Structured search (?q=) and sorting (?sort=), see assets/query.py
+        try:
+            return query.apply(queryset, params.get('q'), params.get('sort'))
+        except query.QueryError as e:
+            raise ValidationError({'q': str(e)})
+
+    def list(self, request, *args, **kwargs):
+        """List assets; with ?facets=true also return facet counts for the current filter"""
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') in ('true', '1'):
+            facet_counts = facets.compute_facets(self.filter_queryset(self.get_queryset()))
+            if isinstance(response.data, dict):
+                response.data['facets'] = facet_counts
+            else:
+                response.data = {'results': response.data, 'facets': facet_counts}
+        return response
 
-        return queryset.order_by('-created_at')
+    def retrieve(self, request, *args, **kwargs):
+        """Return one asset and count the view (buffered, see assets/popularity.py)"""
+        asset = self.get_object()
+        popularity.record_view(asset, request.user)
+        return Response(self.get_serializer(asset).data)
 
     def create(self, request, *args, **kwargs):
         """Handle asset creation with file upload"""
+        # Decide before the body is parsed; see assets/admission.py
+        size = admission.request_size(request)
+        if not admission.uploads.try_acquire(size):
+            return admission.busy_response()
+        try:
+            return self._create_asset(request)
+        finally:
+            admission.uploads.release(size)
+
+    def _create_asset(self, request):
         try:
             print("=== Asset Upload Request ===")
             print("User:", request.user)
@@ -134,14 +234,31 @@ class AssetViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
+            quota_error = usage.check_quota(request.user, serializer.validated_data['file'].size)
+            if quota_error:
+                return Response(quota_error, status=status.HTTP_403_FORBIDDEN)
+
             asset = self.perform_create(serializer)
             
             print("✅ Asset created successfully with ID:", asset.id)
+
+            # Flag near-identical images the uploader can already see
+            duplicates = []
+            if asset.phash is not None:
+                matches = phash.find_similar(
+                    self.get_queryset().exclude(pk=asset.pk),
+                    phash.to_unsigned(asset.phash),
+                )
+                duplicates = [
+                    {'id': match.id, 'name': match.name, 'distance': distance}
+                    for match, distance in matches[:10]
+                ]
             
             return Response(
                 {
                     'message': 'Asset uploaded successfully',
-                    'asset': serializer.data
+                    'asset': serializer.data,
+                    'possible_duplicates': duplicates,
                 }, 
                 status=status.HTTP_201_CREATED
             )
@@ -158,7 +275,17 @@ class AssetViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         """Save the asset with the current user and log the action"""
-        asset = serializer.save(user=self.request.user)
+        asset = serializer.save(user=self.request.user, file_size=serializer.validated_data['file'].size)
+        usage.record_created(asset)
+        changes.record(asset, AssetChange.CREATED)
+        suggest.sync_tags(asset)
+
+        # Hashed inline: the response reports likely duplicates
+        if asset.file_type == 'IMG':
+            phash.update_asset_phash(asset)
+
+        # Chunking the file into the revision store runs on a job worker
+        tasks.enqueue_process_upload(asset, user=self.request.user)
 
         # Log the upload action
         self.log_action(
@@ -172,7 +299,16 @@ class AssetViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         """Save the updated asset and log the action"""
-        asset = serializer.save()
+        before = usage.snapshot(serializer.instance)
+        new_file = serializer.validated_data.get('file')
+        if new_file is not None:
+            asset = serializer.save(file_size=new_file.size)
+        else:
+            asset = serializer.save()
+        usage.record_changed(before, asset)
+        changes.record(asset, AssetChange.UPDATED, was_public=before.is_public)
+        if 'tags' in serializer.validated_data:
+            suggest.sync_tags(asset)
 
         self.log_action(
             user=self.request.user,
@@ -184,20 +320,73 @@ class AssetViewSet(viewsets.ModelViewSet):
         return asset
 
     def perform_destroy(self, instance):
-        """Delete the asset and log the action"""
-        asset_id = instance.id
-        asset_name = instance.name
-        asset_file_type = instance.file_type
-
-        instance.delete()
+        """Move the asset to the trash and log the action"""
+        cleanup.trash(instance)
 
         self.log_action(
             user=self.request.user,
             action_type="delete",
-            description=f"Deleted asset '{asset_name}' ({asset_file_type}) [id={asset_id}]",
+            description=f"Moved asset '{instance.name}' ({instance.file_type}) to trash [id={instance.id}]",
             ip_address=self.request.META.get('REMOTE_ADDR'),
         )
 
+    @action(detail=False, methods=['get'])
+    def trash(self, request):
+        """Trashed assets, most recently deleted first (purged after TRASH_RETENTION_DAYS)"""
+        assets = Asset.all_objects.filter(deleted_at__isnull=False).order_by('-deleted_at', '-id')
+        page = self.paginate_queryset(assets)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(assets, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def restore(self, request, pk=None):
+        """Take an asset out of the trash"""
+        asset = get_object_or_404(Asset.all_objects.filter(deleted_at__isnull=False), pk=pk)
+        if not cleanup.restore(asset):
+            return Response({'error': 'Asset is not in the trash'}, status=status.HTTP_400_BAD_REQUEST)
+
+        self.log_action(
+            user=request.user,
+            action_type="update",
+            description=f"Restored asset '{asset.name}' ({asset.file_type}) from trash [id={asset.id}]",
+            ip_address=request.META.get('REMOTE_ADDR'),
+        )
+        return Response(self.get_serializer(asset).data)
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def change_feed(self, request):
+        """Assets created/updated/deleted after ?since=<cursor>, oldest first (?limit=)"""
+        try:
+            cursor = changes.parse_cursor(request.query_params.get('since'))
+            limit = int(request.query_params.get('limit', changes.DEFAULT_LIMIT))
+        except changes.CursorError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({'error': "'limit' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, changes.MAX_LIMIT))
+
+        entries, next_cursor, has_more = changes.changes_since(request.user, cursor, limit)
+        results = []
+        for change_id, kind, value in entries:
+            if kind == 'upsert':
+                results.append({'cursor': str(change_id), 'type': kind, 'asset': self.get_serializer(value).data})
+            else:
+                results.append({'cursor': str(change_id), 'type': kind, 'id': value})
+        return Response({'changes': results, 'next_cursor': str(next_cursor), 'has_more': has_more})
+
+    @action(detail=False, methods=['get'], url_path='suggest')
+    def suggest_completions(self, request):
+        """Typeahead: top name and tag completions for a prefix (?q=&limit=)"""
+        try:
+            limit = int(request.query_params.get('limit', suggest.DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'error': "'limit' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, suggest.MAX_LIMIT))
+
+        prefix = request.query_params.get('q', '')
+        return Response({'query': prefix, **suggest.suggest(request.user, prefix, limit)})
+
     @action(detail=False, methods=['get'])
     def my_assets(self, request):
         """Get only the current user's assets"""
@@ -210,4 +399,506 @@ class AssetViewSet(viewsets.ModelViewSet):
         """Get only public assets"""
         assets = Asset.objects.filter(is_public=True).order_by('-created_at')
         serializer = self.get_serializer(assets, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'], url_path='render')
+    def render_variant(self, request, pk=None):
+        """Serve a resized / format-converted variant of an image asset (?w=&h=&fmt=)"""
+        asset = self.get_object()
+        if asset.file_type != 'IMG':
+            return Response({'error': 'Only image assets can be rendered'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            width, height, fmt = renditions.parse_spec(request.query_params)
+        except renditions.RenditionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            key, path = renditions.get_rendition(asset, width, height, fmt)
+            etag = f'"{key}"'
+            if request.headers.get('If-None-Match') == etag:
+                return HttpResponseNotModified()
+            try:
+                fileobj = open(path, 'rb')
+            except FileNotFoundError:
+                # Evicted from the cache since the lookup; render it again
+                key, path = renditions.get_rendition(asset, width, height, fmt)
+                fileobj = open(path, 'rb')
+        except renditions.SourceMissing as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except renditions.RenditionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = FileResponse(fileobj, content_type=renditions.content_type(fmt))
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=86400'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Find near-duplicate images by perceptual hash (?distance= max Hamming distance)"""
+        asset = self.get_object()
+        if asset.phash is None:
+            return Response({'error': 'Asset has no perceptual hash'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            distance = int(request.query_params.get('distance', phash.DEFAULT_DISTANCE))
+        except ValueError:
+            return Response({'error': "'distance' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= distance <= phash.MAX_DISTANCE:
+            return Response(
+                {'error': f"'distance' must be between 0 and {phash.MAX_DISTANCE}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        matches = phash.find_similar(
+            self.get_queryset().exclude(pk=asset.pk),
+            phash.to_unsigned(asset.phash),
+            distance,
+        )
+        return Response([
+            {**self.get_serializer(match).data, 'distance': d}
+            for match, d in matches
+        ])
+
+    @action(detail=True, methods=['get'], url_path='views')
+    def view_stats(self, request, pk=None):
+        """Views and estimated unique viewers per day over the last ?days= days"""
+        asset = self.get_object()
+        try:
+            days = int(request.query_params.get('days', popularity.DEFAULT_DAYS))
+        except ValueError:
+            return Response({'error': "'days' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        days = max(1, min(days, popularity.MAX_DAYS))
+        return Response(popularity.view_stats(asset, days))
+
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """Assets most similar by tags, keywords, category and name (?limit=), precomputed offline"""
+        asset = self.get_object()
+        try:
+            limit = int(request.query_params.get('limit', recommendations.DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'error': "'limit' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, recommendations.TOP_K))
+
+        matches = recommendations.related_to(asset, Asset.objects.visible_to(request.user), limit)
+        return Response([
+            {**self.get_serializer(match).data, 'score': round(score, 4)}
+            for match, score in matches
+        ])
+
+    @action(detail=False, methods=['get'])
+    def shared(self, request):
+        """Assets other users have shared with the current user (directly or through a group)"""
+        assets = (
+            Asset.objects.filter(access_rows__user=request.user)
+            .exclude(user=request.user)
+            .order_by('-created_at', '-id')
+        )
+        page = self.paginate_queryset(assets)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(assets, many=True).data)
+
+    @action(detail=True, methods=['get', 'post', 'delete'], parser_classes=[JSONParser])
+    def shares(self, request, pk=None):
+        """List, add (POST) or remove (DELETE) shares: {"user_ids": [...], "group_ids": [...]}"""
+        asset = self.get_object()
+        if request.user.role != 'Admin' and asset.user_id != request.user.pk:
+            raise PermissionDenied("Only the owner can share an asset")
+
+        if request.method != 'GET':
+            user_ids = request.data.get('user_ids', [])
+            group_ids = request.data.get('group_ids', [])
+            if not isinstance(user_ids, list) or not isinstance(group_ids, list) or not (user_ids or group_ids):
+                return Response(
+                    {'error': "Give 'user_ids' and/or 'group_ids' as non-empty lists"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                user_ids = {int(i) for i in user_ids}
+                group_ids = {int(i) for i in group_ids}
+            except (TypeError, ValueError):
+                return Response({'error': "Ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+            users = list(User.objects.filter(pk__in=user_ids))
+            groups = list(Group.objects.filter(pk__in=group_ids))
+            if len(users) != len(user_ids) or len(groups) != len(group_ids):
+                return Response({'error': 'Unknown user or group'}, status=status.HTTP_400_BAD_REQUEST)
+
+            if request.method == 'POST':
+                sharing.grant(asset, users, groups, granted_by=request.user)
+                verb = 'Shared'
+            else:
+                sharing.revoke(asset, users, groups)
+                verb = 'Unshared'
+            self.log_action(
+                user=request.user,
+                action_type="update",
+                description=(
+                    f"{verb} asset '{asset.name}' [id={asset.id}] with "
+                    f"{len(users)} user(s) and {len(groups)} group(s)"
+                ),
+                ip_address=request.META.get('REMOTE_ADDR'),
+            )
+
+        users, groups = sharing.grants_of(asset)
+        return Response({
+            'users': [{'id': user.id, 'username': user.username} for user in users],
+            'groups': [{'id': group.id, 'name': group.name} for group in groups],
+        })
+
+    @action(detail=True, methods=['get', 'post'])
+    def revisions(self, request, pk=None):
+        """List an asset's revisions, or upload a new file as the next revision"""
+        asset = self.get_object()
+
+        if request.method == 'GET':
+            serializer = AssetRevisionSerializer(asset.revisions.select_related('created_by'), many=True)
+            return Response(serializer.data)
+
+        size = admission.request_size(request)
+        if not admission.uploads.try_acquire(size):
+            return admission.busy_response()
+        try:
+            return self._store_revision(request, asset)
+        finally:
+            admission.uploads.release(size)
+
+    def _store_revision(self, request, asset):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+        quota_error = usage.check_quota(request.user, upload.size - asset.file_size)
+        if quota_error:
+            return Response(quota_error, status=status.HTTP_403_FORBIDDEN)
+
+        before = usage.snapshot(asset)
+        revision_store.ensure_baseline(asset)
+        revision = revision_store.store_revision(
+            asset, upload, user=request.user, file_name=upload.name,
+            comment=request.data.get('comment', ''),
+        )
+        upload.seek(0)
+        revision_store.replace_file(asset, upload, upload.name)
+        usage.record_changed(before, asset)
+        changes.record(asset, AssetChange.UPDATED, was_public=before.is_public)
+        if asset.file_type == 'IMG':
+            phash.update_asset_phash(asset)
+            palette.update_asset_palette(asset)
+
+        self.log_action(
+            user=request.user,
+            action_type="update",
+            description=f"Uploaded revision {revision.number} of asset '{asset.name}' [id={asset.id}]",
+            ip_address=request.META.get('REMOTE_ADDR'),
+        )
+
+        return Response(AssetRevisionSerializer(revision).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'], url_path=r'revisions/(?P<number>[0-9]+)')
+    def revision_file(self, request, pk=None, number=None):
+        """Download a revision, reassembled from its chunks as it streams"""
+        asset = self.get_object()
+        revision = get_object_or_404(asset.revisions, number=number)
+
+        response = StreamingHttpResponse(
+            revision_store.iter_revision(revision), content_type='application/octet-stream'
+        )
+        response['Content-Length'] = revision.file_size
+        response['Content-Disposition'] = f'attachment; filename="{revision.file_name}"'
+        response['ETag'] = f'"{revision.sha256}"'
+        return response
+
+    @action(detail=True, methods=['post'], url_path=r'revisions/(?P<number>[0-9]+)/rollback')
+    def rollback(self, request, pk=None, number=None):
+        """Restore an earlier revision as the asset's current file"""
+        asset = self.get_object()
+        target = get_object_or_404(asset.revisions, number=number)
+
+        before = usage.snapshot(asset)
+        restored = revision_store.rollback(asset, target, user=request.user)
+        usage.record_changed(before, asset)
+        changes.record(asset, AssetChange.UPDATED, was_public=before.is_public)
+        if asset.file_type == 'IMG':
+            phash.update_asset_phash(asset)
+            palette.update_asset_palette(asset)
+
+        self.log_action(
+            user=request.user,
+            action_type="update",
+            description=f"Rolled back asset '{asset.name}' to revision {target.number} [id={asset.id}]",
+            ip_address=request.META.get('REMOTE_ADDR'),
+        )
+
+        return Response(AssetRevisionSerializer(restored).data, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False, methods=['post'], url_path='download-archive',
+        parser_classes=[JSONParser, FormParser, MultiPartParser],
+    )
+    def download_archive(self, request):
+        """Stream a ZIP of the selected assets the user can see (body: {"ids": [...]})"""
+        if hasattr(request.data, 'getlist'):
+            ids = request.data.getlist('ids')
+        else:
+            ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({'error': "'ids' must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.archive_max_assets:
+            return Response(
+                {'error': f"At most {self.archive_max_assets} assets can be downloaded at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return Response({'error': "'ids' must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Same visibility rules as get_queryset
+        assets = list(Asset.objects.visible_to(request.user).filter(id__in=ids).order_by('id'))
+        if not assets:
+            return Response({'error': 'No matching assets found'}, status=status.HTTP_404_NOT_FOUND)
+
+        self.log_action(
+            user=request.user,
+            action_type="view",
+            description=f"Downloaded archive of {len(assets)} asset(s)",
+            ip_address=request.META.get('REMOTE_ADDR'),
+        )
+
+        filename = timezone.now().strftime('assets-%Y%m%d-%H%M%S.zip')
+        response = StreamingHttpResponse(archive.stream_zip(assets), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='upload-url', parser_classes=[JSONParser])
+    def upload_url(self, request):
+        """Issue a presigned PUT URL so the client uploads straight to the object store"""
+        if not direct_upload.s3_enabled():
+            return Response({'error': 'Direct uploads require the S3 storage backend'}, status=status.HTTP_400_BAD_REQUEST)
+
+        size = request.data.get('size')
+        if size is not None:
+            try:
+                size = int(size)
+            except (TypeError, ValueError):
+                return Response({'error': "'size' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            if size > MAX_UPLOAD_SIZE:
+                return Response({'error': 'File size cannot exceed 100MB'}, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type = request.data.get('content_type') or 'application/octet-stream'
+        try:
+            token, url = direct_upload.create_upload(
+                request.user,
+                request.data.get('filename'),
+                content_type,
+                kind=request.data.get('kind', 'file'),
+            )
+        except direct_upload.DirectUploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'upload_token': token,
+            'url': url,
+            'method': 'PUT',
+            'headers': {'Content-Type': content_type},
+            'expires_in': settings.DIRECT_UPLOAD_URL_EXPIRY,
+        })
+
+    @action(detail=False, methods=['post'], url_path='confirm-upload', parser_classes=[JSONParser])
+    def confirm_upload(self, request):
+        """Record the asset for a file the client uploaded with a presigned URL"""
+        if not direct_upload.s3_enabled():
+            return Response({'error': 'Direct uploads require the S3 storage backend'}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = dict(request.data)
+        file_token = data.pop('upload_token', None)
+        thumbnail_token = data.pop('thumbnail_token', None)
+        if not file_token:
+            return Response({'error': "'upload_token' is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            name, size = direct_upload.resolve_upload(request.user, file_token)
+            thumbnail = None
+            if thumbnail_token:
+                thumbnail, _ = direct_upload.resolve_upload(request.user, thumbnail_token, kind='thumbnail')
+        except direct_upload.DirectUploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if Asset.all_objects.filter(file=name).exists():
+            return Response({'error': 'This upload has already been confirmed'}, status=status.HTTP_400_BAD_REQUEST)
+        if size > MAX_UPLOAD_SIZE:
+            direct_upload.discard_upload(name)
+            return Response({'error': 'File size cannot exceed 100MB'}, status=status.HTTP_400_BAD_REQUEST)
+        quota_error = usage.check_quota(request.user, size)
+        if quota_error:
+            direct_upload.discard_upload(name)
+            return Response(quota_error, status=status.HTTP_403_FORBIDDEN)
+
+        # The file is already stored: it is passed to save(), never taken from the request
+        serializer = self.get_serializer(data=data)
+        serializer.fields['file'].read_only = True
+        if not serializer.is_valid():
+            return Response(
+                {'error': 'Validation failed', 'details': serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        extra = {'thumbnail': thumbnail} if thumbnail else {}
+        asset = serializer.save(user=request.user, file=name, file_size=size, **extra)
+        usage.record_created(asset)
+        changes.record(asset, AssetChange.CREATED)
+        suggest.sync_tags(asset)
+        # The file is in the bucket; hash and chunk it off the request path
+        tasks.enqueue_process_upload(asset, user=request.user)
+
+        self.log_action(
+            user=request.user,
+            action_type="upload",
+            description=f"Uploaded asset '{asset.name}' ({asset.file_type}) [id={asset.id}]",
+            ip_address=request.META.get('REMOTE_ADDR'),
+        )
+
+        return Response(
+            {'message': 'Asset uploaded successfully', 'asset': serializer.data},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=['get'], url_path='download-url')
+    def download_url(self, request, pk=None):
+        """Presigned GET URL for the asset's file (plain media URL on local storage)"""
+        asset = self.get_object()
+        return Response({
+            'url': request.build_absolute_uri(direct_upload.download_url(asset)),
+            'expires_in': settings.DIRECT_DOWNLOAD_URL_EXPIRY if direct_upload.s3_enabled() else None,
+        })
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Storage and asset usage from the incrementally maintained counters"""
+        data = {
+            **usage.user_usage(request.user),
+            'quota': usage.quota_for(request.user),
+        }
+        if getattr(request.user, 'role', None) == 'Admin':
+            data['all_users'] = usage.global_usage()
+        return Response(data)
+
+
+class CollectionViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
+    serializer_class = CollectionSerializer
+    replica_actions = ('list', 'retrieve', 'tree')
+
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve', 'tree']:
+            permission_classes = [IsViewerOrHigher]
+        else:
+            permission_classes = [IsEditorOrAdmin]
+        return [perm() for perm in permission_classes]
+
+    def get_queryset(self):
+        """Collections the user can see, in tree order; ?parent=<id> or ?parent=root for one level"""
+        queryset = Collection.objects.visible_to(self.request.user).order_by('path')
+        parent = self.request.query_params.get('parent')
+        if parent == 'root':
+            queryset = queryset.filter(parent__isnull=True)
+        elif parent:
+            try:
+                queryset = queryset.filter(parent_id=int(parent))
+            except ValueError:
+                raise ValidationError({'parent': "'parent' must be a collection id or 'root'"})
+        return queryset
+
+    def _visible_collection(self, pk, field='parent'):
+        try:
+            return Collection.objects.visible_to(self.request.user).get(pk=pk)
+        except (ValueError, TypeError, Collection.DoesNotExist):
+            raise ValidationError({field: 'Collection not found'})
+
+    def _check_owner(self, collection):
+        """Only the owner (or an admin) may change a collection"""
+        user = self.request.user
+        if user.role != 'Admin' and collection.owner_id != user.pk:
+            raise PermissionDenied("You can only change your own collections")
+
+    def perform_create(self, serializer):
+        parent = serializer.validated_data.pop('parent', None)
+        if parent is not None:
+            parent = self._visible_collection(parent.pk)
+            # Filing under a collection changes it, so it must be the user's own
+            self._check_owner(parent)
+        try:
+            serializer.instance = collection_tree.create(
+                parent=parent, owner=self.request.user, **serializer.validated_data
+            )
+        except collection_tree.CollectionError as e:
+            raise ValidationError({'parent': str(e)})
+
+    def perform_update(self, serializer):
+        self._check_owner(serializer.instance)
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        """Delete the collection and its sub-collections (the assets stay)"""
+        self._check_owner(instance)
+        collection_tree.delete_subtree(instance)
+
+    def retrieve(self, request, *args, **kwargs):
+        """One collection with the number of assets anywhere below it"""
+        collection = self.get_object()
+        return Response({
+            **self.get_serializer(collection).data,
+            'asset_count': collection_tree.count_assets(collection, Asset.objects.visible_to(request.user)),
+        })
+
+    @action(detail=True, methods=['get'])
+    def tree(self, request, pk=None):
+        """The collection and every visible sub-collection, parents first, with direct asset counts"""
+        collection = self.get_object()
+        visible_assets = Asset.objects.visible_to(request.user)
+        nodes = list(collection_tree.subtree(collection) & Collection.objects.visible_to(request.user))
+        counts = collection_tree.direct_counts(nodes, visible_assets)
+        return Response({
+            'asset_count': collection_tree.count_assets(collection, visible_assets),
+            'collections': [
+                {**self.get_serializer(node).data, 'asset_count': counts.get(node.pk, 0)}
+                for node in nodes
+            ],
+        })
+
+    @action(detail=True, methods=['post'])
+    def move(self, request, pk=None):
+        """Move the collection and its whole branch under ?parent (null for the top level)"""
+        collection = self.get_object()
+        self._check_owner(collection)
+        parent_id = request.data.get('parent')
+        parent = self._visible_collection(parent_id) if parent_id not in (None, '') else None
+        if parent is not None:
+            self._check_owner(parent)
+        try:
+            collection = collection_tree.move(collection, parent)
+        except collection_tree.CollectionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(collection).data)
+
+    @action(detail=True, methods=['post', 'delete'], url_path='assets')
+    def members(self, request, pk=None):
+        """Add (POST) or remove (DELETE) assets: {"asset_ids": [...]}"""
+        collection = self.get_object()
+        self._check_owner(collection)
+        asset_ids = request.data.get('asset_ids')
+        if not isinstance(asset_ids, list) or not asset_ids:
+            return Response({'error': "'asset_ids' must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            asset_ids = [int(asset_id) for asset_id in asset_ids]
+        except (TypeError, ValueError):
+            return Response({'error': "'asset_ids' must contain asset ids"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'DELETE':
+            return Response({'removed': collection_tree.remove_assets(collection, asset_ids)})
+        # Only assets the user can see may be filed
+        visible_ids = list(Asset.objects.visible_to(request.user).filter(pk__in=asset_ids).values_list('pk', flat=True))
+        return Response({'added': collection_tree.add_assets(collection, visible_ids)})
+
@@ -2,6 +2,8 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn backend.asgi:application``) for
+the /api/events/ stream; ``runserver`` only speaks WSGI.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# /api/events/ (Server-Sent Events) is served outside Django's request
+# cycle so idle streams hold no worker thread; see backend/sse.py.
+from backend.sse import with_event_stream  # noqa: E402  (needs Django set up)
+
+application = with_event_stream(django_application)
@@ -0,0 +1,149 @@
+"""
+In-process pub/sub for server-push events (see backend/sse.py).
+
+Code that changes something calls ``publish()``; the broker hands the event
+to every open event stream in this process whose user is in the event's
+audience. Publishing goes through a pluggable backend (EVENTS_BACKEND):
+``LocalBackend`` delivers within the process only, which is enough for a
+single server; ``RedisBackend`` fans events out through Redis pub/sub so
+streams held by any process (and events raised in job workers) meet.
+
+Audiences:
+    {'admins_only': True}                  -> admins
+    {'public': bool, 'user_ids': [...]}    -> admins, listed users, and
+                                              everyone if public
+"""
+
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One event stream's mailbox, read from its own event loop."""
+
+    def __init__(self, user_id, role, loop, maxsize):
+        self.user_id = user_id
+        self.role = role
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+
+    def accepts(self, audience):
+        if self.role == 'Admin':
+            return True
+        if audience.get('admins_only'):
+            return False
+        return bool(audience.get('public')) or self.user_id in audience.get('user_ids', ())
+
+    def deliver(self, event):
+        # Called from whichever thread published the event.
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def wake(self):
+        """Make the reader's pending get() return None (e.g. on disconnect)."""
+        self._put(None)
+
+    def _put(self, event):
+        if self.queue.full():
+            # A slow client loses its oldest events rather than growing memory.
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class LocalBackend:
+    def __init__(self, broker):
+        self.broker = broker
+
+    def publish(self, event):
+        self.broker.dispatch(event)
+
+    def start(self):
+        pass
+
+
+class RedisBackend:
+    """Cross-process fan-out over a Redis pub/sub channel (EVENTS_REDIS_URL)."""
+    channel = 'dam-events'
+
+    def __init__(self, broker):
+        import redis
+        self.broker = broker
+        self.client = redis.Redis.from_url(settings.EVENTS_REDIS_URL)
+        self._listener = None
+
+    def publish(self, event):
+        self.client.publish(self.channel, json.dumps(event, cls=DjangoJSONEncoder))
+
+    def start(self):
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, name='events-redis', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for message in pubsub.listen():
+            try:
+                self.broker.dispatch(json.loads(message['data']))
+            except Exception:
+                logger.exception("Bad event on %s", self.channel)
+
+
+class Broker:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = import_string(settings.EVENTS_BACKEND)(self)
+        return self._backend
+
+    def subscribe(self, user_id, role, loop):
+        subscription = Subscription(user_id, role, loop, settings.EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscription)
+        self.backend.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event):
+        self.backend.publish(event)
+
+    def dispatch(self, event):
+        """Deliver an event to the matching streams of this process."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        audience = event.get('audience', {})
+        for subscription in subscribers:
+            if subscription.accepts(audience):
+                subscription.deliver(event)
+
+
+broker = Broker()
+
+
+def publish(event_type, data, audience, event_id=None, using=None):
+    """Publish once the current transaction (on `using`) commits; never fails the caller."""
+    event = {'type': event_type, 'id': event_id, 'data': data, 'audience': audience}
+
+    def send():
+        try:
+            broker.publish(event)
+        except Exception:
+            logger.exception("Could not publish %s event", event_type)
+
+    transaction.on_commit(send, using=using)
@@ -0,0 +1,132 @@
+"""
+Database routing between the primary, an optional read replica and an
+optional audit-log database.
+
+Reads go to the primary unless a view explicitly opts an action into the
+replica (see ``ReplicaReadMixin``). Writes always go to the primary, and a
+user who just wrote something is pinned to the primary for
+``REPLICA_PIN_SECONDS`` so they read their own writes.
+
+When an ``audit`` database is configured, ``AuditRouter`` (listed first)
+sends the activity log there for reads, writes and migrations, and keeps
+every other app off it.
+"""
+
+import contextvars
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_ALIAS = 'replica'
+AUDIT_ALIAS = 'audit'
+AUDIT_APPS = {'activitylog'}
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def audit_configured():
+    return AUDIT_ALIAS in settings.DATABASES
+
+
+def _pin_key(user_id):
+    return f"db-pin:{user_id}"
+
+
+def pin_to_primary(user):
+    """Keep this user's reads on the primary for a few seconds."""
+    cache.set(_pin_key(user.pk), 1, timeout=getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned_to_primary(user):
+    return bool(user and user.is_authenticated and cache.get(_pin_key(user.pk)))
+
+
+class AuditRouter:
+    """Keep the audit log (AUDIT_APPS) in its own database, if there is one."""
+
+    def _db_for(self, model):
+        if model._meta.app_label in AUDIT_APPS and audit_configured():
+            return AUDIT_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Audit rows keep plain user ids, never relations across databases
+        if audit_configured() and (
+            (obj1._meta.app_label in AUDIT_APPS) != (obj2._meta.app_label in AUDIT_APPS)
+        ):
+            return False
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not audit_configured():
+            return None
+        if app_label in AUDIT_APPS:
+            return db == AUDIT_ALIAS
+        if db == AUDIT_ALIAS:
+            return False
+        return None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+class ReplicaReadMixin:
+    """
+    Serve the viewset actions listed in ``replica_actions`` from the replica.
+    Only list read-only actions here; anything that writes must stay off it.
+    """
+    replica_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and not is_pinned_to_primary(request.user):
+            _use_replica.set(True)
+
+
+class PrimaryPinMiddleware:
+    """
+    Resets replica routing for every request and pins the user to the primary
+    after a successful write.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _use_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            # DRF copies the token-authenticated user onto the Django request.
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user)
+
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
     'users',
     'assets',
     'activitylog',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -55,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.routers.PrimaryPinMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -83,14 +86,79 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'dam_system',
-        'USER': 'postgres',
-        'PASSWORD': 'Dd4455886.',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'dam_system'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'Dd4455886.'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # Connections come from a psycopg pool instead of being opened per
+        # request. Django requires CONN_MAX_AGE = 0 when pooling is enabled;
+        # with health checks on, the pool checks each connection before
+        # handing it out.
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+                'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                'max_idle': 300,
+            },
+        },
     }
 }
 
+# Optional read replica. Set DB_REPLICA_HOST to point at a streaming replica,
+# or DB_REPLICA_SQLITE to a file path to use a SQLite stand-in locally.
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif os.environ.get('DB_REPLICA_SQLITE'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['DB_REPLICA_SQLITE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Optional separate database for the activity log, so its constant inserts
+# and large scans stop competing with the catalog for WAL, locks, vacuum and
+# cache. DB_AUDIT_NAME names a Postgres database (on DB_AUDIT_HOST, default
+# the main server); DB_AUDIT_SQLITE a file path for a local stand-in.
+# Cut over in this order, so no entry is written under an id an old one needs:
+#   1. With the variable set for these commands only, run
+#      `manage.py migrate --database=audit` and then `manage.py move_activitylog`.
+#      The move reserves ids above the main database's largest (plus
+#      --reserve, for entries still written there until the switch) before
+#      copying anything.
+#   2. Set the variable for the app and restart it; new entries now go to
+#      the audit database, numbered after the reserved range.
+#   3. Run `manage.py move_activitylog` again for the entries written in
+#      between. Rows whose id is already taken by a different entry are
+#      reported and left where they are, never deleted.
+if os.environ.get('DB_AUDIT_NAME'):
+    DATABASES['audit'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DB_AUDIT_NAME'],
+        'HOST': os.environ.get('DB_AUDIT_HOST', DATABASES['default']['HOST']),
+        'PORT': os.environ.get('DB_AUDIT_PORT', DATABASES['default']['PORT']),
+    }
+elif os.environ.get('DB_AUDIT_SQLITE'):
+    DATABASES['audit'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['DB_AUDIT_SQLITE'],
+    }
+
+# AuditRouter first: it claims the activity log, the replica router the rest
+DATABASE_ROUTERS = ['backend.routers.AuditRouter', 'backend.routers.PrimaryReplicaRouter']
+
+# After a write, the same user keeps reading from the primary for this long
+# so they see their own changes despite replication lag.
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -139,11 +207,101 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:3000",
 ]
 
-import os
-
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'assets.storage.TieredStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Set ASSET_STORAGE=s3 to keep asset files in an S3-compatible bucket (AWS,
+# MinIO, ...). Clients then upload and download with presigned URLs
+# (/api/assets/upload-url/, confirm-upload/, {id}/download-url/).
+if os.environ.get('ASSET_STORAGE') == 's3':
+    STORAGES['default'] = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.environ.get('AWS_STORAGE_BUCKET_NAME', 'dam-assets'),
+            'endpoint_url': os.environ.get('AWS_S3_ENDPOINT_URL'),
+            'region_name': os.environ.get('AWS_S3_REGION_NAME'),
+            'access_key': os.environ.get('AWS_ACCESS_KEY_ID'),
+            'secret_key': os.environ.get('AWS_SECRET_ACCESS_KEY'),
+            'file_overwrite': False,
+            'querystring_auth': True,
+            'querystring_expire': 3600,
+        },
+    }
+
+DIRECT_UPLOAD_URL_EXPIRY = 900  # seconds a presigned PUT stays valid
+DIRECT_UPLOAD_TOKEN_MAX_AGE = 24 * 3600  # seconds to confirm an upload
+DIRECT_DOWNLOAD_URL_EXPIRY = 3600
+
+# Archive (cold) tier for asset files; `manage.py tier_assets` moves files
+# here compressed and they are rehydrated on access. In production, the web
+# server should fall back to Django for /media/ paths it cannot find; Django
+# serves only archived names there (assets.views.serve_media) and 404s the rest.
+ARCHIVE_ROOT = os.environ.get('ARCHIVE_ROOT', os.path.join(BASE_DIR, 'archive'))
+TIER_COLD_AFTER_DAYS = int(os.environ.get('TIER_COLD_AFTER_DAYS', 30))
+HOT_TIER_MAX_BYTES = int(os.environ['HOT_TIER_MAX_BYTES']) if os.environ.get('HOT_TIER_MAX_BYTES') else None
+
+# Rendered image variants (/api/assets/{id}/render). Kept outside MEDIA_ROOT
+# so private assets are not reachable through the static media URL.
+RENDITION_CACHE_DIR = os.path.join(BASE_DIR, 'rendition_cache')
+RENDITION_CACHE_MAX_BYTES = int(os.environ.get('RENDITION_CACHE_MAX_BYTES', 2 * 1024 ** 3))  # 2GB
+
+# Content-addressed chunks backing asset revision history (assets/revisions.py)
+CHUNK_STORE_DIR = os.path.join(BASE_DIR, 'chunk_store')
+
+# Term counts saved by each related-asset refresh, so the next incremental run
+# only re-reads changed assets (assets/recommendations.py)
+RELATED_INDEX_PATH = os.path.join(BASE_DIR, 'related_index', 'terms.npz')
+
+# Background jobs (jobs app, `manage.py run_workers`)
+JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', 1))
+JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 2))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_SECONDS = 10     # doubled after every failed attempt...
+JOB_RETRY_MAX_SECONDS = 3600    # ...up to this
+JOB_LOCK_TIMEOUT = 600          # a running job without a heartbeat for this long is requeued
+
+# Deleted assets stay restorable in the trash this long before the purge
+# job (`manage.py purge_trash`) removes rows and files in batches.
+TRASH_RETENTION_DAYS = int(os.environ.get('TRASH_RETENTION_DAYS', 30))
+PURGE_BATCH_SIZE = 100
+# `manage.py gc_media` leaves unreferenced files younger than this alone
+GC_GRACE_HOURS = 24
+
+# The change feed (/api/assets/changes/) only serves rows at least this old,
+# so transactions that commit out of id order are not skipped by clients.
+CHANGE_FEED_SETTLE_SECONDS = 2
+
+# Asset views are buffered per process and flushed after this many seconds or
+# once this many (asset, day) counters are pending (assets/popularity.py).
+VIEW_FLUSH_SECONDS = 30
+VIEW_FLUSH_MAX_KEYS = 1000
+
+# List pages (backend/pagination.py) report the planner's row estimate instead
+# of an exact COUNT(*) when it is at least this many rows (Postgres only).
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Per-role storage quotas in bytes, enforced at upload time (None = unlimited)
+STORAGE_QUOTAS = {
+    'Admin': None,
+    'Editor': 50 * 1024 ** 3,  # 50GB
+    'Viewer': 5 * 1024 ** 3,   # 5GB
+}
+
+# Upload admission control (assets/admission.py): at most this many request
+# bytes of uploads are accepted at once per process; the rest get a 429.
+UPLOAD_MAX_IN_FLIGHT_BYTES = int(os.environ.get('UPLOAD_MAX_IN_FLIGHT_BYTES', 512 * 1024 ** 2))  # 512MB
+UPLOAD_RETRY_AFTER = 5  # seconds
+
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600  
@@ -163,4 +321,38 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-}
\ No newline at end of file
+    'DEFAULT_THROTTLE_CLASSES': [
+        'backend.throttling.RoleRateThrottle',
+        'backend.throttling.IPRateThrottle',
+    ],
+}
+
+# Token-bucket rate limits (backend/throttling.py) as 'count/period[:burst]';
+# the burst defaults to count. One entry per role in User.ROLE_CHOICES,
+# plus 'anon' for unauthenticated requests. None disables a limit.
+THROTTLE_ROLE_RATES = {
+    'Admin': '1200/min',
+    'Editor': '600/min',
+    'Viewer': '300/min:100',
+    'anon': '60/min:20',
+}
+THROTTLE_IP_RATE = '2400/min'
+THROTTLE_LOGIN_RATE = '10/min:5'
+
+# Server-push events (backend/events.py, backend/sse.py). With several server
+# processes set EVENTS_REDIS_URL so events reach streams in every process.
+EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL')
+EVENTS_BACKEND = 'backend.events.RedisBackend' if EVENTS_REDIS_URL else 'backend.events.LocalBackend'
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_MAX_CONNECTION_SECONDS = 3600
+EVENTS_QUEUE_SIZE = 100  # per stream; the oldest events are dropped beyond this
+
+# Throttle buckets and replica pins must be shared by all worker processes:
+# set CACHE_URL (e.g. redis://localhost:6379/0) in production.
+if os.environ.get('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_URL'],
+        }
+    }
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""
+Server-Sent Events endpoint (GET /api/events/?token=<auth token>), mounted
+next to Django in backend/asgi.py.
+
+Each connection is one coroutine waiting on a small queue fed by the event
+broker (backend/events.py), so idle streams cost no thread and no database
+connection. EventSource cannot send headers, so the auth token may be given
+as a query parameter. A comment line is sent every EVENTS_HEARTBEAT_SECONDS
+to keep proxies from closing idle streams, and streams are closed after
+EVENTS_MAX_CONNECTION_SECONDS so clients reconnect and re-authenticate.
+
+Events:
+    event: activity   data: a new ActivityLog entry (admins only)
+    event: asset      data: {"cursor", "kind", "asset_id"} for assets the
+                      user can see; fetch details from /api/assets/changes/
+"""
+
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+
+from .events import broker
+
+EVENTS_PATH = '/api/events/'
+
+
+def _get_user(token_key):
+    from rest_framework.authtoken.models import Token
+    close_old_connections()
+    try:
+        token = Token.objects.select_related('user').get(key=token_key)
+    except Token.DoesNotExist:
+        return None
+    finally:
+        close_old_connections()
+    return token.user if token.user.is_active else None
+
+
+def _token_from_scope(scope):
+    query = parse_qs(scope.get('query_string', b'').decode())
+    if query.get('token'):
+        return query['token'][0]
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            parts = value.decode().split()
+            if len(parts) == 2 and parts[0].lower() == 'token':
+                return parts[1]
+    return None
+
+
+def _cors_headers(scope):
+    for name, value in scope.get('headers', []):
+        if name == b'origin' and value.decode() in settings.CORS_ALLOWED_ORIGINS:
+            return [(b'access-control-allow-origin', value), (b'vary', b'Origin')]
+    return []
+
+
+def format_event(event):
+    lines = [f"event: {event['type']}"]
+    if event.get('id') is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"data: {json.dumps(event['data'], cls=DjangoJSONEncoder)}")
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+async def _send_json(send, scope, status, payload):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), *_cors_headers(scope)],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(payload).encode()})
+
+
+async def event_stream(scope, receive, send):
+    if scope['method'] != 'GET':
+        return await _send_json(send, scope, 405, {'error': 'Method not allowed'})
+
+    token = _token_from_scope(scope)
+    user = await sync_to_async(_get_user)(token) if token else None
+    if user is None:
+        return await _send_json(send, scope, 401, {'error': 'Authentication credentials were not provided or are invalid'})
+
+    loop = asyncio.get_running_loop()
+    subscription = broker.subscribe(user.pk, user.role, loop)
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+                subscription.wake()  # don't wait for the next heartbeat to notice
+                return
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),  # nginx: don't buffer the stream
+                *_cors_headers(scope),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+
+        closes_at = loop.time() + settings.EVENTS_MAX_CONNECTION_SECONDS
+        while not disconnected.is_set() and loop.time() < closes_at:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                chunk = b': ping\n\n'
+            else:
+                if event is None:
+                    break
+                chunk = format_event(event)
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+        if not disconnected.is_set():
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    except OSError:
+        pass  # client went away mid-send
+    finally:
+        broker.unsubscribe(subscription)
+        watcher.cancel()
+
+
+def with_event_stream(django_app):
+    """ASGI app that serves EVENTS_PATH itself and everything else with Django."""
+    async def application(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+            return await event_stream(scope, receive, send)
+        return await django_app(scope, receive, send)
+    return application
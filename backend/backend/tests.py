@@ -0,0 +1,319 @@
+import asyncio
+from contextlib import contextmanager
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.paginator import EmptyPage
+from django.db import connections
+from django.db.utils import load_backend
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from activitylog.models import ActivityLog
+from assets.models import Asset
+from users.models import User
+from . import events, pagination, routers, sse, throttling
+
+
+@contextmanager
+def extra_database(alias, settings_dict):
+    """
+    Open a connection under another alias (e.g. to a SQLite file) while the
+    block runs. It is registered directly rather than through DATABASES,
+    which the test runner has already set up, so test cases allow it like
+    any connection made at runtime. Patch the router's *_configured() check
+    to route to it.
+    """
+    settings_dict = connections.configure_settings({'default': {}, alias: dict(settings_dict)})[alias]
+    connection = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+    connections[alias] = connection
+    try:
+        yield connection
+    finally:
+        connection.close()
+        del connections[alias]
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    A second connection to the test database stands in for the replica.
+    TransactionTestCase, so what the primary writes is committed and visible
+    to it.
+    """
+    def setUp(self):
+        cache.clear()
+        self.editor = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+        Asset.objects.create(user=self.editor, file='uploads/car.bin', name='car', file_type='3D', is_public=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.editor)
+        self.replica = self.enterContext(extra_database(routers.REPLICA_ALIAS, connections['default'].settings_dict))
+        self.enterContext(mock.patch('backend.routers.replica_configured', return_value=True))
+
+    def test_replica_actions_read_from_the_replica(self):
+        with CaptureQueriesContext(self.replica) as on_replica:
+            response = self.client.get('/api/assets/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([asset['name'] for asset in response.json()], ['car'])
+        self.assertTrue(on_replica.captured_queries)
+
+    def test_writes_go_to_the_primary(self):
+        self.assertEqual(routers.PrimaryReplicaRouter().db_for_write(Asset), 'default')
+        with CaptureQueriesContext(self.replica) as on_replica:
+            response = self.client.post('/api/collections/', {'name': 'Vehicles'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(on_replica.captured_queries, [])
+
+    def test_user_is_pinned_to_the_primary_after_a_write(self):
+        self.client.post('/api/collections/', {'name': 'Vehicles'}, format='json')
+        self.assertTrue(routers.is_pinned_to_primary(self.editor))
+        with CaptureQueriesContext(self.replica) as on_replica:
+            response = self.client.get('/api/assets/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(on_replica.captured_queries, [])
+
+        # Other users still read from the replica
+        viewer = User.objects.create_user('viewer', 'viewer@example.com', 'pw', role='Viewer')
+        self.client.force_authenticate(viewer)
+        with CaptureQueriesContext(self.replica) as on_replica:
+            self.client.get('/api/assets/')
+        self.assertTrue(on_replica.captured_queries)
+
+    def test_other_actions_stay_on_the_primary(self):
+        asset = Asset.objects.get()
+        with CaptureQueriesContext(self.replica) as on_replica:
+            self.client.get(f'/api/assets/{asset.pk}/revisions/')
+        self.assertEqual(on_replica.captured_queries, [])
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate('300/min'), (5, 300))
+        self.assertEqual(throttling.parse_rate('10/s:2'), (10, 2))
+        self.assertEqual(throttling.parse_rate('3600/hour:50'), (1, 50))
+        self.assertIsNone(throttling.parse_rate(None))
+
+    def test_burst_then_refill(self):
+        bucket = throttling.TokenBucket(rate=1, burst=3)
+        now = 1000.0
+        self.assertEqual([bucket.consume('k', now=now)[0] for _ in range(4)], [True, True, True, False])
+        allowed, wait = bucket.consume('k', now=now)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1)
+        # One token back per second
+        self.assertEqual([bucket.consume('k', now=now + 1)[0] for _ in range(2)], [True, False])
+        # Other keys have their own bucket
+        self.assertTrue(bucket.consume('other', now=now)[0])
+
+    def test_contended_lock_lets_the_request_through(self):
+        bucket = throttling.TokenBucket(rate=1, burst=1)
+        bucket.consume('k', now=1000.0)
+        cache.add('k:lock', 1)
+        with mock.patch.object(throttling, 'LOCK_WAIT', 0):
+            self.assertEqual(bucket.consume('k', now=1000.0), (True, 0))
+
+    @override_settings(THROTTLE_ROLE_RATES={'Admin': '1/min', 'Editor': None, 'anon': '1/min'})
+    def test_role_rate_check(self):
+        messages = [error.id for error in throttling.check_role_rates(None)]
+        self.assertEqual(messages, ['backend.W001'])  # no rate for Viewer
+        with override_settings(THROTTLE_ROLE_RATES={'Admin': '1/fortnight', 'Editor': '1/min', 'Viewer': '1/min'}):
+            self.assertEqual([error.id for error in throttling.check_role_rates(None)], ['backend.E001'])
+
+
+# Hourly rates, so no token comes back while a test runs
+@override_settings(
+    THROTTLE_ROLE_RATES={'Admin': None, 'Editor': '2/hour', 'Viewer': '1/hour', 'anon': '1/hour'},
+    THROTTLE_IP_RATE='3/hour', THROTTLE_LOGIN_RATE='2/hour',
+)
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.editor = User.objects.create_user('editor', 'editor@example.com', 'pw', role='Editor')
+        self.viewer = User.objects.create_user('viewer', 'viewer@example.com', 'pw', role='Viewer')
+        self.client = APIClient()
+
+    def _statuses(self, user, count):
+        self.client.force_authenticate(user)
+        return [self.client.get('/api/assets/').status_code for _ in range(count)]
+
+    def test_per_role_buckets(self):
+        self.assertEqual(self._statuses(self.editor, 3), [200, 200, 429])
+        response = self.client.get('/api/assets/')
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        # Viewers get a smaller burst; the IP bucket (3) is spent by now too
+        cache.clear()
+        self.assertEqual(self._statuses(self.viewer, 2), [200, 429])
+
+    def test_ip_bucket_is_shared_by_users(self):
+        self.assertEqual(self._statuses(self.editor, 2) + self._statuses(self.viewer, 2), [200, 200, 200, 429])
+
+    def test_changing_a_rate_starts_a_new_bucket(self):
+        self.assertEqual(self._statuses(self.viewer, 2), [200, 429])
+        with override_settings(THROTTLE_ROLE_RATES={'Viewer': '1/day', 'anon': '1/day'}, THROTTLE_IP_RATE='3/day'):
+            self.assertEqual(self._statuses(self.viewer, 2), [200, 429])
+
+    def test_login_attempts_per_username(self):
+        self.client.force_authenticate(None)
+        codes = [
+            self.client.post('/api/auth/login/', {'username': 'editor', 'password': 'wrong'}).status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(codes[-1], 429)
+        self.assertNotIn(429, codes[:-1])
+
+
+class EventBrokerTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.broker = events.Broker()
+
+    def _received(self, subscription):
+        self.loop.run_until_complete(asyncio.sleep(0))  # run the threadsafe callbacks
+        received = []
+        while not subscription.queue.empty():
+            received.append(subscription.queue.get_nowait()['id'])
+        return received
+
+    def test_audiences(self):
+        admin = self.broker.subscribe(1, 'Admin', self.loop)
+        owner = self.broker.subscribe(2, 'Editor', self.loop)
+        other = self.broker.subscribe(3, 'Viewer', self.loop)
+        self.broker.publish({'id': 'log', 'audience': {'admins_only': True}})
+        self.broker.publish({'id': 'private', 'audience': {'public': False, 'user_ids': [2]}})
+        self.broker.publish({'id': 'public', 'audience': {'public': True, 'user_ids': [2]}})
+
+        self.assertEqual(self._received(admin), ['log', 'private', 'public'])
+        self.assertEqual(self._received(owner), ['private', 'public'])
+        self.assertEqual(self._received(other), ['public'])
+
+        self.broker.unsubscribe(other)
+        self.broker.publish({'id': 'after', 'audience': {'public': True}})
+        self.assertEqual(self._received(other), [])
+
+    @override_settings(EVENTS_QUEUE_SIZE=2)
+    def test_slow_streams_drop_the_oldest_events(self):
+        subscription = self.broker.subscribe(1, 'Viewer', self.loop)
+        for i in range(4):
+            self.broker.publish({'id': i, 'audience': {'public': True}})
+        self.assertEqual(self._received(subscription), [2, 3])
+
+    def test_publish_waits_for_commit(self):
+        with mock.patch.object(events.broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                events.publish('asset', {'asset_id': 1}, {'public': True}, event_id=5)
+                publish.assert_not_called()
+        publish.assert_called_once_with(
+            {'type': 'asset', 'id': 5, 'data': {'asset_id': 1}, 'audience': {'public': True}}
+        )
+
+        # A broken backend is logged, not raised into the request
+        with mock.patch.object(events.broker, 'publish', side_effect=ConnectionError), \
+                self.assertLogs('backend.events', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            events.publish('asset', {}, {'public': True})
+
+
+class EventStreamTests(TransactionTestCase):
+    """
+    Drives the ASGI endpoint directly. TransactionTestCase, since the stream
+    closes old connections around its token lookup.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('viewer', 'viewer@example.com', 'pw', role='Viewer')
+        self.token = Token.objects.create(user=self.user)
+
+    def _stream(self, query_string, on_body=None):
+        scope = {'type': 'http', 'method': 'GET', 'path': sse.EVENTS_PATH, 'query_string': query_string, 'headers': []}
+        sent = []
+
+        async def run():
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if on_body and message['type'] == 'http.response.body' and on_body(message['body']):
+                    disconnect.set()
+
+            await asyncio.wait_for(sse.event_stream(scope, receive, send), 10)
+
+        async_to_sync(run)()
+        return sent
+
+    def test_rejects_missing_and_bad_tokens(self):
+        for query_string in (b'', b'token=nope'):
+            self.assertEqual(self._stream(query_string)[0]['status'], 401)
+
+    def test_streams_the_users_events(self):
+        def on_body(body):
+            if body.startswith(b'retry:'):
+                events.broker.dispatch({'type': 'asset', 'id': 1, 'data': {}, 'audience': {'user_ids': [0]}})
+                events.broker.dispatch({'type': 'asset', 'id': 2, 'data': {'asset_id': 9}, 'audience': {'user_ids': [self.user.pk]}})
+            return body.startswith(b'event:')
+
+        sent = self._stream(f'token={self.token.key}'.encode(), on_body)
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        self.assertEqual(sent[-1]['body'], b'event: asset\nid: 2\ndata: {"asset_id": 9}\n\n')
+        self.assertEqual(events.broker._subscribers, set())
+
+    @override_settings(EVENTS_HEARTBEAT_SECONDS=0.01, EVENTS_MAX_CONNECTION_SECONDS=0.1)
+    def test_heartbeats_and_closes_long_streams(self):
+        sent = self._stream(f'token={self.token.key}'.encode())
+        bodies = [message['body'] for message in sent[1:]]
+        self.assertIn(b': ping\n\n', bodies)
+        self.assertEqual(sent[-1], {'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+@override_settings(ESTIMATED_COUNT_THRESHOLD=5)
+class EstimatedCountPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='Admin')
+        for i in range(7):
+            ActivityLog.log(cls.admin, 'view', f'entry {i}')
+
+    def _paginator(self, estimate):
+        queryset = ActivityLog.objects.order_by('id')
+        with mock.patch('backend.pagination.estimate_count', return_value=estimate):
+            paginator = pagination.EstimatedCountPaginator(queryset, 3)
+            paginator.count  # worked out (and cached) while the estimate is patched
+        return paginator
+
+    def test_small_or_missing_estimates_are_exact(self):
+        for estimate in (None, 4):
+            paginator = self._paginator(estimate)
+            self.assertEqual((paginator.count, paginator.count_is_approximate), (7, False))
+            self.assertEqual(paginator.num_pages, 3)
+
+    def test_large_estimates_are_used(self):
+        # The planner thinks there are 5 rows: 2 pages, though there are 3
+        paginator = self._paginator(5)
+        self.assertEqual((paginator.count, paginator.count_is_approximate), (5, True))
+        second = paginator.page(2)
+        self.assertEqual((len(second), second.has_next()), (3, True))
+        third = paginator.page(3)
+        self.assertEqual(([log.description for log in third], third.has_next()), (['entry 6'], False))
+        with self.assertRaises(EmptyPage):
+            paginator.page(0)
+
+    def test_api_reports_whether_the_count_is_approximate(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with mock.patch('backend.pagination.estimate_count', return_value=1000):
+            data = client.get('/api/activity/logs/', {'page_size': 5}).json()
+        self.assertEqual((data['count'], data['count_is_approximate'], len(data['results'])), (1000, True, 5))
+        self.assertIsNotNone(data['next'])
+
+        data = client.get('/api/activity/logs/', {'page_size': 5}).json()
+        self.assertEqual((data['count'], data['count_is_approximate']), (7, False))
@@ -0,0 +1,145 @@
+"""
+Token-bucket rate limiting for the API.
+
+Each client gets a bucket of `burst` tokens that refills at `rate` per
+second; a request spends one token and is refused with 429 (and a
+Retry-After) when the bucket is empty. The bucket is stored in the shared
+cache as a single "theoretical arrival time" (GCRA), so checking it is one
+read and one write. A short lock taken with `cache.add` (atomic on every
+cache backend) makes the read-modify-write safe across processes. The rate
+is part of the key, so a bucket stored under one rate is never read under
+another after the settings change.
+
+Per-user limits come from THROTTLE_ROLE_RATES, keyed by the roles in
+users.models.User.ROLE_CHOICES; requests are also limited per client IP.
+"""
+
+import math
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+LOCK_TIMEOUT = 1       # seconds; a crashed holder cannot block a bucket for longer
+LOCK_ATTEMPTS = 20
+LOCK_WAIT = 0.002
+
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'300/min' or '300/min:50' (burst of 50) -> (requests per second, burst)."""
+    if rate is None:
+        return None
+    rate, _, burst = rate.partition(':')
+    count, _, period = rate.partition('/')
+    count = int(count)
+    per_second = count / _PERIODS[period.strip()[0].lower()]
+    return per_second, int(burst) if burst else count
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.interval = 1.0 / rate           # seconds per token
+        self.tolerance = self.interval * burst
+
+    def consume(self, key, cost=1, now=None):
+        """Spend `cost` tokens. Returns (allowed, seconds until allowed)."""
+        now = time.time() if now is None else now
+        lock_key = f"{key}:lock"
+        for _ in range(LOCK_ATTEMPTS):
+            if cache.add(lock_key, 1, LOCK_TIMEOUT):
+                break
+            time.sleep(LOCK_WAIT)
+        else:
+            # Heavy contention on one bucket: let the request through rather
+            # than stall a worker waiting for the lock.
+            return True, 0
+        try:
+            tat = max(cache.get(key) or now, now)
+            new_tat = tat + self.interval * cost
+            if new_tat - now > self.tolerance:
+                return False, new_tat - now - self.tolerance
+            cache.set(key, new_tat, math.ceil(new_tat - now) + 1)
+            return True, 0
+        finally:
+            cache.delete(lock_key)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base class: subclasses return a (cache key, rate string) per request."""
+    scope = None
+
+    def get_bucket(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        key, rate = self.get_bucket(request, view)
+        parsed = parse_rate(rate)
+        if key is None or parsed is None:
+            return True
+        allowed, self._wait = TokenBucket(*parsed).consume(f"throttle:{self.scope}:{rate}:{key}")
+        return allowed
+
+    def wait(self):
+        return getattr(self, '_wait', None)
+
+
+class RoleRateThrottle(TokenBucketThrottle):
+    """Per-user bucket sized by the user's role; anonymous requests count per IP."""
+    scope = 'user'
+
+    def get_bucket(self, request, view):
+        rates = settings.THROTTLE_ROLE_RATES
+        user = request.user
+        if user and user.is_authenticated:
+            return user.pk, rates.get(user.role, rates.get('anon'))
+        return self.get_ident(request), rates.get('anon')
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    """Per-IP bucket over all users, so many accounts on one client share a limit."""
+    scope = 'ip'
+
+    def get_bucket(self, request, view):
+        return self.get_ident(request), settings.THROTTLE_IP_RATE
+
+
+class LoginRateThrottle(TokenBucketThrottle):
+    """Login attempts per IP and username, against password guessing."""
+    scope = 'login'
+
+    def allow_request(self, request, view):
+        rate = settings.THROTTLE_LOGIN_RATE
+        parsed = parse_rate(rate)
+        if parsed is None:
+            return True
+        bucket = TokenBucket(*parsed)
+        username = str(request.data.get('username', '')).lower()[:150]
+        self._wait = 0
+        for key in (f"ip:{self.get_ident(request)}", f"username:{username}"):
+            allowed, wait = bucket.consume(f"throttle:{self.scope}:{rate}:{key}")
+            if not allowed:
+                self._wait = wait
+                return False
+        return True
+
+
+def check_role_rates(app_configs, **kwargs):
+    from users.models import User
+    rates = getattr(settings, 'THROTTLE_ROLE_RATES', {})
+    errors = []
+    for role, _ in User.ROLE_CHOICES:
+        if role not in rates:
+            errors.append(checks.Warning(
+                f"THROTTLE_ROLE_RATES has no rate for role '{role}'; its users get the 'anon' rate.",
+                id='backend.W001',
+            ))
+    for name, rate in rates.items():
+        try:
+            parse_rate(rate)
+        except (ValueError, KeyError, IndexError):
+            errors.append(checks.Error(f"Invalid THROTTLE_ROLE_RATES['{name}']: {rate!r}", id='backend.E001'))
+    return errors
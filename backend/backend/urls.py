@@ -1,10 +1,9 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
-from assets.views import AssetViewSet
+from assets.views import AssetViewSet, serve_media
 from users.views import UserViewSet
 from django.conf import settings
-from django.conf.urls.static import static
 
 router = DefaultRouter()
 router.register(r'assets', AssetViewSet)
@@ -16,8 +15,11 @@ urlpatterns = [
     path('api/auth/', include('users.urls')), 
     path('api/', include('assets.urls')),
     path('api/activity/', include('activitylog.urls')),
+    path('api/', include('jobs.urls')),
     path('api/users/', include('users.urls')),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Also outside DEBUG, so archived files rehydrate when the web server falls back here
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_media),
+]
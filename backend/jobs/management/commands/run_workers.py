@@ -0,0 +1,70 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _serve(threads, poll_interval, once):
+    """Entry point of one worker process."""
+    import django
+    django.setup()
+    from jobs.worker import run_pool
+
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    return run_pool(threads, poll_interval, stop, once=once)
+
+
+class Command(BaseCommand):
+    help = "Run background job workers (see jobs/queue.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.JOB_WORKER_PROCESSES,
+            help="Number of worker processes.",
+        )
+        parser.add_argument(
+            '--threads', type=int, default=settings.JOB_WORKER_THREADS,
+            help="Worker threads per process.",
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL,
+            help="Seconds an idle worker waits before checking the queue again.",
+        )
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 1)
+        threads = max(options['threads'], 1)
+        self.stdout.write(f"Starting {processes} process(es) x {threads} thread(s)")
+
+        if processes == 1:
+            processed, elapsed = _serve(threads, options['poll_interval'], options['once'])
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s) in {elapsed:.1f}s."))
+            return
+
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        children = [
+            multiprocessing.Process(
+                target=_serve, args=(threads, options['poll_interval'], options['once']), daemon=False,
+            )
+            for _ in range(processes)
+        ]
+        for child in children:
+            child.start()
+
+        def forward(signum, frame):
+            for child in children:
+                if child.is_alive():
+                    child.terminate()
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for child in children:
+            child.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
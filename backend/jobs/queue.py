@@ -0,0 +1,180 @@
+"""
+A small job queue kept in the main database, so background work needs no
+separate broker.
+
+Workers claim one due job at a time. Where the backend supports it
+(Postgres) the claim is `SELECT ... FOR UPDATE SKIP LOCKED`, so concurrent
+workers skip rows another worker is claiming instead of queueing behind its
+lock. Elsewhere (SQLite) a worker claims by a compare-and-set UPDATE on the
+status column and tries the next candidate if it lost the race.
+
+Failed jobs are retried with exponential backoff plus jitter until they run
+out of attempts. A job whose worker died is put back on the queue once its
+lock is older than JOB_LOCK_TIMEOUT.
+"""
+
+import json
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_task
+
+CLAIM_CANDIDATES = 10  # rows tried per claim without SKIP LOCKED
+
+
+class JobError(Exception):
+    pass
+
+
+def enqueue(task, args=None, priority=0, delay=None, run_at=None, dedup_key=None, max_attempts=None, user=None):
+    """
+    Queue a registered task. With a dedup_key, an already queued or running
+    job with the same key is returned instead of adding another.
+    """
+    registered = get_task(task)
+    if registered is None:
+        raise JobError(f"Unknown task '{task}'")
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    if max_attempts is None:
+        max_attempts = registered.max_attempts or settings.JOB_MAX_ATTEMPTS
+
+    if dedup_key:
+        existing = _active_duplicate(dedup_key)
+        if existing is not None:
+            return existing
+    try:
+        with transaction.atomic(using=router.db_for_write(Job)):
+            return Job.objects.create(
+                task=task, args=args or {}, priority=priority, run_at=run_at,
+                dedup_key=dedup_key or None, max_attempts=max_attempts, created_by=user,
+            )
+    except IntegrityError:
+        # Lost the race against another enqueue with the same key.
+        existing = _active_duplicate(dedup_key)
+        if existing is None:
+            raise
+        return existing
+
+
+def _active_duplicate(dedup_key):
+    return Job.objects.filter(dedup_key=dedup_key, status__in=Job.ACTIVE_STATUSES).first()
+
+
+def _due():
+    return Job.objects.filter(status=Job.QUEUED, run_at__lte=timezone.now()).order_by('-priority', 'run_at', 'id')
+
+
+def claim(worker):
+    """Mark the next due job as running for `worker` and return it, or None."""
+    db = router.db_for_write(Job)
+    if connections[db].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=db):
+            job = _due().select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            job.status = Job.RUNNING
+            job.attempts += 1
+            job.locked_by = worker
+            job.locked_at = timezone.now()
+            job.save(update_fields=['status', 'attempts', 'locked_by', 'locked_at'])
+            return job
+
+    for pk in _due().using(db).values_list('pk', flat=True)[:CLAIM_CANDIDATES]:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, attempts=F('attempts') + 1, locked_by=worker, locked_at=timezone.now(),
+        )
+        if claimed:
+            return Job.objects.using(db).get(pk=pk)
+    return None
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying after the given number of attempts."""
+    delay = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0))
+    # Jitter spreads out retries of jobs that failed together.
+    return random.uniform(delay / 2, delay)
+
+
+def _json_result(value):
+    try:
+        json.dumps(value, cls=DjangoJSONEncoder)
+    except (TypeError, ValueError):
+        return repr(value)
+    return value
+
+
+def run(job, worker):
+    """Execute a claimed job and record the outcome. Returns the new status."""
+    registered = get_task(job.task)
+    mine = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=worker)
+
+    if registered is None:
+        mine.update(status=Job.FAILED, last_error=f"Unknown task '{job.task}'", finished_at=timezone.now())
+        return Job.FAILED
+
+    try:
+        result = registered(**job.args)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            mine.update(
+                status=Job.QUEUED, last_error=error, locked_by='', locked_at=None,
+                run_at=timezone.now() + timedelta(seconds=backoff(job.attempts)),
+            )
+            return Job.QUEUED
+        mine.update(status=Job.FAILED, last_error=error, finished_at=timezone.now())
+        return Job.FAILED
+
+    # Filtering on locked_by keeps a job that was requeued as stale (and
+    # picked up elsewhere) from being overwritten by this late finish.
+    mine.update(status=Job.SUCCEEDED, result=_json_result(result), finished_at=timezone.now())
+    return Job.SUCCEEDED
+
+
+def heartbeat(workers):
+    """Refresh the locks of jobs these workers are running."""
+    return Job.objects.filter(status=Job.RUNNING, locked_by__in=workers).update(locked_at=timezone.now())
+
+
+def requeue_stale(timeout=None):
+    """Return jobs whose worker stopped heart-beating to the queue. Returns the count."""
+    cutoff = timezone.now() - timedelta(seconds=timeout or settings.JOB_LOCK_TIMEOUT)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, last_error='Worker stopped while running the job', finished_at=timezone.now(),
+    )
+    requeued = stale.update(status=Job.QUEUED, locked_by='', locked_at=None, run_at=timezone.now())
+    return failed + requeued
+
+
+def retry(job):
+    """Queue a failed or cancelled job again with a fresh set of attempts."""
+    if job.status not in (Job.FAILED, Job.CANCELLED):
+        raise JobError('Only failed or cancelled jobs can be retried')
+    try:
+        with transaction.atomic(using=router.db_for_write(Job)):
+            updated = Job.objects.filter(pk=job.pk, status=job.status).update(
+                status=Job.QUEUED, attempts=0, run_at=timezone.now(),
+                locked_by='', locked_at=None, finished_at=None,
+            )
+    except IntegrityError:
+        raise JobError('An active job with the same dedup key already exists')
+    if not updated:
+        raise JobError('The job changed state, try again')
+
+
+def cancel(job):
+    """Cancel a job that has not started yet."""
+    if not Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+        status=Job.CANCELLED, finished_at=timezone.now()
+    ):
+        raise JobError('Only queued jobs can be cancelled')
@@ -0,0 +1,45 @@
+"""
+Task registry. Apps declare background tasks in their tasks.py:
+
+    from jobs.registry import task
+
+    @task('assets.process_upload', max_attempts=3)
+    def process_upload(asset_id):
+        ...
+
+Task arguments are stored as JSON, so pass ids rather than model instances.
+"""
+
+_tasks = {}
+
+
+class Task:
+    def __init__(self, name, func, max_attempts=None):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, **kwargs):
+        """Shortcut for jobs.queue.enqueue(self.name, ...)."""
+        from .queue import enqueue
+        return enqueue(self.name, **kwargs)
+
+
+def task(name, max_attempts=None):
+    def register(func):
+        if name in _tasks:
+            raise ValueError(f"Task '{name}' is already registered")
+        _tasks[name] = Task(name, func, max_attempts)
+        return _tasks[name]
+    return register
+
+
+def get_task(name):
+    return _tasks.get(name)
+
+
+def task_names():
+    return sorted(_tasks)
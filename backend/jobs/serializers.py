@@ -0,0 +1,14 @@
+from rest_framework import serializers
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    created_by = serializers.CharField(source='created_by.username', read_only=True, default=None)
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'task', 'args', 'priority', 'status', 'attempts', 'max_attempts', 'run_at',
+            'dedup_key', 'result', 'last_error', 'locked_by', 'created_by', 'created_at', 'finished_at',
+        ]
+        read_only_fields = fields
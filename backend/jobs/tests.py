@@ -0,0 +1,165 @@
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.db import OperationalError, connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import queue, worker
+from .models import Job
+from .registry import task
+
+calls = []
+
+
+@task('jobs.tests.record')
+def record(value=None):
+    calls.append(value)
+    return {'value': value}
+
+
+@task('jobs.tests.fail')
+def fail():
+    raise RuntimeError('boom')
+
+
+@override_settings(JOB_RETRY_BASE_SECONDS=10, JOB_RETRY_MAX_SECONDS=60)
+class JobQueueTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def _make_due(self):
+        Job.objects.filter(status=Job.QUEUED).update(run_at=timezone.now() - timedelta(seconds=1))
+
+    def test_claims_by_priority_then_age(self):
+        low = queue.enqueue('jobs.tests.record', args={'value': 'low'})
+        high = queue.enqueue('jobs.tests.record', args={'value': 'high'}, priority=5)
+        later = queue.enqueue('jobs.tests.record', delay=3600)
+
+        claimed = queue.claim('w1')
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts, claimed.locked_by), (high.pk, Job.RUNNING, 1, 'w1'))
+        self.assertEqual(queue.claim('w2').pk, low.pk)
+        self.assertIsNone(queue.claim('w3'))  # `later` is not due yet
+        self.assertEqual(Job.objects.get(pk=later.pk).status, Job.QUEUED)
+
+        self.assertEqual(queue.run(claimed, 'w1'), Job.SUCCEEDED)
+        claimed.refresh_from_db()
+        self.assertEqual((claimed.result, calls), ({'value': 'high'}, ['high']))
+
+    def test_compare_and_set_claim_without_skip_locked(self):
+        jobs = [queue.enqueue('jobs.tests.record') for _ in range(3)]
+        with mock.patch.object(connection.features, 'has_select_for_update_skip_locked', False):
+            claimed = [queue.claim(f'w{i}') for i in range(4)]
+        self.assertEqual([job.pk for job in claimed[:3]], [job.pk for job in jobs])
+        self.assertIsNone(claimed[3])
+
+    @skipUnless(connection.features.has_select_for_update_skip_locked, "needs SELECT ... FOR UPDATE SKIP LOCKED")
+    def test_claim_skips_rows_locked_by_another_worker(self):
+        first = queue.enqueue('jobs.tests.record', priority=1)
+        second = queue.enqueue('jobs.tests.record')
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            # Another worker in the middle of claiming `first`
+            try:
+                with transaction.atomic():
+                    Job.objects.select_for_update().get(pk=first.pk)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            locked.wait(10)
+            self.assertEqual(queue.claim('w1').pk, second.pk)
+        finally:
+            release.set()
+            holder.join()
+        self.assertEqual(queue.claim('w2').pk, first.pk)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = queue.enqueue('jobs.tests.fail', max_attempts=3)
+        before = timezone.now()
+        self.assertEqual(queue.run(queue.claim('w1'), 'w1'), Job.QUEUED)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.QUEUED, 1, ''))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        # First retry waits between half and all of JOB_RETRY_BASE_SECONDS
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=5))
+        self.assertLessEqual(job.run_at, timezone.now() + timedelta(seconds=10))
+        self.assertIsNone(queue.claim('w1'))
+
+        with mock.patch('jobs.queue.random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual([queue.backoff(n) for n in range(1, 6)], [10, 20, 40, 60, 60])
+
+    def test_job_fails_after_max_attempts(self):
+        job = queue.enqueue('jobs.tests.fail', max_attempts=2)
+        self.assertEqual(queue.run(queue.claim('w1'), 'w1'), Job.QUEUED)
+        self._make_due()
+        self.assertEqual(queue.run(queue.claim('w1'), 'w1'), Job.FAILED)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+        queue.retry(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 0))
+
+    def test_dedup_key_returns_the_active_job(self):
+        first = queue.enqueue('jobs.tests.record', dedup_key='thumbnail:1')
+        self.assertEqual(queue.enqueue('jobs.tests.record', dedup_key='thumbnail:1').pk, first.pk)
+        queue.claim('w1')
+        self.assertEqual(queue.enqueue('jobs.tests.record', dedup_key='thumbnail:1').pk, first.pk)
+
+        queue.run(Job.objects.get(pk=first.pk), 'w1')
+        # Once finished, the key is free again
+        second = queue.enqueue('jobs.tests.record', dedup_key='thumbnail:1')
+        self.assertNotEqual(second.pk, first.pk)
+        self.assertEqual(Job.objects.filter(dedup_key='thumbnail:1').count(), 2)
+
+    def test_requeue_stale(self):
+        retryable = queue.enqueue('jobs.tests.record', max_attempts=3)
+        exhausted = queue.enqueue('jobs.tests.record', max_attempts=1)
+        fresh = queue.enqueue('jobs.tests.record')
+        for name in ('w1', 'w2', 'w3'):
+            queue.claim(name)
+        Job.objects.filter(pk__in=[retryable.pk, exhausted.pk]).update(
+            locked_at=timezone.now() - timedelta(seconds=600)
+        )
+
+        self.assertEqual(queue.requeue_stale(timeout=300), 2)
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[retryable.pk], statuses[exhausted.pk], statuses[fresh.pk]],
+            [Job.QUEUED, Job.FAILED, Job.RUNNING],
+        )
+        # The late finish of the requeued job does not overwrite it
+        self.assertEqual(Job.objects.get(pk=retryable.pk).locked_by, '')
+        queue.run(Job.objects.get(pk=retryable.pk), 'w1')
+        self.assertEqual(Job.objects.get(pk=retryable.pk).status, Job.QUEUED)
+
+
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_survives_database_errors(self):
+        queue.enqueue('jobs.tests.record', args={'value': 1})
+        real_claim = queue.claim
+        errors = [OperationalError('connection lost')]
+
+        def flaky_claim(name):
+            if errors:
+                raise errors.pop()
+            return real_claim(name)
+
+        with mock.patch('jobs.queue.claim', side_effect=flaky_claim), self.assertLogs('jobs.worker', 'ERROR') as logs:
+            thread = worker.Worker(0, threading.Event(), poll_interval=0.01, once=True)
+            thread.start()
+            thread.join(10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual((thread.processed, calls), (1, [1]))
+        self.assertIn('connection lost', '\n'.join(logs.output))
@@ -0,0 +1,66 @@
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.db.models import Count
+from .models import Job
+from .serializers import JobSerializer
+from . import queue
+from users.permissions import IsAdmin, IsViewerOrHigher
+from backend.routers import ReplicaReadMixin
+
+
+class JobViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = JobSerializer
+    replica_actions = ('list', 'retrieve', 'summary')
+
+    def get_permissions(self):
+        if self.action in ['retry', 'cancel', 'summary']:
+            permission_classes = [IsAdmin]
+        else:
+            permission_classes = [IsViewerOrHigher]
+        return [perm() for perm in permission_classes]
+
+    def get_queryset(self):
+        """Admins see every job; other users the jobs their own requests queued"""
+        queryset = Job.objects.select_related('created_by')
+        if getattr(self.request.user, 'role', None) != 'Admin':
+            queryset = queryset.filter(created_by=self.request.user)
+
+        job_status = self.request.query_params.get('status')
+        if job_status:
+            queryset = queryset.filter(status=job_status)
+        task = self.request.query_params.get('task')
+        if task:
+            queryset = queryset.filter(task=task)
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Job counts per task and status"""
+        rows = Job.objects.order_by().values('task', 'status').annotate(count=Count('id'))
+        summary = {}
+        for row in rows:
+            summary.setdefault(row['task'], {})[row['status']] = row['count']
+        return Response(summary)
+
+    @action(detail=True, methods=['post'])
+    def retry(self, request, pk=None):
+        """Queue a failed or cancelled job again"""
+        job = self.get_object()
+        try:
+            queue.retry(job)
+        except queue.JobError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Cancel a job that has not started"""
+        job = self.get_object()
+        try:
+            queue.cancel(job)
+        except queue.JobError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data)
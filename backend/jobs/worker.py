@@ -0,0 +1,87 @@
+"""
+Worker threads for `manage.py run_workers`. Each process runs a pool of
+threads that claim and run jobs, plus one heartbeat thread that keeps the
+locks of its running jobs fresh and requeues jobs abandoned by dead workers.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from . import queue
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name(index):
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+class Worker(threading.Thread):
+    def __init__(self, index, stop, poll_interval, once=False):
+        super().__init__(name=worker_name(index), daemon=True)
+        self.stop = stop
+        self.poll_interval = poll_interval
+        self.once = once
+        self.processed = 0
+
+    def run(self):
+        try:
+            while not self.stop.is_set():
+                try:
+                    close_old_connections()
+                    job = queue.claim(self.name)
+                    if job is None:
+                        if self.once:
+                            break
+                        self.stop.wait(self.poll_interval)
+                        continue
+                    queue.run(job, self.name)
+                    self.processed += 1
+                except Exception:
+                    # E.g. the database went away. Start over on a fresh
+                    # connection; a job left running is requeued once stale.
+                    logger.exception("Worker %s could not claim or run a job", self.name)
+                    connection.close()
+                    self.stop.wait(self.poll_interval)
+        finally:
+            connection.close()
+
+
+def _heartbeat(workers, stop):
+    interval = max(settings.JOB_LOCK_TIMEOUT / 3, 1)
+    try:
+        while not stop.wait(interval):
+            try:
+                close_old_connections()
+                queue.heartbeat([w.name for w in workers])
+                queue.requeue_stale()
+            except Exception:
+                logger.exception("Job heartbeat failed")
+                connection.close()
+    finally:
+        connection.close()
+
+
+def run_pool(threads, poll_interval, stop, once=False):
+    """Run `threads` workers until `stop` is set (or, with once, the queue is empty)."""
+    queue.requeue_stale()
+    workers = [Worker(i, stop, poll_interval, once) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    beat = threading.Thread(target=_heartbeat, args=(workers, stop), name='job-heartbeat', daemon=True)
+    beat.start()
+
+    started = time.monotonic()
+    for worker in workers:
+        # Short joins keep the main thread responsive to signals.
+        while worker.is_alive():
+            worker.join(0.5)
+    stop.set()
+    beat.join()
+    return sum(w.processed for w in workers), time.monotonic() - started
@@ -9,6 +9,13 @@ class User(AbstractUser):
     ]
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='Viewer')
 
+    class Meta(AbstractUser.Meta):
+        # Role filter + username order of the user directory. Prefix search
+        # on username/email uses text_pattern_ops indexes (migration 0003).
+        indexes = [
+            models.Index(fields=['role', 'username'], name='user_role_username_idx'),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.role})"
 
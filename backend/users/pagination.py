@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class UserDirectoryPagination(CursorPagination):
+    """Keyset pages over username (unique), so deep pages cost the same as the first."""
+    ordering = 'username'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
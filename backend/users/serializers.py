@@ -15,6 +15,20 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'role']  
         read_only_fields = ['id', 'username', 'email']
 
+class UserDirectorySerializer(serializers.ModelSerializer):
+    # Annotated by UserViewSet.directory
+    asset_count = serializers.IntegerField(read_only=True)
+    storage_bytes = serializers.IntegerField(read_only=True)
+    last_activity = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = User
+        fields = [
+            'id', 'username', 'email', 'role', 'is_active', 'date_joined', 'last_login',
+            'asset_count', 'storage_bytes', 'last_activity',
+        ]
+        read_only_fields = fields
+
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
     email = serializers.EmailField(required=True)
@@ -0,0 +1,24 @@
+"""Background tasks for users, run by the job workers (see jobs/queue.py)."""
+
+from jobs.registry import task
+
+from activitylog.models import ActivityLog
+from assets.cleanup import delete_in_batches, purge_assets
+from assets.models import Asset
+from .models import ActivityLog as LegacyActivityLog, User
+
+
+@task('users.purge_user', max_attempts=3)
+def purge_user(user_id):
+    """
+    Finish deleting a deactivated user: their assets, files and logs go in
+    small batches, so the final user.delete() has almost nothing to cascade.
+    """
+    user = User.objects.filter(pk=user_id, is_active=False).first()
+    if user is None:
+        return 'user not found or reactivated'
+    assets = purge_assets(Asset.all_objects.filter(user_id=user_id))
+    logs = delete_in_batches(ActivityLog.objects.filter(user_id=user_id))
+    logs += delete_in_batches(LegacyActivityLog.objects.filter(UserID_id=user_id))
+    user.delete()
+    return {'assets': assets, 'activity_logs': logs}
@@ -1,3 +1,91 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from activitylog.models import ActivityLog
+from assets.models import UsageCounter
+from .models import User
+
+
+class UserDirectoryTests(TestCase):
+    url = '/api/users/directory/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role='Admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _get(self, url=None, **params):
+        response = self.client.get(url or self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_search_and_role_filter(self):
+        User.objects.create_user('anna', 'anna@example.com', 'pw', role='Editor')
+        User.objects.create_user('bob', 'annex@example.com', 'pw', role='Viewer')
+        User.objects.create_user('hannah', 'hannah@example.com', 'pw', role='Viewer')
+
+        # Prefix of username or email, case-insensitive; not a substring match
+        names = [user['username'] for user in self._get(search='ANN')['results']]
+        self.assertEqual(names, ['anna', 'bob'])
+        names = [user['username'] for user in self._get(role='Viewer')['results']]
+        self.assertEqual(names, ['bob', 'hannah'])
+        self.assertEqual(self.client.get(self.url, {'role': 'Owner'}).status_code, 400)
+
+    def test_inactive_users_only_for_admins_who_ask(self):
+        User.objects.create_user('anna', 'anna@example.com', 'pw', role='Editor')
+        gone = User.objects.create_user('gone', 'gone@example.com', 'pw', role='Viewer')
+        self.client.delete(f'/api/users/{gone.pk}/')
+        self.assertFalse(User.objects.get(pk=gone.pk).is_active)
+
+        names = [user['username'] for user in self._get()['results']]
+        self.assertEqual(names, ['admin', 'anna'])
+        names = [user['username'] for user in self._get(include_inactive='true')['results']]
+        self.assertEqual(names, ['admin', 'anna', 'gone'])
+
+        self.client.force_authenticate(User.objects.get(username='anna'))
+        names = [user['username'] for user in self._get(include_inactive='true')['results']]
+        self.assertEqual(names, ['admin', 'anna'])
+
+    def test_usage_and_last_activity(self):
+        anna = User.objects.create_user('anna', 'anna@example.com', 'pw', role='Editor')
+        UsageCounter.objects.create(user=anna, file_type='Image', asset_count=3, total_bytes=300)
+        UsageCounter.objects.create(user=anna, file_type='Video', asset_count=1, total_bytes=1000)
+        ActivityLog.log(anna, 'upload', 'first')
+        latest = ActivityLog.log(anna, 'update', 'second')
+
+        users = {user['username']: user for user in self._get()['results']}
+        self.assertEqual(
+            (users['anna']['asset_count'], users['anna']['storage_bytes']), (4, 1300)
+        )
+        self.assertEqual(users['anna']['last_activity'][:19], latest.timestamp.isoformat()[:19])
+        self.assertEqual(
+            (users['admin']['asset_count'], users['admin']['storage_bytes'], users['admin']['last_activity']),
+            (0, 0, None),
+        )
+
+    def test_cursor_pages(self):
+        for i in range(5):
+            User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pw', role='Viewer')
+
+        names, url = [], None
+        while True:
+            data = self._get(url, page_size=2) if url is None else self._get(url)
+            names += [user['username'] for user in data['results']]
+            url = data['next']
+            if not url:
+                break
+        self.assertEqual(names, ['admin'] + [f'user{i}' for i in range(5)])
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        for i in range(6):
+            user = User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pw', role='Viewer')
+            ActivityLog.log(user, 'login', 'login')
+
+        counts = []
+        for page_size in (2, 7):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(len(self._get(page_size=page_size)['results']), page_size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
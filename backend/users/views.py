@@ -1,13 +1,23 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
+from django.db.models import Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from .models import User
-from .serializers import UserSerializer, UserCreateSerializer, ActivityLogSerializer
+from .serializers import UserSerializer, UserCreateSerializer, UserDirectorySerializer, ActivityLogSerializer
 from .permissions import IsAdmin, IsEditorOrAdmin, IsViewerOrHigher
 from activitylog.models import ActivityLog  # ✅ Import the correct ActivityLog model
+from assets.cleanup import trash_assets
+from assets.models import Asset, UsageCounter
+from .pagination import UserDirectoryPagination
+from .tasks import purge_user
+from backend.routers import ReplicaReadMixin
+from backend.throttling import IPRateThrottle, LoginRateThrottle
 
 
 # =========================================================
@@ -24,10 +34,10 @@ def log_action(user, action, description, ip_address=None):
     Central logging function to record all user activities.
     """
     try:
-        ActivityLog.objects.create(
-            user=user,
-            action_type=action.lower(),  # normalize
-            description=description,
+        ActivityLog.log(
+            user,
+            action.lower(),  # normalize
+            description,
             ip_address=ip_address
         )
     except Exception as e:
@@ -39,6 +49,7 @@ def log_action(user, action, description, ip_address=None):
 # =========================================================
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([LoginRateThrottle, IPRateThrottle])
 def login_view(request):
     username = request.data.get('username')
     password = request.data.get('password')
@@ -74,7 +85,7 @@ class UserViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             permission_classes = [IsAdmin]
-        elif self.action in ['list']:
+        elif self.action in ['list', 'directory']:
             permission_classes = [IsEditorOrAdmin]
         else:
             permission_classes = [IsViewerOrHigher]
@@ -83,6 +94,8 @@ class UserViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == 'create':
             return UserCreateSerializer
+        if self.action == 'directory':
+            return UserDirectorySerializer
         return UserSerializer
 
     # 🟡 Create new user
@@ -153,17 +166,71 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({'error': 'You cannot delete your own account'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        username = user.username
-        user.delete()
+        # Deactivate now and trash their assets; a job purges the rest in
+        # batches instead of one long cascading delete.
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        Token.objects.filter(user=user).delete()
+        trashed = trash_assets(Asset.objects.filter(user=user))
+        job = purge_user.enqueue(
+            args={'user_id': user.pk}, dedup_key=f'users.purge_user:{user.pk}', user=request.user,
+        )
 
         log_action(
             request.user,
             "delete",
-            f"Deleted user {username}",
+            f"Deleted user {user.username} ({trashed} asset(s) moved to trash, purge job {job.pk})",
             ip_address=request.META.get('REMOTE_ADDR')
         )
 
-        return Response({'message': 'User deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
+        return Response(
+            {'message': 'User deactivated; deletion has been queued', 'job': job.pk},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    # 🟡 User directory (paginated, searchable, with per-user aggregates)
+    @action(detail=False, methods=['get'], pagination_class=UserDirectoryPagination)
+    def directory(self, request):
+        """
+        Cursor-paginated users (?search= prefix of username/email, ?role=) with usage and last activity.
+        Deactivated users, e.g. deleted ones awaiting their purge, are left out unless an admin
+        passes ?include_inactive=true.
+        """
+        users = User.objects.all()
+        if not (request.user.role == 'Admin' and request.query_params.get('include_inactive') in ('true', '1')):
+            users = users.filter(is_active=True)
+
+        role = request.query_params.get('role')
+        if role:
+            if role not in VALID_ROLES:
+                raise ValidationError({'role': 'Invalid role'})
+            users = users.filter(role=role)
+
+        search = request.query_params.get('search', '').strip()
+        if search:
+            # Anchored prefix match, served by the text_pattern_ops indexes
+            users = users.filter(Q(username__istartswith=search) | Q(email__istartswith=search))
+
+        # Correlated subqueries are evaluated only for the rows of the page;
+        # usage comes from the precomputed UsageCounter rows.
+        usage = UsageCounter.objects.filter(user=OuterRef('pk')).order_by().values('user')
+        users = users.annotate(
+            asset_count=Coalesce(Subquery(usage.annotate(n=Sum('asset_count')).values('n')), Value(0)),
+            storage_bytes=Coalesce(Subquery(usage.annotate(n=Sum('total_bytes')).values('n')), Value(0)),
+        )
+
+        page = self.paginate_queryset(users)
+        # The activity log may live in another database (backend/routers.py),
+        # so last activity can't be a subquery: it comes from one grouped
+        # query over the page's users, served by the (user_id, timestamp) index.
+        last_activity = dict(
+            ActivityLog.objects.filter(user_id__in=[user.pk for user in page])
+            .order_by().values('user_id').annotate(last=Max('timestamp'))
+            .values_list('user_id', 'last')
+        )
+        for user in page:
+            user.last_activity = last_activity.get(user.pk)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
 
     # 🟡 List users
     def list(self, request, *args, **kwargs):
@@ -190,9 +257,10 @@ class UserViewSet(viewsets.ModelViewSet):
 # =========================================================
 # 🔹 ACTIVITY LOG VIEWSET
 # =========================================================
-class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
+class ActivityLogViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ActivityLogSerializer
     permission_classes = [IsAdmin]
+    replica_actions = ('list', 'retrieve')
 
     def get_queryset(self):
         return ActivityLog.objects.all().order_by('-timestamp')